@@ -0,0 +1,119 @@
+import time
+import threading
+import numpy as np
+
+HISTORY_POINTS = 40  # Points kept for the dashboard chart / audit log
+
+
+def risk_score(label, score):
+    """0-100 value plotted on the dashboard: full scale for FAKE, a low wobble for REAL."""
+    return score * 100 if label == "FAKE" else (1.0 - score) * 5
+
+
+class ResultsStore:
+    """
+    Fixed-size, thread-safe verdict history. The analysis worker appends; the UI reads
+    snapshots. Backed by preallocated NumPy arrays used as a ring, so appending never shifts
+    or reallocates anything (unlike list.pop(0)). `version` changes on every append, so a
+    reader can skip redrawing when nothing new has arrived.
+    """
+
+    def __init__(self, capacity=HISTORY_POINTS):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.risk = np.zeros(capacity, dtype=np.float32)
+        self.scores = np.zeros(capacity, dtype=np.float32)
+        self.labels = np.empty(capacity, dtype=object)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.version = 0
+
+    def append(self, label, score, when=None):
+        with self.lock:
+            i = self.count % self.capacity
+            self.times[i] = time.time() if when is None else when
+            self.risk[i] = risk_score(label, score)
+            self.scores[i] = score
+            self.labels[i] = label
+            self.count += 1
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+            self.version += 1
+
+    def snapshot(self):
+        """
+        Oldest-first copies: {"time", "risk", "score", "label", "version"}. Copies are taken
+        under the lock, so the caller can render them at leisure.
+        """
+        with self.lock:
+            n = min(self.count, self.capacity)
+            order = (np.arange(n) + (self.count - n)) % self.capacity
+            return {"time": self.times[order], "risk": self.risk[order], "score": self.scores[order],
+                    "label": self.labels[order], "version": self.version}
+
+    def latest(self):
+        """(label, score) of the newest verdict, or None."""
+        with self.lock:
+            if self.count == 0:
+                return None
+            i = (self.count - 1) % self.capacity
+            return self.labels[i], float(self.scores[i])
+
+
+class AnalysisWorker:
+    """
+    Background thread that turns a recorder's audio into verdicts. It waits for each new
+    segment's worth of audio, runs it through a StreamingFirewall and publishes the verdict
+    to a ResultsStore. The UI thread never runs the model; it only reads the store.
+    """
+
+    def __init__(self, recorder, stream, store):
+        self.recorder = recorder
+        self.stream = stream
+        self.store = store
+        self.running = False
+        self.thread = None
+        self.error = None
+        self.last_latency = None  # Seconds the last verdict took once its audio was complete
+
+    def start(self):
+        if self.running:
+            return
+        self.stream.reset()
+        self.error = None
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="analysis-worker", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+    def alive(self):
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def _loop(self):
+        cursor = 0
+        try:
+            while self.running:
+                # Sleep until the next segment's worth of audio has arrived (no fixed tick)
+                self.recorder.wait_for_audio(cursor, self.stream.needed(), timeout=0.5)
+                if getattr(self.recorder, "error", None):
+                    self.error = f"Audio capture stopped: {self.recorder.error}"
+                    break
+                samples, cursor = self.recorder.get_new_samples(cursor)
+                start = time.perf_counter()
+                verdict = self.stream.push(samples)
+                if verdict is not None:
+                    self.last_latency = time.perf_counter() - start
+                    self.store.append(*verdict)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Analysis Error: {self.error}")
+        finally:
+            self.running = False
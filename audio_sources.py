@@ -0,0 +1,226 @@
+import queue
+import socket
+import time
+import numpy as np
+
+# Same framing as audio_stream.RealRecorder (not imported: that module probes the audio hardware on import)
+CHUNK_SIZE = 1024
+RATE = 16000
+DEVICE_QUEUE_CHUNKS = 64  # ~4 s of audio buffered between the PortAudio callback and read()
+PA_INPUT_OVERFLOW = 0x2   # paInputOverflow status flag
+
+
+class AudioSource:
+    """
+    A stream of 16 kHz mono audio. read() blocks until the next chunk is available and
+    returns it as float32 in [-1, 1], or None once the source is exhausted/closed.
+    """
+    name = "source"
+
+    def open(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def pcm16_to_float(data):
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    samples *= 1.0 / 32768.0
+    return samples
+
+
+class DeviceSource(AudioSource):
+    """
+    An input device (microphone / loopback) read through PyAudio in callback mode: PortAudio
+    hands us each chunk on its own thread, so nothing polls the device. If the consumer falls
+    behind, the oldest buffered chunks are dropped (counted in `dropped`) rather than stalling
+    the audio thread.
+    """
+
+    def __init__(self, device_index=None, max_chunks=DEVICE_QUEUE_CHUNKS):
+        self.device_index = device_index
+        self.name = f"device{'' if device_index is None else device_index}"
+        self.p = None
+        self.stream = None
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.dropped = 0    # Chunks discarded here because read() was too slow
+        self.overflows = 0  # Chunks the device itself lost
+
+    def open(self):
+        try:
+            import pyaudiowpatch as pyaudio
+        except ImportError:
+            import pyaudio
+
+        self.p = pyaudio.PyAudio()
+        self.stream = self.p.open(format=pyaudio.paInt16, channels=1, rate=RATE, input=True,
+                                  input_device_index=self.device_index, frames_per_buffer=CHUNK_SIZE,
+                                  stream_callback=self._on_audio)
+        self._continue = pyaudio.paContinue
+        self.stream.start_stream()
+
+    def _on_audio(self, data, frame_count, time_info, status):
+        # PortAudio's thread: copy out and return immediately, never block here
+        if status & PA_INPUT_OVERFLOW:
+            self.overflows += 1
+        chunk = pcm16_to_float(data)
+        while True:
+            try:
+                self.chunks.put_nowait(chunk)
+                break
+            except queue.Full:
+                try:
+                    self.chunks.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+        return None, self._continue
+
+    def read(self):
+        while self.stream is not None:
+            try:
+                return self.chunks.get(timeout=0.5)
+            except queue.Empty:
+                if not self.stream.is_active():  # Device unplugged / stream died
+                    return None
+        return None
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.p is not None:
+            self.p.terminate()
+            self.p = None
+
+
+class FileSource(AudioSource):
+    """Replays a recording, paced like a live call unless realtime=False."""
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.name = path
+        self.samples = None
+        self.pos = 0
+        self.next_due = 0.0
+
+    def open(self):
+        import librosa
+
+        self.samples, _ = librosa.load(self.path, sr=RATE, mono=True)
+        self.pos = 0
+        self.next_due = time.monotonic()
+
+    def read(self):
+        if self.samples is None:
+            return None
+        if self.pos >= len(self.samples):
+            if not self.loop or len(self.samples) == 0:
+                return None
+            self.pos = 0
+
+        chunk = self.samples[self.pos:self.pos + CHUNK_SIZE]
+        self.pos += len(chunk)
+
+        if self.realtime:
+            self.next_due += len(chunk) / RATE
+            delay = self.next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return chunk
+
+    def close(self):
+        self.samples = None
+
+
+class SyntheticSource(FileSource):
+    """
+    A generated voice-like signal (bench_pitch.synth_voice), looped and paced like a live
+    call. Lets the capture pipeline run headless, without a sound card or a recording.
+    """
+
+    def __init__(self, seconds=10.0, f0=140.0, realtime=True, seed=0):
+        super().__init__(None, realtime=realtime, loop=True)
+        self.seconds = seconds
+        self.f0 = f0
+        self.seed = seed
+        self.name = f"synthetic:{f0:g}Hz"
+
+    def open(self):
+        from bench_pitch import synth_voice
+
+        self.samples, _ = synth_voice(self.seconds, f0=self.f0, seed=self.seed)
+        self.pos = 0
+        self.next_due = time.monotonic()
+
+
+class SocketSource(AudioSource):
+    """
+    Listens on host:port and reads raw PCM (16-bit little-endian, mono, 16 kHz) from the
+    first client that connects, e.g. a telephony gateway forwarding one call leg.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = int(port)
+        self.name = f"tcp:{host}:{port}"
+        self.server = None
+        self.conn = None
+        self.pending = b""
+
+    def open(self):
+        self.server = socket.create_server((self.host, self.port))
+        self.conn, _ = self.server.accept()
+
+    def read(self):
+        if self.conn is None:
+            return None
+        need = CHUNK_SIZE * 2
+        while len(self.pending) < need:
+            data = self.conn.recv(need - len(self.pending))
+            if not data:  # Caller hung up
+                break
+            self.pending += data
+
+        usable = len(self.pending) - len(self.pending) % 2
+        if usable == 0:
+            return None
+        chunk, self.pending = self.pending[:usable], self.pending[usable:]
+        return pcm16_to_float(chunk)
+
+    def close(self):
+        for s in (self.conn, self.server):
+            if s is not None:
+                try:
+                    s.close()
+                except OSError:
+                    pass
+        self.conn = self.server = None
+
+
+def open_source(spec):
+    """
+    Builds a source from a command-line spec:
+      device[:INDEX]      PyAudio input device (default device if no index)
+      file:PATH           recording replayed in real time
+      tcp:HOST:PORT       raw PCM pushed over a TCP connection
+      synthetic[:F0]      generated voice-like test signal (no hardware needed)
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "device":
+        return DeviceSource(int(rest) if rest else None)
+    if kind == "file":
+        return FileSource(rest)
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return SocketSource(host or "0.0.0.0", port)
+    if kind == "synthetic":
+        return SyntheticSource(f0=float(rest) if rest else 140.0)
+    raise ValueError(f"Unknown source '{spec}' (expected device[:N], file:PATH, tcp:HOST:PORT or synthetic[:F0])")
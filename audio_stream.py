@@ -4,16 +4,81 @@ import os
 import collections
 import wave
 import sys
+import numpy as np
 
 # --- CONFIGURATION ---
 CHUNK_SIZE = 1024
 RATE = 16000
 BUFFER_DURATION = 10 
+PA_INPUT_OVERFLOW = 0x2  # PortAudio paInputOverflow status flag
 
 # --- DETECTION LOGIC ---
 # We check if we are on Streamlit Cloud to avoid crashing the C-library
 IS_CLOUD = os.getenv('STREAMLIT_SERVER_HEADLESS') == 'true' or os.path.exists("/mount/src")
 
+class AudioRingBuffer:
+    """
+    Preallocated int16 ring for one writer (the capture thread) and any number of readers.
+
+    No locks: the writer copies each chunk into place and only then advances `written`
+    (a monotonic count of samples ever captured), so readers never see half-written data.
+    A reader that falls more than `capacity` samples behind has lost audio; that shows up
+    in the `dropped` counter instead of as garbage.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = np.zeros(capacity, dtype=np.int16)
+        self.written = 0   # Samples ever written (monotonic)
+        self.dropped = 0   # Samples readers asked for but that were already overwritten
+
+    def reset(self):
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)  # View over the chunk, no copy
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        # The kept tail goes where it ends up once `written` advances by the full n
+        start = (self.written + n - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buf[start:start + first] = samples[:first]
+        self.buf[:len(samples) - first] = samples[first:]
+        self.written += n  # Publish only after the copy
+
+    def snapshot(self, n_samples, end=None):
+        """
+        The n_samples before sample counter `end` (default: now) as two memoryview slices
+        (the second is empty unless the range wraps). Views alias the ring: use them before
+        the writer laps them, or check still_valid() afterwards.
+        """
+        end = self.written if end is None else end
+        n = max(0, min(n_samples, end, self.capacity))
+        start = (end - n) % self.capacity
+        first = min(n, self.capacity - start)
+        view = memoryview(self.buf)
+        return view[start:start + first], view[:n - first]
+
+    def still_valid(self, start):
+        """True if the samples from counter `start` onwards have not been overwritten yet."""
+        return self.written - start <= self.capacity
+
+    def read_float(self, n_samples, end=None):
+        """Copy of a snapshot as float32 in [-1, 1] (one allocation, no intermediate int16 copy)."""
+        end = self.written if end is None else end
+        a, b = self.snapshot(n_samples, end)
+        out = np.empty(len(a) + len(b), dtype=np.float32)
+        np.multiply(np.frombuffer(a, dtype=np.int16), 1.0 / 32768.0, out=out[:len(a)])
+        np.multiply(np.frombuffer(b, dtype=np.int16), 1.0 / 32768.0, out=out[len(a):])
+        if not self.still_valid(end - len(out)):
+            # The writer lapped us while copying: the oldest part is from the next lap
+            lost = self.written - (end - len(out)) - self.capacity
+            self.dropped += lost
+            out = out[lost:]
+        return out
+
+
 class DummyRecorder:
     """
     A fake recorder for the Cloud. 
@@ -45,15 +110,31 @@ class DummyRecorder:
         except:
             return False
 
+    def get_current_samples(self):
+        # Same 1 second of silence, straight from memory
+        return np.zeros(RATE, dtype=np.float32)
+
+    def get_new_samples(self, cursor=0):
+        # Nothing is ever captured, so there is never anything new
+        return np.zeros(0, dtype=np.float32), cursor
+
+    def wait_for_audio(self, cursor, min_samples=1, timeout=1.0):
+        # Nothing will ever arrive: just idle for the timeout instead of spinning
+        time.sleep(timeout)
+        return False
+
 class RealRecorder:
     """
     The Real Recorder for Local Windows/Linux Machines.
     """
     def __init__(self):
-        self.frames = collections.deque(maxlen=int(RATE / CHUNK_SIZE * BUFFER_DURATION))
+        self.ring = AudioRingBuffer(RATE * BUFFER_DURATION)
         self.recording = False
-        self.thread = None
+        self.stream = None
         self.p = None
+        self.error = None   # Why capture stopped, if it stopped on its own
+        self.overflows = 0  # Chunks the sound card had to throw away because we read too late
+        self.new_audio = threading.Condition()
         
         # Import PyAudio ONLY if we are local
         try:
@@ -63,6 +144,8 @@ class RealRecorder:
             
         self.p = pyaudio.PyAudio()
         self.format = pyaudio.paInt16
+        self._continue = pyaudio.paContinue
+        self._complete = pyaudio.paComplete
 
     def get_device(self):
         # ... (Existing logic for finding devices) ...
@@ -73,51 +156,110 @@ class RealRecorder:
         except:
             return self.p.get_default_input_device_info()
 
-    def _record_loop(self):
-        try:
-            # Simple default stream for robustness
-            stream = self.p.open(format=self.format,
-                                 channels=1,
-                                 rate=16000,
-                                 input=True,
-                                 frames_per_buffer=CHUNK_SIZE)
-        except Exception as e:
-            print(f"Mic Error: {e}")
-            return
-
-        while self.recording:
-            try:
-                data = stream.read(CHUNK_SIZE, exception_on_overflow=False)
-                self.frames.append(data)
-            except:
-                break
-        
-        stream.stop_stream()
-        stream.close()
+    def _on_audio(self, data, frame_count, time_info, status):
+        # Runs on PortAudio's thread: copy into the ring, wake any waiting reader, return
+        if status & PA_INPUT_OVERFLOW:
+            self.overflows += 1
+        self.ring.write(data)
+        with self.new_audio:
+            self.new_audio.notify_all()
+        return None, self._continue if self.recording else self._complete
 
     def start(self):
         if not self.recording:
-            self.recording = True
-            self.frames.clear()
-            self.thread = threading.Thread(target=self._record_loop, daemon=True)
-            self.thread.start()
+            self.ring.reset()
+            self.error = None
+            try:
+                # Callback mode: PortAudio pushes each chunk to us, no thread polling read()
+                self.stream = self.p.open(format=self.format,
+                                          channels=1,
+                                          rate=16000,
+                                          input=True,
+                                          frames_per_buffer=CHUNK_SIZE,
+                                          stream_callback=self._on_audio)
+                self.recording = True
+                self.stream.start_stream()
+            except Exception as e:
+                self.recording = False
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Mic Error: {e}")
 
     def stop(self):
         self.recording = False
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+        with self.new_audio:
+            self.new_audio.notify_all()
+
+    def wait_for_audio(self, cursor, min_samples=1, timeout=1.0):
+        """
+        Blocks until at least min_samples have arrived after `cursor` (or timeout / the
+        stream died). Lets callers react to new audio instead of sleeping on a fixed tick.
+        Returns True if the audio is there.
+        """
+        target = cursor + max(1, min_samples)
+        with self.new_audio:
+            self.new_audio.wait_for(lambda: self.ring.written >= target or not self.alive(), timeout)
+        return self.ring.written >= target
+
+    def alive(self):
+        """False once the device stream has stopped on its own (unplugged, driver error)."""
+        if not self.recording or self.stream is None:
+            return False
+        try:
+            if self.stream.is_active():
+                return True
+            self.error = self.error or "Input stream stopped"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        return False
 
     def save_current_buffer(self, filename="live_buffer.wav"):
-        if len(self.frames) < 10: return False
+        if self.ring.written < 10 * CHUNK_SIZE: return False
         try:
             wf = wave.open(filename, 'wb')
             wf.setnchannels(1)
             wf.setsampwidth(self.p.get_sample_size(self.format))
             wf.setframerate(16000)
-            wf.writeframes(b''.join(self.frames))
+            for part in self.ring.snapshot(self.ring.capacity):
+                wf.writeframes(part)
             wf.close()
             return True
         except:
             return False
 
+    def get_current_samples(self):
+        """
+        Returns the rolling buffer (last BUFFER_DURATION seconds) as float32 in [-1, 1] at
+        16 kHz, ready for VoiceFirewall.analyze_array(). Converted straight out of the ring.
+        """
+        if self.ring.written < 10 * CHUNK_SIZE: return None
+        return self.ring.read_float(self.ring.capacity)
+
+    def get_new_samples(self, cursor=0):
+        """
+        Returns (samples, new_cursor): only the audio captured since `cursor` (a sample
+        counter), as float32. Pass the returned cursor back on the next call. If the reader
+        fell more than the buffer length behind, the missed audio is counted in ring.dropped.
+        """
+        end = self.ring.written
+        if cursor > end:  # Recorder was restarted
+            cursor = 0
+        missed = end - cursor - self.ring.capacity
+        if missed > 0:
+            self.ring.dropped += missed
+        return self.ring.read_float(end - cursor, end), end
+
+    def stats(self):
+        """Capture counters: samples written, samples readers missed, device overflows."""
+        return {"written": self.ring.written, "dropped": self.ring.dropped, "overflows": self.overflows,
+                "error": self.error}
+
 # --- FACTORY ---
 # This decides which class to give the App
 if IS_CLOUD:
@@ -0,0 +1,191 @@
+import os
+import csv
+import json
+import time
+import argparse
+import collections
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+AUDIO_EXTS = (".wav", ".mp3", ".flac", ".ogg", ".m4a")
+FIELDS = ["path", "label", "score", "seconds", "error"]
+MAX_DECODE_WORKERS = 4  # Decoding is mostly I/O + memcpy; every extra process takes a core from torch
+
+
+def find_audio(root):
+    """Every audio file under root, in a stable order (so resumed runs see the same sequence)."""
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTS):
+                yield os.path.join(folder, name)
+
+
+def decode(path):
+    """Runs in a worker process: file -> 16 kHz mono float32. Returns (path, samples, error)."""
+    import wav_loader
+
+    try:
+        return path, wav_loader.load(path, 16000), None  # PCM WAVs are memory-mapped, no librosa
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+class ResultWriter:
+    """Append-only JSONL/CSV output. Every row is flushed, so the file doubles as the checkpoint."""
+
+    def __init__(self, path, fmt, restart=False):
+        self.fmt = fmt
+        self.done = set() if restart else self._read_done(path, fmt)
+        exists = os.path.exists(path) and os.path.getsize(path) > 0 and not restart
+        self.f = open(path, "a" if exists else "w", newline="")
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.f, fieldnames=FIELDS)
+            if not exists:
+                self.csv.writeheader()
+
+    @staticmethod
+    def _read_done(path, fmt):
+        """Paths with a verdict. ERROR rows (locked share, half-copied file...) are retried on resume."""
+        done = set()
+        if not os.path.exists(path):
+            return done
+        with open(path, newline="") as f:
+            if fmt == "csv":
+                done.update(row["path"] for row in csv.DictReader(f)
+                            if row.get("path") and row.get("label") != "ERROR")
+            else:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                        if row.get("label") != "ERROR":
+                            done.add(row["path"])
+                    except (ValueError, KeyError):
+                        pass  # Torn last line from an interrupted run
+        return done
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self.csv.writerow(row)
+        else:
+            self.f.write(json.dumps(row) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def default_decode_workers():
+    """A quarter of this process's cores for decoding (1..MAX_DECODE_WORKERS); the rest run the model."""
+    from runtime_profile import process_share
+
+    return max(1, min(MAX_DECODE_WORKERS, len(process_share()) // 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forensic batch audit of a folder tree of recordings.")
+    parser.add_argument("root", help="Folder to scan (recursively)")
+    parser.add_argument("--out", default="audit_results.jsonl", help="Results file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=default_decode_workers(),
+                        help="Decode processes (their cores are taken out of the model's thread count)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Clips per forward pass")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "student"])
+    parser.add_argument("--pitch-engine", default="pyin", choices=["pyin", "yin"])
+    parser.add_argument("--adaptive-depth", action="store_true",
+                        help="Stop the model early on confident clips (torch backend, see exit_heads.py)")
+    parser.add_argument("--restart", action="store_true", help="Ignore previous results instead of resuming")
+    parser.add_argument("--long", action="store_true",
+                        help="Score whole recordings window by window (bounded memory) instead of the first 4 s")
+    args = parser.parse_args()
+
+    fmt = "csv" if args.out.lower().endswith(".csv") else "jsonl"
+    writer = ResultWriter(args.out, fmt, restart=args.restart)
+    todo = [p for p in find_audio(args.root) if p not in writer.done]
+    print(f"📂 {len(todo)} files to audit ({len(writer.done)} already done in {args.out})")
+    if not todo:
+        writer.close()
+        return
+
+    from model_registry import get_firewall
+    firewall = get_firewall(backend=args.backend, pitch_engine=args.pitch_engine, adaptive_depth=args.adaptive_depth)
+    runtime = firewall.runtime
+    if not runtime.config["threads"]:
+        # Leave the decode processes their own cores instead of oversubscribing torch's
+        instances = runtime.config["instances"]
+        runtime.set_instances(instances, max(1, (len(runtime.cores) - args.workers) // instances))
+    print(f"⚙️  {args.workers} decode process(es), inference: {runtime.describe()}")
+
+    counts = collections.Counter()
+    batch = []
+    start = time.time()
+
+    if args.long:
+        try:
+            _audit_long(firewall, todo, writer, counts, args.batch_size, start)
+            print(f"✅ Audit finished: {dict(counts)} -> {args.out}")
+        except KeyboardInterrupt:
+            print("⏸️  Interrupted. Run the same command again to resume.")
+        finally:
+            writer.close()
+        return
+
+    def flush():
+        results = firewall.analyze_batch([y for _, y in batch], batch_size=args.batch_size)
+        for (path, y), (label, score) in zip(batch, results):
+            writer.write({"path": path, "label": label, "score": round(float(score), 4),
+                          "seconds": round(len(y) / 16000, 2), "error": ""})
+            counts[label] += 1
+        batch.clear()
+        done = sum(counts.values())
+        print(f"   {done}/{len(todo)} | {done / (time.time() - start):.1f} files/s | {dict(counts)}")
+
+    try:
+        # Spawned, never forked: this process already holds torch's threads from loading the model
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn")) as pool:
+            # Keep a bounded number of decodes in flight so memory stays flat on huge trees
+            in_flight = collections.deque()
+            for path in todo:
+                in_flight.append(pool.submit(decode, path))
+                if len(in_flight) >= args.workers * 4:
+                    _collect(in_flight.popleft().result(), batch, writer, counts)
+                    if len(batch) >= args.batch_size:
+                        flush()
+            while in_flight:
+                _collect(in_flight.popleft().result(), batch, writer, counts)
+                if len(batch) >= args.batch_size:
+                    flush()
+            if batch:
+                flush()
+        print(f"✅ Audit finished: {dict(counts)} -> {args.out}")
+    except KeyboardInterrupt:
+        print("⏸️  Interrupted. Run the same command again to resume.")
+    finally:
+        writer.close()
+
+
+def _audit_long(firewall, todo, writer, counts, batch_size, start):
+    """
+    One file at a time through analyze_long(): recordings are streamed in blocks (memory-mapped
+    for PCM WAV), so even multi-hour files never sit in memory whole. The windows of each file
+    are what gets batched, so no decode pool is needed.
+    """
+    for n, path in enumerate(todo, 1):
+        label, score, report = firewall.analyze_long(path, batch_size=batch_size)
+        error = "" if label != "ERROR" else "Could not decode or score the file"
+        writer.write({"path": path, "label": label, "score": round(float(score), 4),
+                      "seconds": report.get("seconds", 0.0), "error": error})
+        counts[label] += 1
+        print(f"   {n}/{len(todo)} | {n / (time.time() - start):.2f} files/s | {dict(counts)}")
+
+
+def _collect(decoded, batch, writer, counts):
+    path, y, error = decoded
+    if error is not None:
+        writer.write({"path": path, "label": "ERROR", "score": 0.0, "seconds": 0.0, "error": error})
+        counts["ERROR"] += 1
+    else:
+        batch.append((path, y))
+
+
+if __name__ == "__main__":
+    main()
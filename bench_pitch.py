@@ -0,0 +1,127 @@
+import os
+import time
+import json
+import argparse
+import numpy as np
+
+import physics
+
+SR = 16000
+
+
+def synth_voice(seconds, f0=140.0, jitter=0.01, shimmer=0.05, seed=0):
+    """
+    Harmonic 'voice' with a known pitch contour. Cycle-to-cycle pitch/loudness wobble is
+    controlled by `jitter` / `shimmer` (0 = perfectly smooth, like cheap TTS).
+    """
+    rng = np.random.default_rng(seed)
+    n = int(SR * seconds)
+    t = np.arange(n) / SR
+
+    # Slow intonation plus random per-10ms wobble
+    steps = max(2, int(seconds * 100))
+    wobble = np.interp(t, np.linspace(0, seconds, steps), rng.standard_normal(steps))
+    pitch = f0 * (1 + 0.08 * np.sin(2 * np.pi * 0.4 * t)) * (1 + jitter * wobble)
+    loud = 1 + shimmer * np.interp(t, np.linspace(0, seconds, steps), rng.standard_normal(steps))
+
+    phase = 2 * np.pi * np.cumsum(pitch) / SR
+    y = sum(np.sin(k * phase) / k for k in range(1, 6)) * loud
+    y = 0.3 * y / np.max(np.abs(y))
+
+    # A pause in the middle so voicing decisions are tested too
+    y[n // 2: n // 2 + SR // 4] = 0
+    y += 0.002 * rng.standard_normal(n)
+    return y.astype(np.float32), pitch
+
+
+def load_dir(folder, limit):
+    import librosa
+
+    clips = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith((".wav", ".mp3", ".flac", ".ogg")) and len(clips) < limit:
+                y, _ = librosa.load(os.path.join(root, name), sr=SR, mono=True)
+                clips.append((name, y, None))
+    return clips
+
+
+def timed(fn, y, repeats):
+    fn(y[:SR], SR)  # Warm-up: librosa JIT-compiles pyin on first use
+    best = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(y, SR)
+        best.append(time.perf_counter() - start)
+    return out, float(np.median(best))
+
+
+def compare(name, y, repeats):
+    """Runs both engines on one clip; pyin is the reference."""
+    (f_ref, v_ref, a_ref), t_ref = timed(physics.track_pyin, y, repeats)
+    (f_yin, v_yin, a_yin), t_yin = timed(physics.track_yin, y, repeats)
+
+    n = min(len(f_ref), len(f_yin))  # Same hop and centring, so frames line up 1:1
+    f_ref, v_ref, a_ref = f_ref[:n], v_ref[:n], a_ref[:n]
+    f_yin, v_yin, a_yin = f_yin[:n], v_yin[:n], a_yin[:n]
+
+    both = v_ref & v_yin
+    cents = 1200 * np.abs(np.log2(f_yin[both] / f_ref[both])) if both.any() else np.zeros(0)
+    return {
+        "clip": name,
+        "seconds": round(len(y) / SR, 2),
+        "voicing_agreement": float(np.mean(v_ref == v_yin)),
+        "median_cents_error": float(np.median(cents)) if len(cents) else None,
+        "gross_error_rate": float(np.mean(cents > 50)) if len(cents) else None,  # > half a semitone
+        "jitter_pyin": physics.jitter(f_ref[v_ref]),
+        "jitter_yin": physics.jitter(f_yin[v_yin]),
+        "shimmer_pyin": physics.shimmer(a_ref[v_ref]),
+        "shimmer_yin": physics.shimmer(a_yin[v_yin]),
+        "pyin_ms": t_ref * 1000,
+        "yin_ms": t_yin * 1000,
+        "speedup": t_ref / t_yin if t_yin > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and speed of the YIN pitch engine against librosa.pyin.")
+    parser.add_argument("--wav-dir", help="Also compare on real recordings from this folder")
+    parser.add_argument("--limit", type=int, default=20, help="Max files taken from --wav-dir")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats per clip (median is reported)")
+    parser.add_argument("--json", help="Write the full report here")
+    args = parser.parse_args()
+
+    clips = []
+    for seconds in (2, 5, 10):
+        for label, jit, shim in (("human", 0.01, 0.05), ("smooth", 0.0, 0.0)):
+            y, _ = synth_voice(seconds, jitter=jit, shimmer=shim, seed=seconds)
+            clips.append((f"synth_{label}_{seconds}s", y, None))
+    if args.wav_dir:
+        clips += load_dir(args.wav_dir, args.limit)
+
+    print("🔬 Pitch engine report (reference: pyin)")
+    print(f"{'clip':<24}{'voicing':>9}{'cents':>8}{'gross':>7}{'jit pyin':>10}{'jit yin':>9}"
+          f"{'shim pyin':>10}{'shim yin':>9}{'pyin ms':>9}{'yin ms':>8}{'x':>6}")
+    rows = []
+    for name, y, _ in clips:
+        r = compare(name, y, args.repeats)
+        rows.append(r)
+        cents = "-" if r["median_cents_error"] is None else f"{r['median_cents_error']:.1f}"
+        gross = "-" if r["gross_error_rate"] is None else f"{r['gross_error_rate'] * 100:.0f}%"
+        print(f"{name[:23]:<24}{r['voicing_agreement'] * 100:>8.0f}%{cents:>8}{gross:>7}"
+              f"{r['jitter_pyin']:>10.4f}{r['jitter_yin']:>9.4f}{r['shimmer_pyin']:>10.4f}{r['shimmer_yin']:>9.4f}"
+              f"{r['pyin_ms']:>9.1f}{r['yin_ms']:>8.1f}{r['speedup']:>6.0f}")
+
+    total_ref = sum(r["pyin_ms"] for r in rows)
+    total_yin = sum(r["yin_ms"] for r in rows)
+    print("-" * 100)
+    print(f"⏱️  Total: pyin {total_ref:.0f} ms | yin {total_yin:.0f} ms | {total_ref / total_yin:.0f}x faster")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clips": rows, "total_pyin_ms": total_ref, "total_yin_ms": total_yin}, f, indent=2)
+        print(f"✅ Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
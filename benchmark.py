@@ -0,0 +1,292 @@
+import io
+import os
+import sys
+import json
+import time
+import queue
+import platform
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+
+from bench_pitch import synth_voice
+from detector_v3 import VoiceFirewall, TARGET_SR
+from runtime_profile import RuntimeProfile
+
+FILE_SR = 44100                      # Synthetic clips are stored like typical uploads, so decode + resample are real work
+CLIP_SECONDS = (1.0, 4.0, 10.0, 30.0)
+STAGES = ["decode", "resample", "vad", "pitch", "features", "forward", "decide", "total", "analyze"]
+REGRESSION_TOLERANCE = 0.25          # p50 slower than the baseline by more than this fails --compare
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far (MB). Each config runs in its own process (see main)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10  # bytes on macOS, KB elsewhere
+    except ImportError:
+        from model_registry import rss_mb
+        return rss_mb()
+
+
+def summarize(times):
+    """Latency summary in ms for a list of durations in seconds."""
+    ms = np.asarray(times) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "mean_ms": round(float(ms.mean()), 3)}
+
+
+def make_clips(folder, lengths):
+    """Seeded synthetic voices written as 44.1 kHz WAVs (same files on every machine and run)."""
+    import soundfile as sf
+    import librosa
+
+    paths = {}
+    for seconds in lengths:
+        y, _ = synth_voice(seconds, seed=int(seconds * 10))
+        path = os.path.join(folder, f"synthetic_{seconds:g}s.wav")
+        sf.write(path, librosa.resample(y, orig_sr=TARGET_SR, target_sr=FILE_SR), FILE_SR, subtype="PCM_16")
+        paths[seconds] = path
+    return paths
+
+
+def forward(firewall, inputs):
+    """The bare model call, on features that were already extracted."""
+    if firewall.backend == "onnx":
+        feed = {i.name: inputs[i.name] for i in firewall.session.get_inputs()}
+        return firewall.session.run(None, feed)[0]
+    import torch
+    with torch.no_grad():
+        return firewall.model(**inputs).logits.cpu().numpy()
+
+
+def time_stages(firewall, path):
+    """
+    One pass through the same steps as VoiceFirewall.analyze(), timed separately.
+    Returns {stage: seconds}. The full analyze() call is timed on its own as a check
+    that the stages add up to what users actually see.
+    """
+    import wav_loader
+    from detector_v3 import softmax
+
+    # Decode the way analyze() does (wav_loader.load), split into its read and resample steps
+    t = {}
+    start = time.perf_counter()
+    mm, layout = wav_loader.open_pcm(path)
+    if mm is None:
+        y, sr = wav_loader.load(path, TARGET_SR), TARGET_SR  # librosa fallback: one call does both
+    else:
+        y, sr = wav_loader.to_float(mm), layout["sr"]
+    t["decode"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    if sr != TARGET_SR:
+        import soxr
+        y = soxr.resample(y, sr, TARGET_SR)
+    y = firewall.prepare_audio(np.ascontiguousarray(y, dtype=np.float32))
+    t["resample"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    _, speech = firewall.speech_gate(y)
+    t["vad"] = time.perf_counter() - mark
+    speech = y if speech is None else speech
+
+    mark = time.perf_counter()
+    f0, _ = firewall.voice_features(speech)
+    t["pitch"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    inputs = firewall.model_inputs([speech])
+    t["features"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    logits = forward(firewall, inputs)
+    t["forward"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    fake_prob, real_prob = firewall.label_probs(softmax(logits)[0])
+    firewall.decide(fake_prob, real_prob, firewall.jitter_from_f0(f0))
+    t["decide"] = time.perf_counter() - mark
+    t["total"] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Keep the per-clip debug lines out of the report
+        firewall.analyze(path)
+    t["analyze"] = time.perf_counter() - mark
+    return t
+
+
+def bench_recorder(repeats):
+    """The live path's snapshot cost: ring buffer -> float32 window, as get_current_samples() does."""
+    from audio_stream import AudioRingBuffer, RATE, CHUNK_SIZE, BUFFER_DURATION
+
+    ring = AudioRingBuffer(RATE * BUFFER_DURATION)
+    chunk = (np.random.default_rng(0).standard_normal(CHUNK_SIZE) * 3000).astype(np.int16).tobytes()
+    writes, snapshots, new = [], [], []
+    cursor = 0
+    for i in range(repeats):
+        mark = time.perf_counter()
+        for _ in range(RATE // CHUNK_SIZE):  # One second of capture
+            ring.write(chunk)
+        writes.append((time.perf_counter() - mark) / (RATE // CHUNK_SIZE))
+
+        mark = time.perf_counter()
+        ring.read_float(ring.capacity)
+        snapshots.append(time.perf_counter() - mark)
+
+        mark = time.perf_counter()
+        end = ring.written
+        ring.read_float(end - cursor, end)
+        cursor = end
+        new.append(time.perf_counter() - mark)
+    return {"write_chunk": summarize(writes), "snapshot_window": summarize(snapshots), "new_samples": summarize(new)}
+
+
+def run_config(backend, threads, paths, repeats, pitch_engine):
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        firewall = VoiceFirewall(backend="torch", pitch_engine=pitch_engine, vad=True,
+                                 runtime=RuntimeProfile({"threads": threads}))
+    else:
+        firewall = VoiceFirewall(backend="onnx", intra_op_threads=threads, pitch_engine=pitch_engine, vad=True)
+
+    np.random.seed(0)  # The dither noise in front of the model is the only randomness
+    result = {"backend": backend, "threads": threads, "pitch_engine": pitch_engine, "clips": {}}
+    for seconds, path in paths.items():
+        time_stages(firewall, path)  # Warm-up: lazy imports, pyin JIT, allocator
+        runs = [time_stages(firewall, path) for _ in range(repeats)]
+        stages = {stage: summarize([r[stage] for r in runs]) for stage in STAGES}
+        total = sum(r["analyze"] for r in runs)
+        result["clips"][f"{seconds:g}s"] = {
+            "stages": stages,
+            "clips_per_s": round(repeats / total, 3),
+            "audio_x_realtime": round(repeats * seconds / total, 2),
+        }
+        slowest = max(STAGES[:7], key=lambda s: stages[s]["p50_ms"])
+        print(f"   {backend:<5} x{threads:<2} {seconds:>5g}s | analyze p50 {stages['analyze']['p50_ms']:8.1f} ms "
+              f"p99 {stages['analyze']['p99_ms']:8.1f} ms | slowest stage: {slowest} "
+              f"({stages[slowest]['p50_ms']:.1f} ms)")
+    result["peak_rss_mb"] = round(peak_rss_mb() or 0.0, 1)
+    return result
+
+
+def _config_process(backend, threads, paths, repeats, pitch_engine, results):
+    """Runs one config in a fresh process, so its peak RSS isn't an earlier config's model."""
+    results.put(run_config(backend, threads, paths, repeats, pitch_engine))
+
+
+def _guarded(target, args, results):
+    try:
+        target(*args, results)
+    except (Exception, SystemExit) as e:  # VoiceFirewall exits(1) when a backend can't load
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_in_process(target, *args, poll=1.0):
+    """
+    Calls target(*args, results) in a fresh spawned process and returns what it put on `results`,
+    or {"error": ...} if it failed or died without a result.
+    """
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_guarded, args=(target, args, results))
+    process.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=poll)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                try:  # It may have put its result just before exiting
+                    return results.get(timeout=poll)
+                except queue.Empty:
+                    return {"error": f"process exited with code {process.exitcode}"}
+    finally:
+        process.join()
+
+
+def compare(report, baseline, tolerance):
+    """Returns human-readable regressions: p50 of any stage slower than baseline * (1 + tolerance)."""
+    old = {(c["backend"], c["threads"], c["pitch_engine"]): c for c in baseline["configs"]}
+    regressions = []
+    for config in report["configs"]:
+        ref = old.get((config["backend"], config["threads"], config["pitch_engine"]))
+        if ref is None or "error" in config or "error" in ref:
+            continue
+        for clip, data in config["clips"].items():
+            for stage, numbers in data["stages"].items():
+                before = ref["clips"].get(clip, {}).get("stages", {}).get(stage)
+                # Sub-millisecond stages are all noise
+                if before and before["p50_ms"] >= 1.0 and numbers["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+                    regressions.append(f"{config['backend']} x{config['threads']} {clip} {stage}: "
+                                       f"{before['p50_ms']:.1f} -> {numbers['p50_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency/throughput benchmark of the detection pipeline.")
+    parser.add_argument("--backends", default="torch", help="Comma-separated: torch,onnx")
+    parser.add_argument("--threads", default=str(os.cpu_count() or 1), help="Comma-separated thread counts, e.g. 1,2,4")
+    parser.add_argument("--lengths", default=",".join(f"{s:g}" for s in CLIP_SECONDS), help="Clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per clip (after one warm-up)")
+    parser.add_argument("--pitch-engine", default="pyin", choices=["pyin", "yin"])
+    parser.add_argument("--out", help="Write the JSON report here (use it later as a --compare baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to check against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    lengths = [float(s) for s in args.lengths.split(",")]
+    report = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count(), "processor": platform.processor()},
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "repeats": args.repeats,
+        "configs": [],
+    }
+
+    print("🎙️ Recorder snapshot path")
+    report["recorder"] = bench_recorder(max(args.repeats, 20))
+    for name, numbers in report["recorder"].items():
+        print(f"   {name:<16} p50 {numbers['p50_ms']:.3f} ms  p99 {numbers['p99_ms']:.3f} ms")
+
+    failed = []
+    with tempfile.TemporaryDirectory() as folder:
+        paths = make_clips(folder, lengths)
+        for backend in args.backends.split(","):
+            for threads in (int(n) for n in args.threads.split(",")):
+                print(f"⏱️  {backend} with {threads} thread(s)")
+                result = run_in_process(_config_process, backend, threads, paths, args.repeats, args.pitch_engine)
+                if "error" in result:
+                    print(f"   ❌ {backend} x{threads} failed: {result['error']}")
+                    failed.append(f"{backend} x{threads}")
+                    result = {"backend": backend, "threads": threads, "pitch_engine": args.pitch_engine, **result}
+                report["configs"].append(result)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+    if failed:
+        print(f"❌ {len(failed)} config(s) failed to run: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import time
+import asyncio
+import argparse
+import threading
+import numpy as np
+
+from audio_sources import open_source, RATE, CHUNK_SIZE
+
+QUEUE_CHUNKS = 128  # ~8 s of audio between capture and analysis before the oldest is dropped
+
+
+class DropOldestQueue(asyncio.Queue):
+    """
+    Bounded asyncio queue with explicit backpressure: when it is full, the oldest chunk is
+    thrown away to make room (the detector cares about what is being said now, not what was
+    said while it was busy). Losses are counted in `dropped`.
+    """
+
+    def __init__(self, maxsize=QUEUE_CHUNKS):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+
+    def put_latest(self, item):
+        while self.full():
+            self.get_nowait()
+            self.dropped += 1
+        self.put_nowait(item)
+
+
+class CapturePipeline:
+    """
+    source -> DropOldestQueue -> StreamingFirewall, driven by asyncio.
+
+    The source is read on its own thread (a PyAudio callback source just hands over chunks
+    as PortAudio delivers them). Each chunk wakes the analysis task immediately, so there is
+    no fixed polling interval and no work while nothing new has arrived. Analysis runs in an
+    executor so a slow model call never stalls capture; chunks that pile up meanwhile are
+    drained in one go, and only the oldest are dropped if the queue overflows.
+    """
+
+    def __init__(self, source, stream, queue_chunks=QUEUE_CHUNKS):
+        self.source = source
+        self.stream = stream
+        self.queue = DropOldestQueue(queue_chunks)
+        self.listeners = []
+        self.captured = 0   # Samples read from the source
+        self.analysed = 0   # Samples handed to the detector
+        self.error = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _capture(self, loop):
+        """Capture thread: blocking reads, handed to the event loop as they arrive."""
+        try:
+            self.source.open()
+            while not self._stop.is_set():
+                chunk = self.source.read()
+                if chunk is None:
+                    break
+                self.captured += len(chunk)
+                loop.call_soon_threadsafe(self.queue.put_latest, chunk)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Capture Error ({self.source.name}): {self.error}")
+        finally:
+            self.source.close()
+            loop.call_soon_threadsafe(self.queue.put_latest, None)  # End-of-stream marker
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        capture = threading.Thread(target=self._capture, args=(loop,), name=f"capture-{self.source.name}", daemon=True)
+        capture.start()
+
+        done = False
+        while not done:
+            chunks = [await self.queue.get()]
+            while not self.queue.empty():  # Everything that piled up while we were busy
+                chunks.append(self.queue.get_nowait())
+            if chunks[-1] is None:
+                done = True
+                chunks.pop()
+            if not chunks:
+                continue
+
+            samples = np.concatenate(chunks)
+            self.analysed += len(samples)
+            arrived = time.perf_counter()
+            verdict = await loop.run_in_executor(None, self.stream.push, samples)
+            if verdict is not None:
+                self.publish(verdict, time.perf_counter() - arrived)
+
+        self.stop()
+        capture.join(timeout=1.0)
+
+    def publish(self, verdict, latency):
+        label, score = verdict
+        for listener in self.listeners:
+            listener(label, score, latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-driven live capture -> Voice Firewall.")
+    parser.add_argument("source", nargs="?", default="device",
+                        help="device[:N] | file:PATH | tcp:HOST:PORT | synthetic[:F0]")
+    parser.add_argument("--queue-chunks", type=int, default=QUEUE_CHUNKS,
+                        help=f"Chunks ({CHUNK_SIZE} samples each) buffered before the oldest is dropped")
+    parser.add_argument("--seconds", type=float, help="Stop after this much captured audio")
+    args = parser.parse_args()
+
+    from model_registry import get_firewall
+    from stream_detector import StreamingFirewall
+
+    pipeline = CapturePipeline(open_source(args.source), StreamingFirewall(get_firewall()), args.queue_chunks)
+    pipeline.listeners.append(lambda label, score, latency: print(
+        f"{time.strftime('%H:%M:%S')} | {'🔴' if label == 'FAKE' else '🟢'} {label:<7} ({score:.2f}) "
+        f"{latency * 1000:.0f} ms | queue {pipeline.queue.qsize()} | dropped {pipeline.queue.dropped}"))
+    if args.seconds:
+        pipeline.listeners.append(lambda *_: pipeline.captured >= args.seconds * RATE and pipeline.stop())
+
+    print(f"🎙️ Listening on {args.source} (Ctrl+C to stop)")
+    try:
+        asyncio.run(pipeline.run())
+    except KeyboardInterrupt:
+        pipeline.stop()
+    print(f"   {pipeline.analysed / RATE:.1f}s analysed, {pipeline.queue.dropped} chunks dropped")
+
+
+if __name__ == "__main__":
+    main()
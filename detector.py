@@ -6,6 +6,8 @@ import torch.nn.functional as F
 import os
 import warnings
 
+from fusion import ScoreFusion
+
 warnings.filterwarnings("ignore")
 
 MODEL_PATH = "./models/deepfake_detector"
@@ -20,6 +22,9 @@ class DeepFakeDetector:
             self.device = torch.device("cpu")
             self.model.to(self.device)
             self.model.eval()
+            # Always the rule cascade: a fitted fusion is calibrated on detector_v3's pipeline and
+            # physics features, neither of which this detector has (see VoiceFirewall._load_fusion)
+            self.fusion = ScoreFusion()
             print(" ✅ Done!")
         except Exception as e:
             print(f"\n❌ Error: {e}")
@@ -68,11 +73,9 @@ class DeepFakeDetector:
             fake_score = probs[0][1].item()
             real_score = probs[0][0].item()
 
-            # 4. Verdict (Using a safer threshold)
-            if fake_score > 0.85:  # Must be VERY sure to call it Fake
-                return "FAKE", fake_score
-            else:
-                return "REAL", real_score
+            # 4. Verdict (no physics here: the override never fires)
+            label, score, _ = self.fusion.decide(fake_score, real_score, {})
+            return label, score
 
         except Exception as e:
             print(f"Analysis Error: {e}")
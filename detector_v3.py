@@ -1,108 +1,693 @@
-import torch
-import librosa
 import numpy as np
-from transformers import AutoModelForAudioClassification, AutoFeatureExtractor
-import torch.nn.functional as F
 import os
+import itertools
 import warnings
 
+import physics
+import vad as speech_vad
+import wav_loader
+import instrumentation as metrics
+from fusion import ScoreFusion
+from fast_frontend import FastFrontend, DITHER
+from exit_heads import ExitHeads, HEADS_PATH as EXIT_HEADS_PATH
+from runtime_profile import RuntimeProfile
+from verdict_cache import model_revision, audio_key
+
 # Suppress warnings for cleaner terminal output
 warnings.filterwarnings("ignore")
 
+# torch, transformers and librosa are imported where they are first needed, so importing this
+# module is cheap and the ONNX backend never loads PyTorch. See model_registry.py for sharing.
+
 MODEL_PATH = "./models/deepfake_detector"
+TARGET_SR = 16000
+MAX_CLIP_SAMPLES = TARGET_SR * 4  # The model only ever sees the first 4 seconds
+ONNX_DIR = os.path.join(MODEL_PATH, "onnx")  # Written by export_onnx.py, wiped along with the model
+ONNX_MODEL = os.path.join(ONNX_DIR, "model.int8.onnx")
+ONNX_FP32_MODEL = os.path.join(ONNX_DIR, "model.onnx")  # What export_onnx.py --no-quantize leaves
+STUDENT_DIR = os.path.join(MODEL_PATH, "student")  # Written by distill.py, from (and wiped with) this teacher
+
+# Long recordings (see VoiceFirewall.analyze_long)
+LONG_WINDOW_SECONDS = MAX_CLIP_SAMPLES / TARGET_SR  # One model input per window, nothing truncated
+LONG_HOP_SECONDS = 2.0       # 50% overlap, so every moment is heard by two windows
+DECODE_BLOCK_SECONDS = 10.0  # Audio decoded at a time: memory is bounded by this, not the file length
+
+# Per-clip "[Debug] AI Score" lines. Off by default; aggregate numbers live in instrumentation.py
+DEBUG = os.getenv("VOICEFIREWALL_DEBUG", "") not in ("", "0")
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(logits)
+    return e / e.sum(axis=-1, keepdims=True)
 
 
 class VoiceFirewall:
-    def __init__(self):
+    def __init__(self, backend="torch", onnx_path=None, intra_op_threads=None, inter_op_threads=None,
+                 pitch_engine="pyin", cache=None, vad=True, fusion=None, runtime=None, adaptive_depth=False):
+        """
+        backend="torch" runs the HuggingFace model. backend="onnx" runs the graph exported by
+        export_onnx.py through onnxruntime (no PyTorch weights are loaded); the thread counts
+        are passed to its session (None = this instance's share of the cores, see `runtime`).
+        onnx_path defaults to the int8 graph, or the FP32 one if only that was exported.
+        backend="student" runs the small log-mel CNN distilled from the model by distill.py
+        (no transformers model or feature extractor is loaded).
+        pitch_engine picks the physics-layer tracker: "pyin" (accurate) or "yin" (fast, see physics.py).
+        cache: optional verdict_cache.VerdictCache; repeated clips are then answered from disk.
+        vad: trim non-speech and skip clips that are mostly silence / hold music / noise (see vad.py).
+        fusion: fusion.ScoreFusion turning model + physics evidence into a verdict. Defaults to the
+        fitted one in models/fusion.json, or the original threshold cascade if none was fitted for this model and pitch engine.
+        runtime: runtime_profile.RuntimeProfile (thread counts, core pinning, inference_mode/compile).
+        Defaults to the calibrated models/runtime_profile.json, or one instance on every core.
+        adaptive_depth: torch backend only; stop the forward pass at an intermediate layer once the
+        exit head fitted there is confident (see exit_heads.py). Needs `python exit_heads.py fit`.
+        """
         print("🛡️  Initializing Firewall Logic...", end="")
         try:
-            self.feature_extractor = AutoFeatureExtractor.from_pretrained(MODEL_PATH)
-            self.model = AutoModelForAudioClassification.from_pretrained(MODEL_PATH)
-            self.device = torch.device("cpu")
-            self.model.to(self.device)
-            self.model.eval()
+            self.backend = backend
+            self.pitch_tracker = physics.get_pitch_engine(pitch_engine)
+            self.last_report = {}
+            self.cache = cache
+            self.runtime = runtime if runtime is not None else RuntimeProfile.load()
+            if backend == "onnx" and onnx_path is None:
+                onnx_path = ONNX_MODEL if os.path.exists(ONNX_MODEL) or not os.path.exists(ONNX_FP32_MODEL) \
+                    else ONNX_FP32_MODEL
+            model = model_revision(STUDENT_DIR if backend == "student" else MODEL_PATH,
+                                   [onnx_path] if backend == "onnx" else ())
+            self.fusion = fusion if fusion is not None else self._load_fusion(model, pitch_engine)
+            # Everything besides the audio that a cached verdict depends on
+            self.cache_config = {
+                "model": model,
+                "backend": backend, "pitch_engine": pitch_engine,
+                "fusion": self.fusion.fingerprint(),
+                "vad": speech_vad.MIN_SPEECH_RATIO if vad else None,
+            }
+            self.vad = vad
+            self.feature_extractor = None
+            self.frontend = None
+            self.exit_heads = None
+            self.device = None
+            self.runtime.apply_process()
+            if backend in ("torch", "onnx"):
+                from transformers import AutoFeatureExtractor
+
+                self.feature_extractor = AutoFeatureExtractor.from_pretrained(MODEL_PATH)
+                # Vectorised, same-output replacement for the extractor call (None = keep the extractor)
+                self.frontend = FastFrontend.for_extractor(self.feature_extractor, MAX_CLIP_SAMPLES)
+            if backend == "student":
+                from student_model import load_student
+
+                self.model, self.config = load_student(STUDENT_DIR)
+                self.model = self.runtime.prepare_model(self.model)
+            elif backend == "onnx":
+                from transformers import AutoConfig
+
+                self.config = AutoConfig.from_pretrained(MODEL_PATH)
+                self.session = self._onnx_session(
+                    onnx_path, intra_op_threads or self.runtime.threads_per_instance(), inter_op_threads)
+                self.model = None
+            elif backend == "torch":
+                import torch
+                from transformers import AutoModelForAudioClassification
+
+                self.device = torch.device("cpu")
+                self.model = AutoModelForAudioClassification.from_pretrained(MODEL_PATH)
+                self.model.to(self.device)
+                self.model.eval()
+                self.config = self.model.config
+                self.model = self.runtime.prepare_model(self.model)
+                if adaptive_depth:
+                    self.exit_heads = self._load_exit_heads()
+            else:
+                raise ValueError(f"Unknown backend '{backend}' (expected 'torch', 'onnx' or 'student')")
             print(" ✅ Done!")
         except Exception as e:
             print(f"\n❌ CRITICAL ERROR: {e}")
             exit(1)
 
+    @staticmethod
+    def _load_fusion(model, pitch_engine):
+        """The fitted fusion if it was fit on this model (and backend) and pitch engine, else the rule cascade."""
+        fusion = ScoreFusion.load()
+        reason = fusion.mismatch(model, pitch_engine)
+        if reason is not None:
+            print(f"\n   ⚠️  The score fusion was fit on {reason} (refit it), using the rules", end="")
+            return ScoreFusion()
+        return fusion
+
+    def _load_exit_heads(self):
+        """The fitted exit heads for this model, or None (full depth) if there are none / they are stale."""
+        heads = ExitHeads.load()
+        if heads is None:
+            print(f"\n   ⚠️  No exit heads at {EXIT_HEADS_PATH} (run exit_heads.py fit), running full depth", end="")
+            return None
+        if heads.config.get("model") != self.cache_config["model"]:
+            print("\n   ⚠️  Exit heads were fit on a different model (refit them), running full depth", end="")
+            return None
+        heads.attach(self.model)
+        self.cache_config["depth"] = heads.fingerprint()
+        return heads
+
+    @staticmethod
+    def _onnx_session(onnx_path, intra_op_threads=None, inter_op_threads=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"{onnx_path} not found (run export_onnx.py first)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        return ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
     def get_jitter(self, y):
         """Calculates Vocal Jitter (Micro-tremors in pitch). Humans have it. AI is perfect."""
         try:
-            f0, voiced_flag, _ = librosa.pyin(y, fmin=60, fmax=500)  # Human Voice Range
-            f0 = f0[voiced_flag]
-            if len(f0) < 5: return 0.0
-            jitter = np.mean(np.abs(np.diff(f0))) / np.mean(f0)
-            return jitter
+            return self.jitter_from_f0(self.voiced_f0(y))
         except:
             return 0.0
 
+    def voice_features(self, y):
+        """Pitch and peak amplitude of the voiced frames only (the raw material for jitter/shimmer)."""
+        with metrics.timer("stage_seconds", stage="physics"):
+            f0, voiced_flag, amp = self.pitch_tracker(y, TARGET_SR)
+        return f0[voiced_flag], amp[voiced_flag]
+
+    def voiced_f0(self, y):
+        return self.voice_features(y)[0]
+
+    @staticmethod
+    def jitter_from_f0(f0):
+        return physics.jitter(f0)
+
+    def prepare_audio(self, samples, sr=TARGET_SR):
+        """Mono float32 at 16 kHz. Only resamples when the input is at another rate."""
+        y = np.asarray(samples, dtype=np.float32)
+        if y.ndim > 1 or sr != TARGET_SR:
+            import librosa
+            with metrics.timer("stage_seconds", stage="resample"):
+                if y.ndim > 1:
+                    y = librosa.to_mono(y)
+                if sr != TARGET_SR:
+                    y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR)
+        return y
+
+    def load_clip(self, clip):
+        """Accepts a file path, a 16 kHz array, or an (array, sr) tuple."""
+        if isinstance(clip, (str, os.PathLike)):
+            if not os.path.exists(clip):
+                raise FileNotFoundError(clip)
+            with metrics.timer("stage_seconds", stage="load"):
+                return wav_loader.load(clip, TARGET_SR)  # Memory-mapped for PCM WAV, librosa otherwise
+        if isinstance(clip, tuple):
+            return self.prepare_audio(*clip)
+        return self.prepare_audio(clip)
+
+    @staticmethod
+    def is_silent(y):
+        return y.size == 0 or np.max(np.abs(y)) < 0.01
+
+    def speech_gate(self, y):
+        """
+        (speech_ratio, speech_audio). speech_audio is None when there is too little speech to
+        be worth the pitch tracker and the model; otherwise it is y with non-speech cut out.
+        """
+        if not self.vad:
+            return 1.0, y
+        with metrics.timer("stage_seconds", stage="vad"):
+            return speech_vad.gate(y, TARGET_SR)
+
+    def model_inputs(self, clips):
+        """
+        Model-ready inputs for a list of 16 kHz clips: NumPy arrays for ONNX, tensors for torch.
+        Each clip is truncated to 4 s and gets the same tiny dither as always, so loopback
+        audio doesn't look "too perfect" to the AI.
+        """
+        if self.frontend is not None:
+            inputs = self.frontend(clips, dither=DITHER)
+        else:
+            noisy = [y + np.random.normal(0, DITHER, y.shape) for y in clips]
+            inputs = self.feature_extractor(
+                noisy, sampling_rate=TARGET_SR, return_tensors="np",
+                padding=True, truncation=True, max_length=MAX_CLIP_SAMPLES
+            )
+        if self.backend == "onnx":
+            return inputs
+        import torch
+        return {k: torch.from_numpy(v).to(self.device) for k, v in inputs.items()}
+
+    def model_probs(self, clips):
+        """
+        One forward pass over a list of 16 kHz clips (each truncated to 4 s).
+        Returns a (len(clips), num_labels) array of softmax probabilities.
+        """
+        return self.model_probs_and_depth(clips)[0]
+
+    def model_probs_and_depth(self, clips):
+        """
+        model_probs(), plus the encoder layer each clip's verdict was taken at (adaptive depth; None
+        without exit heads). The batch itself runs until its last clip exits, i.e. max() of these.
+        Returned rather than stored, since threads share this firewall.
+        """
+        metrics.observe("batch_size", len(clips), buckets=metrics.SIZE_BUCKETS)
+        self.runtime.bind_thread()  # This thread's share of the cores (see runtime_profile.py)
+
+        if self.backend == "student":
+            from student_model import pad_batch
+
+            with metrics.timer("stage_seconds", stage="features"):
+                waves, lengths = pad_batch([y + np.random.normal(0, DITHER, y.shape) for y in clips])
+            with metrics.timer("stage_seconds", stage="inference"), self.runtime.inference_context():
+                logits = self.model(waves, lengths)
+            return softmax(logits.numpy()), None
+
+        with metrics.timer("stage_seconds", stage="features"):
+            inputs = self.model_inputs(clips)
+
+        if self.backend == "onnx":
+            feed = {i.name: inputs[i.name] for i in self.session.get_inputs()}
+            with metrics.timer("stage_seconds", stage="inference"):
+                logits = self.session.run(None, feed)[0]
+            return softmax(logits), None
+
+        if self.exit_heads is not None:
+            with metrics.timer("stage_seconds", stage="inference"), self.runtime.inference_context():
+                probs, depth = self.exit_heads.run(self.model, inputs)
+            # Where each verdict was taken, and how deep the batch really ran (until its last clip exited)
+            for layer in depth:
+                metrics.inc("exit_layer_total", layer=str(layer))
+            metrics.inc("forward_layers_total", layers=str(max(depth)))
+            return probs, depth
+
+        with metrics.timer("stage_seconds", stage="inference"), self.runtime.inference_context():
+            logits = self.model(**inputs).logits
+        return softmax(logits.cpu().numpy()), None
+
+    @staticmethod
+    def _depth(depth, i):
+        """
+        {"exit_layer": layer clip i's verdict came from, "batch_layers": layers its batch actually
+        ran} from model_probs_and_depth(); {} without exit heads.
+        """
+        return {"exit_layer": depth[i], "batch_layers": max(depth)} if depth is not None else {}
+
+    def label_probs(self, probs):
+        """ROBUST LABEL DECODING (The Fix for 0.0%). Returns (fake_prob, real_prob) for one clip."""
+        id2label = self.config.id2label
+        fake_prob = 0.0
+        real_prob = 0.0
+
+        # Try to read names
+        for idx, label in id2label.items():
+            lbl = label.lower()
+            if "spoof" in lbl or "fake" in lbl:
+                fake_prob = float(probs[int(idx)])
+            elif "bonafide" in lbl or "real" in lbl:
+                real_prob = float(probs[int(idx)])
+
+        # FALLBACK: If names failed (both 0.0), assume Index 1 is FAKE (Standard)
+        if fake_prob == 0.0 and real_prob == 0.0:
+            fake_prob = float(probs[1])
+            real_prob = float(probs[0])
+
+        return fake_prob, real_prob
+
+    def decide(self, fake_prob, real_prob, jitter, verbose=False, shimmer=None, flatness=None):
+        """Final verdict from the model's probabilities and the physics evidence (see fusion.py)."""
+        metrics.observe("fake_prob", fake_prob, buckets=metrics.SCORE_BUCKETS)
+        label, score, reason = self.fusion.decide(
+            fake_prob, real_prob, {"jitter": jitter, "shimmer": shimmer, "flatness": flatness})
+        if reason == "override":
+            if verbose:
+                print("   ⚠️  AI Hallucination detected! Physics Override engaged.")
+            metrics.inc("physics_overrides_total")
+        return label, score
+
+    def cheap_features(self, y):
+        """Evidence available before the model runs: jitter, shimmer and speech-band spectral flatness."""
+        jitter, shimmer = self._physics(y)
+        flatness = float(np.median(speech_vad.frame_features(y, TARGET_SR)[1])) if len(y) else 0.0
+        return {"jitter": jitter, "shimmer": shimmer, "flatness": flatness}
+
+    def early_exit(self, features):
+        """(label, score) if the fusion can decide from the cheap features alone, else None."""
+        verdict = self.fusion.early_exit(features)
+        if verdict is not None:
+            metrics.inc("early_exits_total", label=verdict[0])
+        return verdict
+
+    def evidence(self, clip):
+        """
+        Everything the fusion looks at for one clip: {"model": P(fake), "jitter", "shimmer",
+        "flatness"}. None for silence / no speech. Used by `python fusion.py fit`.
+        """
+        try:
+            y = self.load_clip(clip)
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            return None
+        if self.is_silent(y):
+            return None
+        _, y = self.speech_gate(y)
+        if y is None:
+            return None
+        features = self.cheap_features(y)
+        features["model"] = self.label_probs(self.model_probs([y])[0])[0]
+        return features
+
     def analyze(self, audio_path):
         if not os.path.exists(audio_path):
             return "ERROR", 0.0
 
         try:
-            # 1. LOAD AUDIO
-            y, sr = librosa.load(audio_path, sr=16000, mono=True)
+            # 1. LOAD AUDIO (memory-mapped for PCM WAV, librosa otherwise)
+            with metrics.timer("stage_seconds", stage="load"):
+                y, sr = wav_loader.load(audio_path, TARGET_SR), TARGET_SR
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            metrics.inc("verdicts_total", label="ERROR")
+            return "ERROR", 0.0
+
+        return self.analyze_array(y, sr)
+
+    def analyze_array(self, samples, sr=TARGET_SR):
+        """
+        Same verdict as analyze(), but for audio that is already in memory
+        (e.g. the live recorder buffer). No disk I/O, and no resampling when sr is 16 kHz.
+        """
+        with metrics.timer("analyze_seconds"):
+            label, score = self._analyze_array(samples, sr)
+        metrics.inc("verdicts_total", label=label)
+        return label, score
+
+    def _analyze_array(self, samples, sr):
+        try:
+            y = self.prepare_audio(samples, sr)
 
             # Check for Silence
-            if np.max(np.abs(y)) < 0.01:
+            if self.is_silent(y):
+                return "SILENCE", 0.0
+
+            # Seen this exact audio before?
+            key = None
+            if self.cache is not None:
+                key = audio_key(y, self.cache_config)
+                cached = self.cache.get(key)
+                metrics.inc("cache_lookups_total", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    self.last_report = cached
+                    return cached["label"], cached["score"]
+
+            # VAD GATE: hold music, tones and background noise never reach the expensive stages
+            speech_ratio, y = self.speech_gate(y)
+            if y is None:
+                self.last_report = {"label": "SILENCE", "score": 0.0, "speech_ratio": speech_ratio}
                 return "SILENCE", 0.0
 
-            # 2. PHYSICS CHECK (Jitter)
-            jitter = self.get_jitter(y)
-            # Human range is typically 0.005 to 0.05. AI is often < 0.002.
-            is_physically_human = (jitter > 0.005)
+            # 2. PHYSICS CHECK (Jitter + Shimmer from one pitch-tracking pass, spectral flatness)
+            features = self.cheap_features(y)
+
+            # Confident enough without the model? (Only with a fitted fusion, see fusion.py)
+            early = self.early_exit(features)
+            if early is not None:
+                label, score = early
+                self.last_report = {"label": label, "score": score, **features,
+                                    "speech_ratio": speech_ratio, "early_exit": True}
+                if key is not None:
+                    self.cache.put(key, self.last_report)
+                return label, score
 
             # 3. AI INFERENCE
-            # Hack: Add tiny noise so Loopback doesn't look "too perfect" to the AI
-            y_noisy = y + np.random.normal(0, 0.001, y.shape)
+            probs, depth = self.model_probs_and_depth([y])
+            fake_prob, real_prob = self.label_probs(probs[0])
 
-            inputs = self.feature_extractor(
-                y_noisy, sampling_rate=16000, return_tensors="pt",
-                padding=True, truncation=True, max_length=16000 * 4
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-            with torch.no_grad():
-                logits = self.model(**inputs).logits
-            probs = F.softmax(logits, dim=-1)
-
-            # 4. ROBUST LABEL DECODING (The Fix for 0.0%)
-            id2label = self.model.config.id2label
-            fake_prob = 0.0
-            real_prob = 0.0
-
-            # Try to read names
-            for idx, label in id2label.items():
-                lbl = label.lower()
-                if "spoof" in lbl or "fake" in lbl:
-                    fake_prob = probs[0][idx].item()
-                elif "bonafide" in lbl or "real" in lbl:
-                    real_prob = probs[0][idx].item()
-
-            # FALLBACK: If names failed (both 0.0), assume Index 1 is FAKE (Standard)
-            if fake_prob == 0.0 and real_prob == 0.0:
-                fake_prob = probs[0][1].item()
-                real_prob = probs[0][0].item()
-
-            # 5. FINAL DECISION LOGIC
-            print(f"   [Debug] AI Score: {fake_prob * 100:.1f}% Fake | Physics Jitter: {jitter:.5f}")
-
-            # CASE A: AI says FAKE, but Physics says HUMAN
-            if fake_prob > 0.50 and is_physically_human:
-                print("   ⚠️  AI Hallucination detected! Physics Override engaged.")
-                return "REAL", 0.95  # Force high confidence
+            # 4. FINAL DECISION LOGIC
+            if DEBUG:
+                print(f"   [Debug] AI Score: {fake_prob * 100:.1f}% Fake | Physics Jitter: {features['jitter']:.5f}")
+            with metrics.timer("stage_seconds", stage="decision"):
+                label, score = self.decide(fake_prob, real_prob, features["jitter"], verbose=DEBUG,
+                                           shimmer=features["shimmer"], flatness=features["flatness"])
+            self.last_report = {"label": label, "score": score, "fake_prob": fake_prob, "real_prob": real_prob,
+                                **features, "speech_ratio": speech_ratio, "early_exit": False, **self._depth(depth, 0)}
+            if key is not None:
+                self.cache.put(key, self.last_report)
+            return label, score
+
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            return "ERROR", 0.0
+
+    def analyze_batch(self, clips, batch_size=8):
+        """
+        Bulk version of analyze(). `clips` may mix file paths, 16 kHz arrays and (array, sr) tuples.
+        Clips are grouped by length so each batch needs little or no padding, and each batch is a
+        single forward pass. Returns one (label, score) tuple per clip, in input order.
+        """
+        results = [("ERROR", 0.0)] * len(clips)
+        pending = []  # (input index, speech audio, cheap features, cache key, speech ratio)
+
+        for i, clip in enumerate(clips):
+            try:
+                y = self.load_clip(clip)
+                if self.is_silent(y):
+                    results[i] = ("SILENCE", 0.0)
+                    continue
+                key = None
+                if self.cache is not None:
+                    key = audio_key(y, self.cache_config)
+                    cached = self.cache.get(key)
+                    metrics.inc("cache_lookups_total", result="miss" if cached is None else "hit")
+                    if cached is not None:
+                        results[i] = (cached["label"], cached["score"])
+                        continue
+                speech_ratio, y = self.speech_gate(y)
+                if y is None:
+                    results[i] = ("SILENCE", 0.0)
+                    continue
+                features = self.cheap_features(y)
+                early = self.early_exit(features)
+                if early is not None:
+                    results[i] = early
+                    if key is not None:
+                        self.cache.put(key, {"label": early[0], "score": early[1], **features,
+                                             "speech_ratio": speech_ratio, "early_exit": True})
+                    continue
+                pending.append((i, y, features, key, speech_ratio))
+            except Exception as e:
+                print(f"Analysis Error: {e}")
+
+        for batch in self._length_buckets(pending, batch_size):
+            try:
+                probs, depth = self.model_probs_and_depth([item[1] for item in batch])
+            except Exception as e:
+                print(f"Analysis Error: {e}")
+                continue
 
-            # CASE B: Standard AI Decision
-            if fake_prob > 0.80:
-                return "FAKE", fake_prob
+            for j, ((i, _, features, key, speech_ratio), row) in enumerate(zip(batch, probs)):
+                fake_prob, real_prob = self.label_probs(row)
+                with metrics.timer("stage_seconds", stage="decision"):
+                    label, score = self.decide(fake_prob, real_prob, features["jitter"],
+                                               shimmer=features["shimmer"], flatness=features["flatness"])
+                results[i] = (label, score)
+                if key is not None:
+                    self.cache.put(key, {"label": label, "score": score, "fake_prob": fake_prob, "real_prob": real_prob,
+                                         **features, "speech_ratio": speech_ratio, "early_exit": False,
+                                         **self._depth(depth, j)})
+
+        for label, _ in results:
+            metrics.inc("verdicts_total", label=label)
+        return results
+
+    def stream_audio(self, clip, block_seconds=DECODE_BLOCK_SECONDS):
+        """
+        Yields `clip` as consecutive 16 kHz mono float32 blocks without ever decoding the whole
+        recording: PCM WAVs are sliced straight out of a memory map (wav_loader.py), other files
+        are read block by block, and both are resampled with a streaming resampler if needed.
+        Arrays and (array, sr) tuples are simply sliced. Formats soundfile can't stream
+        (e.g. m4a) fall back to a full librosa.load.
+        """
+        if not isinstance(clip, (str, os.PathLike)):
+            y = self.load_clip(clip)
+            step = int(TARGET_SR * block_seconds)
+            for i in range(0, len(y), step):
+                yield y[i:i + step]
+            return
+
+        if not os.path.exists(clip):
+            raise FileNotFoundError(clip)
+        if wav_loader.wav_layout(clip) is not None:
+            yield from wav_loader.iter_blocks(clip, block_seconds, TARGET_SR)
+            return
+        import librosa
+
+        frame = 4096
+        try:
+            sr = librosa.get_samplerate(clip)
+            blocks = librosa.stream(clip, block_length=max(1, int(sr * block_seconds) // frame),
+                                    frame_length=frame, hop_length=frame, mono=True)
+            first = next(blocks, None)
+        except Exception:
+            yield from self.stream_audio((self.load_clip(clip), TARGET_SR), block_seconds)
+            return
+        if first is None:
+            return
+
+        if sr == TARGET_SR:
+            yield first
+            yield from blocks
+            return
+
+        try:
+            import soxr
+            resampler = soxr.ResampleStream(sr, TARGET_SR, 1, dtype="float32")
+        except ImportError:
+            resampler = None
+        for block in itertools.chain([first], blocks):
+            if resampler is None:
+                yield librosa.resample(block, orig_sr=sr, target_sr=TARGET_SR)
             else:
-                return "REAL", real_prob
+                yield resampler.resample_chunk(block)
+        if resampler is not None:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    def analyze_long(self, clip, window_seconds=LONG_WINDOW_SECONDS, hop_seconds=LONG_HOP_SECONDS, batch_size=8):
+        """
+        Whole-recording verdict for audio of any length (analyze() only ever scores the first 4 s).
+        The clip is decoded in bounded blocks and cut into overlapping windows; each window gets
+        its own physics check and model score, windows are scored in batches, and the aggregate
+        verdict combines every voiced window's verdict (see ScoreFusion.combine), early exits
+        included. Memory stays flat however long the recording is.
+
+        Returns (label, score, report): the report is the aggregate plus a "windows" timeline,
+        one {"start", "end", "label", "score", ...} entry per window, in seconds. It is returned
+        rather than read from last_report, which other threads sharing this firewall overwrite.
+        With a verdict cache, each window's verdict is cached, so a repeated upload skips the model.
+        The VAD decides which windows are worth scoring, but voiced windows go to the model
+        whole (not trimmed), so they all share one length and batch together.
+        """
+        window = int(TARGET_SR * window_seconds)
+        hop = int(TARGET_SR * hop_seconds)
+        timeline, pending = [], []
+        buf = np.zeros(0, dtype=np.float32)
+        offset = 0  # Sample index of buf[0] within the recording
+        # Windows go to the model untrimmed, unlike analyze(): keep their cache entries apart
+        window_config = {**self.cache_config, "long_window": True}
+
+        def add_window(y, start):
+            entry = {"start": round(start / TARGET_SR, 3), "end": round((start + len(y)) / TARGET_SR, 3),
+                     "label": "SILENCE", "score": 0.0}
+            timeline.append(entry)
+            if self.is_silent(y):
+                return
+            key = None
+            if self.cache is not None:
+                key = audio_key(y, window_config)
+                cached = self.cache.get(key)
+                metrics.inc("cache_lookups_total", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    entry.update(cached)
+                    return
+            speech_ratio, speech = self.speech_gate(y)
+            entry["speech_ratio"] = speech_ratio
+            if speech is None:
+                return
+            features = self.cheap_features(speech)
+            entry.update(features)
+            early = self.early_exit(features)
+            if early is not None:
+                entry.update(label=early[0], score=early[1], early_exit=True)
+                cache_window(key, entry)
+                return
+            pending.append((len(timeline) - 1, y, features, key, speech_ratio))
+
+        def cache_window(key, entry):
+            if key is not None:
+                self.cache.put(key, {k: v for k, v in entry.items() if k not in ("start", "end")})
 
+        def score_pending():
+            for batch in self._length_buckets(pending, batch_size):
+                probs, depth = self.model_probs_and_depth([item[1] for item in batch])
+                for j, ((i, _, features, key, _), row) in enumerate(zip(batch, probs)):
+                    fake_prob, real_prob = self.label_probs(row)
+                    label, score = self.decide(fake_prob, real_prob, features["jitter"],
+                                               shimmer=features["shimmer"], flatness=features["flatness"])
+                    timeline[i].update(label=label, score=score, fake_prob=fake_prob, real_prob=real_prob,
+                                       early_exit=False, **self._depth(depth, j))
+                    cache_window(key, timeline[i])
+            pending.clear()
+
+        try:
+            for block in self.stream_audio(clip):
+                buf = np.concatenate([buf, block])
+                while len(buf) >= window:
+                    add_window(buf[:window], offset)
+                    buf = buf[hop:]
+                    offset += hop
+                    if len(pending) >= batch_size:
+                        score_pending()
+
+            # Audio after the last full window (or a recording shorter than one window)
+            uncovered = len(buf) - (window - hop) if timeline else len(buf)
+            if uncovered > 0:
+                add_window(buf, offset)
+            score_pending()
         except Exception as e:
             print(f"Analysis Error: {e}")
-            return "ERROR", 0.0
+            self.last_report = {"label": "ERROR", "score": 0.0, "windows": timeline}
+            return "ERROR", 0.0, self.last_report
+
+        voiced = [w for w in timeline if "jitter" in w]
+        seconds = round((offset + len(buf)) / TARGET_SR, 3)
+        if not voiced:
+            self.last_report = {"label": "SILENCE", "score": 0.0, "seconds": seconds, "windows": timeline}
+            return "SILENCE", 0.0, self.last_report
+
+        features = {k: float(np.median([w[k] for w in voiced])) for k in ("jitter", "shimmer", "flatness")}
+        modelled = [w for w in voiced if "fake_prob" in w]
+        # Each window already has its own physics-aware verdict: every voiced one counts, early exits too
+        label, score = self.fusion.combine([(w["label"], w["score"]) for w in voiced])
+        # The model's own view, over the windows it scored (None if every window exited early)
+        fake_prob = float(np.mean([w["fake_prob"] for w in modelled])) if modelled else None
+        real_prob = float(np.mean([w["real_prob"] for w in modelled])) if modelled else None
+        report = {"label": label, "score": score, "fake_prob": fake_prob, "real_prob": real_prob,
+                  **features, "speech_ratio": len(voiced) / len(timeline),
+                  "fake_windows": sum(w["label"] == "FAKE" for w in voiced),
+                  "early_exit_windows": len(voiced) - len(modelled),
+                  "seconds": seconds, "windows": timeline}
+        self.last_report = report
+        metrics.inc("verdicts_total", label=label)
+        return label, score, report
+
+    def _physics(self, y):
+        """(jitter, shimmer) from one pitch-tracking pass; (0, 0) if tracking fails."""
+        try:
+            f0, amp = self.voice_features(y)
+            return physics.jitter(f0), physics.shimmer(amp)
+        except Exception:
+            return 0.0, 0.0
+
+    def _length_buckets(self, pending, batch_size):
+        # Everything past 4 s is truncated anyway, so sort on the length the model actually sees.
+        pending = sorted(pending, key=lambda item: min(len(item[1]), MAX_CLIP_SAMPLES))
+
+        # Without an attention mask the model would "hear" the zero padding,
+        # so only clips of identical (truncated) length may share a batch. (The student masks its own.)
+        exact = self.backend != "student" and not getattr(self.feature_extractor, "return_attention_mask", False)
+
+        batch = []
+        for item in pending:
+            length = min(len(item[1]), MAX_CLIP_SAMPLES)
+            if batch and (len(batch) == batch_size or
+                          (exact and min(len(batch[-1][1]), MAX_CLIP_SAMPLES) != length)):
+                yield batch
+                batch = []
+            batch.append(item)
+        if batch:
+            yield batch
 
 
 # --- RUN TEST ---
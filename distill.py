@@ -0,0 +1,245 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from detector_v3 import VoiceFirewall, MODEL_PATH, STUDENT_DIR, MAX_CLIP_SAMPLES
+from fusion import labelled_files
+
+CROPS_PER_FILE = 4     # Random 4 s crops per recording (plus the first 4 s) the teacher labels
+TEMPERATURE = 2.0      # Softens the teacher's probabilities so the student also learns its "dark knowledge"
+ALPHA = 0.7            # Weight of the teacher term vs. the hard labels (where a clip has one)
+EPOCHS = 30
+BATCH = 32
+LEARNING_RATE = 2e-3
+HOLDOUT = 0.1          # Share of recordings kept out of training to pick the best epoch
+
+
+def label_index(firewall):
+    """(fake index, real index) in the teacher's output, resolved the same way label_probs() does."""
+    n = len(firewall.config.id2label)
+    fake = max(range(n), key=lambda i: firewall.label_probs(np.eye(n)[i])[0])
+    real = max(range(n), key=lambda i: firewall.label_probs(np.eye(n)[i])[1])
+    return fake, real
+
+
+def crops(y, n_random, rng):
+    """The first 4 s plus n_random random 4 s crops (just the clip itself if it is shorter)."""
+    if len(y) <= MAX_CLIP_SAMPLES:
+        return [y]
+    starts = [0] + list(rng.integers(0, len(y) - MAX_CLIP_SAMPLES, n_random))
+    return [y[s:s + MAX_CLIP_SAMPLES] for s in starts]
+
+
+def teacher_dataset(teacher, items, crops_per_file=CROPS_PER_FILE, seed=0):
+    """
+    Speech crops of every (path, label) item with the teacher's probabilities for each.
+    label is -1 for unlabelled recordings (they still carry the teacher signal).
+    Returns (clips, teacher probs (n, labels), labels, source index per crop).
+    """
+    rng = np.random.default_rng(seed)
+    clips, labels, sources = [], [], []
+    for k, (path, label) in enumerate(items):
+        try:
+            y = teacher.load_clip(path)
+        except Exception as e:
+            print(f"   ⏭️  {path}: {e}")
+            continue
+        if teacher.is_silent(y):
+            continue
+        _, speech = teacher.speech_gate(y)  # Train on what the model sees in production
+        if speech is None:
+            continue
+        for crop in crops(speech, crops_per_file, rng):
+            clips.append(np.ascontiguousarray(crop, dtype=np.float32))
+            labels.append(label)
+            sources.append(k)
+
+    probs = []
+    for i in range(0, len(clips), 8):
+        probs.append(teacher.model_probs(clips[i:i + 8]))
+        print(f"\r   🎓 Teacher labelled {min(i + 8, len(clips))}/{len(clips)} crops", end="")
+    print()
+    return clips, np.concatenate(probs) if probs else np.zeros((0, 2)), np.array(labels), np.array(sources)
+
+
+def train(items, out=STUDENT_DIR, epochs=EPOCHS, batch=BATCH, lr=LEARNING_RATE, temperature=TEMPERATURE,
+          alpha=ALPHA, seed=0):
+    import torch
+    import torch.nn.functional as F
+    from student_model import StudentCNN, LogMel, pad_batch, save_student, N_MELS, CHANNELS
+    from verdict_cache import model_revision
+
+    torch.manual_seed(seed)
+    teacher = VoiceFirewall(backend="torch")
+    fake_idx, real_idx = label_index(teacher)
+    clips, probs, labels, sources = teacher_dataset(teacher, items, seed=seed)
+    if not clips:
+        raise SystemExit("❌ No usable speech in the training folders.")
+    # Hard labels in the teacher's index order (-1 = none)
+    hard = np.where(labels == 1, fake_idx, np.where(labels == 0, real_idx, -1))
+
+    rng = np.random.default_rng(seed)
+    files = np.unique(sources)
+    held = set(rng.choice(files, max(1, int(len(files) * HOLDOUT)), replace=False)) if len(files) > 1 else set()
+    train_idx = np.array([i for i in range(len(clips)) if sources[i] not in held])
+    val_idx = np.array([i for i in range(len(clips)) if sources[i] in held])
+
+    model = StudentCNN(probs.shape[1], N_MELS, CHANNELS, LogMel.filterbank(N_MELS))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, lr, total_steps=epochs * -(-len(train_idx) // batch))
+    soft_targets = torch.softmax(torch.log(torch.as_tensor(probs, dtype=torch.float32) + 1e-8) / temperature, dim=1)
+
+    def student_probs(idx):
+        model.eval()
+        out = []
+        with torch.inference_mode():
+            for i in range(0, len(idx), batch):
+                waves, lengths = pad_batch([clips[j] for j in idx[i:i + batch]])
+                out.append(torch.softmax(model(waves, lengths), dim=1).numpy())
+        return np.concatenate(out)
+
+    best, best_state = -1.0, None
+    for epoch in range(epochs):
+        model.train()
+        order = rng.permutation(train_idx)
+        total = 0.0
+        for i in range(0, len(order), batch):
+            idx = order[i:i + batch]
+            # Light augmentation: random gain (±6 dB) and a little noise
+            gain = 10 ** (rng.uniform(-6, 6, len(idx)) / 20)
+            waves, lengths = pad_batch([clips[j] * g + rng.normal(0, 0.002, len(clips[j])).astype(np.float32)
+                                        for j, g in zip(idx, gain)])
+            logits = model(waves, lengths)
+            loss = alpha * temperature ** 2 * F.kl_div(
+                F.log_softmax(logits / temperature, dim=1), soft_targets[idx], reduction="batchmean")
+            target = torch.as_tensor(hard[idx])
+            if (target >= 0).any():
+                loss = loss + (1 - alpha) * F.cross_entropy(logits[target >= 0], target[target >= 0])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total += float(loss) * len(idx)
+
+        check = val_idx if len(val_idx) else train_idx
+        agreement = float(np.mean(student_probs(check).argmax(1) == probs[check].argmax(1)))
+        print(f"   epoch {epoch + 1:>3}/{epochs}  loss {total / len(train_idx):.4f}  "
+              f"{'holdout' if len(val_idx) else 'train'} agreement with teacher {agreement:.3f}")
+        if agreement >= best:
+            best = agreement
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+
+    model.load_state_dict(best_state)
+    config = {"id2label": {str(k): v for k, v in teacher.config.id2label.items()}, "n_mels": N_MELS,
+              "channels": list(CHANNELS), "teacher": model_revision(MODEL_PATH), "temperature": temperature,
+              "alpha": alpha, "crops": len(clips), "holdout_agreement": round(best, 4),
+              "trained": time.strftime("%Y-%m-%d %H:%M:%S")}
+    save_student(model, out, config)
+    params = sum(p.numel() for p in model.parameters())
+    print(f"💾 Student saved to {out} ({params / 1e3:.0f}k parameters, best agreement {best:.3f})")
+
+
+def _measure_backend(backend, items, repeats, results):
+    """Runs in a fresh process so model memory is measured without the other backend loaded."""
+    from model_registry import rss_mb
+    from benchmark import summarize
+
+    import torch  # Imported up front so it isn't counted as model memory
+    torch.manual_seed(0)
+    np.random.seed(0)
+    before = rss_mb()
+    firewall = VoiceFirewall(backend=backend)
+    after = rss_mb()
+
+    probs, times, truth = [], [], []
+    for path, label in items:
+        y = firewall.load_clip(path)
+        if firewall.is_silent(y):
+            continue
+        _, speech = firewall.speech_gate(y)
+        if speech is None:
+            continue
+        clip = speech[:MAX_CLIP_SAMPLES]
+        firewall.model_probs([clip])  # Warm-up / cache effects out of the timing
+        for _ in range(repeats):
+            start = time.perf_counter()
+            row = firewall.model_probs([clip])[0]
+            times.append(time.perf_counter() - start)
+        probs.append(firewall.label_probs(row)[0])
+        truth.append(label)
+
+    params = None
+    if backend != "onnx":
+        params = sum(p.numel() for p in firewall.model.parameters())
+    results.put({"backend": backend, "fake_probs": probs, "labels": truth, "latency": summarize(times),
+                 "model_mb": round(after - before, 1) if before is not None and after is not None else None,
+                 "params": params})
+
+
+def evaluate(items, backends=("torch", "student"), repeats=3):
+    """Accuracy, agreement with the teacher, latency and memory of each backend on the same clips."""
+    from benchmark import run_in_process
+
+    reports = {}
+    for backend in backends:
+        reports[backend] = run_in_process(_measure_backend, backend, items, repeats)
+        if "error" in reports[backend]:
+            print(f"❌ {backend} failed: {reports[backend]['error']}")
+
+    measured = {backend: r for backend, r in reports.items() if "error" not in r}
+    teacher = measured.get("torch")
+    print(f"\n{'backend':<8} {'accuracy':>9} {'agree':>7} {'p50 ms':>8} {'p95 ms':>8} {'model MB':>9} {'params':>10}")
+    for backend, r in measured.items():
+        probs, labels = np.array(r["fake_probs"]), np.array(r["labels"])
+        r["accuracy"] = float(np.mean((probs > 0.5) == (labels == 1))) if len(probs) else 0.0
+        r["agreement"] = (float(np.mean((probs > 0.5) == (np.array(teacher["fake_probs"]) > 0.5)))
+                          if teacher is not None and len(probs) else None)
+        print(f"{backend:<8} {r['accuracy']:>9.3f} {r['agreement'] if r['agreement'] is not None else float('nan'):>7.3f} "
+              f"{r['latency']['p50_ms']:>8.1f} {r['latency']['p95_ms']:>8.1f} "
+              f"{r['model_mb'] if r['model_mb'] is not None else float('nan'):>9.1f} "
+              f"{r['params'] if r['params'] is not None else '-':>10}")
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the installed detector into a small log-mel CNN, and compare them.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    t = sub.add_parser("train", help="Train the student from the teacher (./models/deepfake_detector)")
+    t.add_argument("root", help="Folder with real/ and fake/ (or bonafide/ and spoof/) subfolders")
+    t.add_argument("--unlabelled", nargs="*", default=[], help="Extra folders of any audio, labelled by the teacher only")
+    t.add_argument("--epochs", type=int, default=EPOCHS)
+    t.add_argument("--batch", type=int, default=BATCH)
+    t.add_argument("--temperature", type=float, default=TEMPERATURE)
+    t.add_argument("--alpha", type=float, default=ALPHA)
+    t.add_argument("--out", default=STUDENT_DIR)
+    e = sub.add_parser("evaluate", help="Accuracy / latency / memory of teacher vs. student on a labelled folder")
+    e.add_argument("root")
+    e.add_argument("--backends", default="torch,student", help="Comma-separated: torch, onnx, student")
+    e.add_argument("--repeats", type=int, default=3, help="Timed forward passes per clip")
+    e.add_argument("--out", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    items = list(labelled_files(args.root))
+    if not items:
+        print(f"❌ No labelled clips under {args.root} (expected real/ and fake/ subfolders).")
+        sys.exit(1)
+
+    if args.command == "train":
+        from batch_audit import find_audio
+        for folder in args.unlabelled:
+            items += [(path, -1) for path in find_audio(folder)]
+        print(f"📂 {len(items)} recordings")
+        train(items, args.out, args.epochs, args.batch, temperature=args.temperature, alpha=args.alpha)
+    else:
+        reports = evaluate(items, args.backends.split(","), args.repeats)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(reports, f, indent=2)
+        if any("error" in r for r in reports.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
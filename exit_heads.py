@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import numpy as np
+
+from fusion import fit_logistic, exit_bounds, labelled_files, _sigmoid
+
+HEADS_PATH = "./models/deepfake_detector/exit_heads/heads.json"  # Wiped along with the model it was fit on
+EXIT_PRECISION = 0.99  # A head may only stop the forward pass where it was this accurate on held-out clips
+MIN_EXITS = 10         # ...over at least this many clips per side, or that head never exits
+FOLDS = 5              # Cross-fitting: exit bounds are chosen on probabilities from heads that never saw the clip
+L2 = 1.0               # The heads see a whole hidden state (hundreds of dims) per clip, so shrink hard
+
+
+class _Exit(Exception):
+    """Raised from a layer hook once every clip in the batch has a verdict: unwinds the forward pass."""
+
+
+def encoder_layers(model):
+    """The transformer layers of a HuggingFace audio classifier (wav2vec2, HuBERT, WavLM...)."""
+    base = getattr(model, model.base_model_prefix)
+    return base.encoder.layers
+
+
+def _pool(hidden, mask):
+    """Mean over time of (batch, frames, dims) hidden states, over the valid frames only."""
+    if mask is None:
+        return hidden.mean(dim=1)
+    mask = mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+
+
+class ExitHeads:
+    """
+    Adaptive-depth inference for the torch backend. Small logistic heads read the mean-pooled
+    hidden state after some of the encoder layers; as soon as a clip's head is confident
+    (its P(fake) is outside the [low, high] band calibrated by `python exit_heads.py fit`), that
+    clip's verdict is fixed, and once every clip in the batch has one the forward pass stops.
+    Clips no head is sure about run the full model, exactly as before.
+
+    The heads are forward hooks on the model's own layers, so masking, attention and weights
+    are the model's; nothing is re-implemented. A clip's verdict never depends on what else
+    shares its batch, only how much of the model runs does.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.heads = {h["layer"]: h for h in config["heads"]}
+        self._local = threading.local()  # Per-thread forward-pass state: one firewall serves many threads
+        self._tensors = {}
+        self._attached = None
+
+    @classmethod
+    def load(cls, path=HEADS_PATH):
+        """The fitted heads at `path`, or None if nothing has been fitted yet."""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return cls(json.load(f))
+        return None
+
+    def save(self, path=HEADS_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.config, f)
+
+    def fingerprint(self):
+        """Short hash of the heads: part of the verdict cache key, so refitting invalidates old verdicts."""
+        return hashlib.sha256(json.dumps(self.config, sort_keys=True).encode()).hexdigest()[:12]
+
+    @property
+    def total_layers(self):
+        return self.config["total_layers"]
+
+    def attach(self, model):
+        """Hooks every encoder layer of `model` (once). Returns the eager module to call."""
+        model = getattr(model, "_orig_mod", model)  # torch.compile'd: hooks need the eager module
+        if self._attached is not model:
+            for k, layer in enumerate(encoder_layers(model), 1):
+                layer.register_forward_hook(self._hook(k))
+            self._attached = model
+        return model
+
+    def _head(self, layer, like):
+        if layer not in self._tensors:
+            import torch
+            head = self.heads[layer]
+            self._tensors[layer] = (torch.tensor(head["weights"], dtype=like.dtype, device=like.device),
+                                    float(head["bias"]))
+        return self._tensors[layer]
+
+    def _hook(self, layer):
+        def hook(module, args, output):
+            state = getattr(self._local, "state", None)
+            if state is None:  # A plain forward pass (no heads, or another thread)
+                return None
+            hidden = output[0] if isinstance(output, tuple) else output
+            if state["record"] is not None:
+                state["record"][layer] = _pool(hidden, state["mask"]).float().cpu().numpy()
+                return None
+            if layer not in self.heads:
+                return None
+
+            weights, bias = self._head(layer, hidden)
+            p = _sigmoid((_pool(hidden, state["mask"]) @ weights).float().cpu().numpy() + bias)
+            head = self.heads[layer]
+            sure = ((head["low"] is not None and p <= head["low"]) |
+                    (head["high"] is not None and p >= head["high"]))
+            newly = sure & (state["layers"] == 0)
+            state["fake_prob"][newly] = p[newly]
+            state["layers"][newly] = layer
+            if (state["layers"] > 0).all():
+                raise _Exit()
+            return None
+        return hook
+
+    def _frame_mask(self, model, inputs):
+        mask = inputs.get("attention_mask")
+        if mask is None:
+            return None
+        frames = int(model._get_feat_extract_output_lengths(mask.shape[-1]))
+        return model._get_feature_vector_attention_mask(frames, mask).bool()
+
+    def _forward(self, model, inputs, record=None):
+        model = self.attach(model)
+        n = inputs["input_values"].shape[0]
+        state = {"mask": self._frame_mask(model, inputs), "record": record,
+                 "layers": np.zeros(n, dtype=int), "fake_prob": np.zeros(n)}
+        self._local.state = state
+        try:
+            logits = model(**inputs).logits.float().cpu().numpy()
+        except _Exit:
+            logits = None
+        finally:
+            self._local.state = None
+        return logits, state
+
+    def run(self, model, inputs):
+        """
+        Adaptive-depth forward pass. Returns (probs (batch, num_labels), encoder layer each clip's
+        verdict came from). The pass itself ran max() of those layers: it only stops once every clip
+        has exited. Clips decided by a head get its P(fake) as their fake / real probabilities.
+        """
+        logits, state = self._forward(model, inputs)
+        c = self.config
+        probs = np.zeros((len(state["layers"]), c["num_labels"]))
+        if logits is not None:
+            e = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probs = e / e.sum(axis=-1, keepdims=True)
+        exited = state["layers"] > 0
+        probs[exited] = 0.0
+        probs[exited, c["fake_index"]] = state["fake_prob"][exited]
+        probs[exited, c["real_index"]] = 1.0 - state["fake_prob"][exited]
+        return probs, np.where(exited, state["layers"], self.total_layers).tolist()
+
+    def record(self, model, inputs):
+        """Full forward pass; returns ({layer: pooled hidden states (batch, dims)}, logits)."""
+        pooled = {}
+        logits, _ = self._forward(model, inputs, record=pooled)
+        return pooled, logits
+
+
+def collect(firewall, items):
+    """
+    Pooled hidden states after every encoder layer for the first 4 s of speech of each (path, label)
+    item, plus the full model's P(fake). Returns ({layer: (n, dims)}, labels, model P(fake), paths).
+    """
+    import torch
+    from detector_v3 import MAX_CLIP_SAMPLES
+
+    recorder = ExitHeads({"heads": []})
+    states, labels, probs, paths = {}, [], [], []
+    for path, label in items:
+        try:
+            y = firewall.load_clip(path)
+        except Exception as e:
+            print(f"   ⏭️  {path}: {e}")
+            continue
+        if firewall.is_silent(y):
+            continue
+        _, speech = firewall.speech_gate(y)
+        if speech is None:
+            continue
+        with torch.inference_mode():
+            pooled, logits = recorder.record(firewall.model, firewall.model_inputs([speech[:MAX_CLIP_SAMPLES]]))
+        for layer, x in pooled.items():
+            states.setdefault(layer, []).append(x[0])
+        e = np.exp(logits[0] - logits[0].max())
+        probs.append(firewall.label_probs(e / e.sum())[0])
+        labels.append(label)
+        paths.append(path)
+        print(f"\r   🔎 {len(paths)} clips", end="")
+    print()
+    return {k: np.array(v) for k, v in states.items()}, np.array(labels, dtype=float), np.array(probs), paths
+
+
+def fit(states, labels, precision=EXIT_PRECISION, folds=FOLDS, l2=L2, min_exits=MIN_EXITS, seed=0):
+    """
+    One logistic head per intermediate layer (the last layer is the model's own classifier).
+    Bounds come from cross-fitted probabilities, so a head is judged on clips it was not fit on.
+    Returns the list of head configs; heads that can't exit anywhere are left out.
+    """
+    fold = np.random.default_rng(seed).permutation(len(labels)) % folds
+    last = max(states)
+    heads = []
+    for layer in sorted(states):
+        if layer == last:
+            continue
+        X = states[layer]
+        mean, std = X.mean(axis=0), X.std(axis=0) + 1e-6
+        Z = (X - mean) / std
+
+        held_out = np.full(len(labels), 0.5)
+        for f in range(folds):
+            train = fold != f
+            if len(np.unique(labels[train])) < 2:
+                continue
+            w, b = fit_logistic(Z[train], labels[train], l2)
+            held_out[~train] = _sigmoid(Z[~train] @ w + b)
+        low, high = exit_bounds(held_out, labels, precision, min_exits)
+        if low is None and high is None:
+            continue
+
+        exits = np.zeros(len(labels), dtype=bool)
+        if low is not None:
+            exits |= held_out <= low
+        if high is not None:
+            exits |= held_out >= high
+        w, b = fit_logistic(Z, labels, l2)
+        weights = w / std  # Standardisation folded in: at run time a head is one dot product
+        heads.append({"layer": layer, "weights": [float(v) for v in weights], "bias": float(b - weights @ mean),
+                      "low": low, "high": high,
+                      "holdout_exit_rate": round(float(exits.mean()), 4),
+                      "holdout_accuracy": round(float(np.mean((held_out[exits] > 0.5) == labels[exits])), 4)})
+    return heads
+
+
+def evaluate(firewall, heads, items, repeats=3):
+    """
+    Full-depth vs. adaptive-depth on the same clips: accuracy, agreement with the full model,
+    layers run per clip and forward-pass latency. Returns a report with one row per clip. Each clip
+    is its own batch here, so its exit layer is also how deep the forward pass ran.
+    """
+    import torch
+    from detector_v3 import MAX_CLIP_SAMPLES
+    from benchmark import summarize
+
+    rows, full_times, adaptive_times = [], [], []
+    for path, label in items:
+        y = firewall.load_clip(path)
+        if firewall.is_silent(y):
+            continue
+        _, speech = firewall.speech_gate(y)
+        if speech is None:
+            continue
+        inputs = firewall.model_inputs([speech[:MAX_CLIP_SAMPLES]])
+        with torch.inference_mode():
+            for mode, times in (("full", full_times), ("adaptive", adaptive_times)):
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    if mode == "full":
+                        full = firewall.label_probs(torch.softmax(firewall.model(**inputs).logits, -1)[0].numpy())[0]
+                    else:
+                        probs, layers = heads.run(firewall.model, inputs)
+                    times.append(time.perf_counter() - start)
+        rows.append({"path": path, "label": label, "full_fake_prob": round(float(full), 4),
+                     "fake_prob": round(float(firewall.label_probs(probs[0])[0]), 4), "layers": layers[0]})
+
+    truth = np.array([r["label"] for r in rows]) == 1
+    full = np.array([r["full_fake_prob"] for r in rows]) > 0.5
+    adaptive = np.array([r["fake_prob"] for r in rows]) > 0.5
+    depth = np.array([r["layers"] for r in rows])
+    report = {"clips": len(rows), "total_layers": heads.total_layers,
+              "full": {"accuracy": round(float(np.mean(full == truth)), 4), "latency": summarize(full_times)},
+              "adaptive": {"accuracy": round(float(np.mean(adaptive == truth)), 4),
+                           "agreement": round(float(np.mean(adaptive == full)), 4),
+                           "mean_layers": round(float(depth.mean()), 2),
+                           "exit_rate": round(float(np.mean(depth < heads.total_layers)), 4),
+                           "latency": summarize(adaptive_times)},
+              "clips_by_layers": {int(k): int(v) for k, v in zip(*np.unique(depth, return_counts=True))},
+              "rows": rows}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit / evaluate intermediate-layer exit heads for adaptive-depth inference.")
+    parser.add_argument("command", choices=["fit", "evaluate"])
+    parser.add_argument("root", help="Folder with real/ and fake/ (or bonafide/ and spoof/) subfolders")
+    parser.add_argument("--heads", default=HEADS_PATH, help="Where `fit` writes / `evaluate` reads the heads")
+    parser.add_argument("--precision", type=float, default=EXIT_PRECISION,
+                        help="Required accuracy of each head's exits on held-out clips")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed forward passes per clip (evaluate)")
+    parser.add_argument("--out", help="Write the full evaluation report (per-clip depth) as JSON")
+    args = parser.parse_args()
+
+    from detector_v3 import VoiceFirewall, MODEL_PATH
+    from verdict_cache import model_revision
+
+    items = list(labelled_files(args.root))
+    if not items:
+        print(f"❌ No labelled clips under {args.root} (expected real/ and fake/ subfolders).")
+        sys.exit(1)
+    firewall = VoiceFirewall(backend="torch")
+
+    if args.command == "fit":
+        from distill import label_index
+
+        states, labels, _, _ = collect(firewall, items)
+        if len(np.unique(labels)) < 2:
+            print("❌ Need clips of both classes (real/ and fake/ subfolders).")
+            sys.exit(1)
+        fake_index, real_index = label_index(firewall)
+        heads = ExitHeads({"model": model_revision(MODEL_PATH), "total_layers": len(encoder_layers(firewall.model)),
+                           "num_labels": len(firewall.config.id2label), "fake_index": fake_index,
+                           "real_index": real_index, "precision": args.precision,
+                           "trained_on": {"clips": len(labels), "fake": int(labels.sum())},
+                           "fitted": time.strftime("%Y-%m-%d %H:%M:%S"),
+                           "heads": fit(states, labels, args.precision, args.folds)})
+        heads.save(args.heads)
+        for h in heads.config["heads"]:
+            print(f"   layer {h['layer']:>2}/{heads.total_layers}: exits {h['holdout_exit_rate']:.0%} of held-out clips "
+                  f"at {h['holdout_accuracy']:.3f} accuracy (P(fake) <= {h['low']} or >= {h['high']})")
+        if not heads.heads:
+            print(f"   ℹ️  No intermediate layer reaches {args.precision} held-out accuracy on this data: "
+                  "every clip will still run the full model")
+        print(f"💾 {len(heads.heads)} exit heads saved to {args.heads}")
+        return
+
+    heads = ExitHeads.load(args.heads)
+    if heads is None:
+        print(f"❌ {args.heads} not found (run `python exit_heads.py fit` first).")
+        sys.exit(1)
+    report = evaluate(firewall, heads, items, args.repeats)
+    full, adaptive = report["full"], report["adaptive"]
+    print(f"📂 {report['clips']} clips")
+    print(f"   full:     accuracy {full['accuracy']:.3f}  {heads.total_layers} layers  "
+          f"p50 {full['latency']['p50_ms']:.1f} ms  mean {full['latency']['mean_ms']:.1f} ms")
+    print(f"   adaptive: accuracy {adaptive['accuracy']:.3f}  {adaptive['mean_layers']:.1f} layers on average  "
+          f"p50 {adaptive['latency']['p50_ms']:.1f} ms  mean {adaptive['latency']['mean_ms']:.1f} ms  "
+          f"(agrees with full model on {adaptive['agreement']:.1%})")
+    print(f"   clips by layers run: {report['clips_by_layers']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
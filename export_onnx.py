@@ -0,0 +1,141 @@
+import os
+import argparse
+import numpy as np
+import torch
+from transformers import AutoModelForAudioClassification, AutoFeatureExtractor
+
+from detector_v3 import MODEL_PATH, TARGET_SR, MAX_CLIP_SAMPLES, ONNX_DIR, ONNX_MODEL, ONNX_FP32_MODEL, softmax
+
+FP32_PATH = ONNX_FP32_MODEL
+INT8_PATH = ONNX_MODEL
+
+# How far the exported graphs may drift from the PyTorch model
+FP32_LOGIT_TOLERANCE = 1e-3
+INT8_PROB_TOLERANCE = 0.05
+# Only the transformer's matrix multiplies are quantized: int8 Conv1d weights would turn the
+# feature encoder into ConvInteger nodes, which the CPU provider may not run
+QUANTIZED_OPS = ["MatMul", "Gemm"]
+
+
+class _LogitsOnly(torch.nn.Module):
+    """HF models return a ModelOutput; the ONNX graph should expose a single `logits` tensor."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask=None):
+        return self.model(input_values=input_values, attention_mask=attention_mask).logits
+
+
+def export(extractor, model, opset=17):
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    dummy = extractor(np.zeros(MAX_CLIP_SAMPLES, dtype=np.float32), sampling_rate=TARGET_SR,
+                      return_tensors="pt")
+
+    names = ["input_values"]
+    args = (dummy["input_values"],)
+    dynamic_axes = {"input_values": {0: "batch", 1: "samples"}, "logits": {0: "batch"}}
+    if "attention_mask" in dummy:
+        names.append("attention_mask")
+        args += (dummy["attention_mask"],)
+        dynamic_axes["attention_mask"] = {0: "batch", 1: "samples"}
+
+    print(f"   - Exporting FP32 graph -> {FP32_PATH}")
+    torch.onnx.export(
+        _LogitsOnly(model).eval(), args, FP32_PATH,
+        input_names=names, output_names=["logits"],
+        dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True,
+        dynamo=False  # Classic TorchScript exporter: no onnxscript dependency
+    )
+
+
+def quantize():
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"   - Quantizing weights to int8 -> {INT8_PATH}")
+    quantize_dynamic(FP32_PATH, INT8_PATH, weight_type=QuantType.QInt8, op_types_to_quantize=QUANTIZED_OPS)
+
+
+def verify(extractor, model, onnx_path, n_clips=4, seed=0):
+    """
+    Runs the same clips through PyTorch and onnxruntime and returns (max logit diff, max prob diff).
+    Each clip is checked on its own, then all of them as one padded batch of different lengths,
+    the way analyze_batch() feeds the ONNX backend.
+    """
+    import onnxruntime as ort
+
+    rng = np.random.default_rng(seed)
+    # Mix of lengths so the dynamic axes are exercised too
+    clips = [(0.1 * rng.standard_normal(int(TARGET_SR * secs))).astype(np.float32)
+             for secs in np.linspace(1.0, 4.0, n_clips)]
+
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    max_logit, max_prob = 0.0, 0.0
+    for batch in [[clip] for clip in clips] + [clips]:
+        options = dict(sampling_rate=TARGET_SR, padding=True, truncation=True, max_length=MAX_CLIP_SAMPLES)
+        pt_inputs = extractor(batch, return_tensors="pt", **options)
+        with torch.no_grad():
+            pt_logits = model(**pt_inputs).logits.numpy()
+
+        np_inputs = extractor(batch, return_tensors="np", **options)
+        feed = {i.name: np_inputs[i.name] for i in session.get_inputs()}
+        ort_logits = session.run(None, feed)[0]
+
+        max_logit = max(max_logit, float(np.max(np.abs(pt_logits - ort_logits))))
+        max_prob = max(max_prob, float(np.max(np.abs(softmax(pt_logits) - softmax(ort_logits)))))
+    return max_logit, max_prob
+
+
+def reject(path):
+    """Moves a graph that failed verification out of the path backend="onnx" loads."""
+    if os.path.exists(path):
+        os.replace(path, path + ".rejected")
+        print(f"   🗑️  Moved {path} -> {path}.rejected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the installed detector to ONNX (+ int8 quantization).")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the FP32 graph")
+    args = parser.parse_args()
+
+    print(f"📦 Exporting {MODEL_PATH} to ONNX...")
+    extractor = AutoFeatureExtractor.from_pretrained(MODEL_PATH)
+    model = AutoModelForAudioClassification.from_pretrained(MODEL_PATH).eval()
+
+    export(extractor, model, opset=args.opset)
+    logit_diff, _ = verify(extractor, model, FP32_PATH)
+    ok = logit_diff <= FP32_LOGIT_TOLERANCE
+    print(f"   {'✅' if ok else '❌'} FP32 max |logit diff| vs PyTorch: {logit_diff:.2e} (tol {FP32_LOGIT_TOLERANCE:g})")
+
+    int8_ok = True
+    if args.no_quantize:
+        reject(INT8_PATH)  # An older int8 graph would otherwise shadow the FP32 one just written
+    elif ok:
+        try:
+            quantize()
+            logit_diff, prob_diff = verify(extractor, model, INT8_PATH)
+            int8_ok = prob_diff <= INT8_PROB_TOLERANCE
+            print(f"   {'✅' if int8_ok else '❌'} INT8 max |prob diff| vs PyTorch: {prob_diff:.3f} "
+                  f"(logits {logit_diff:.3f}, tol {INT8_PROB_TOLERANCE:g})")
+        except Exception as e:  # e.g. onnxruntime can't build a session for the quantized graph
+            int8_ok = False
+            print(f"   ❌ INT8 graph failed to quantize or load: {e}")
+
+    if ok and int8_ok:
+        print(f"✅ SUCCESS: use VoiceFirewall(backend=\"onnx\") (loads {FP32_PATH if args.no_quantize else INT8_PATH})")
+    else:
+        # Never leave a graph that failed verification where the onnx backend picks it up
+        reject(INT8_PATH)
+        if ok:
+            print(f"❌ ERROR: the int8 graph failed verification against the PyTorch model; backend=\"onnx\" "
+                  f"will load the verified FP32 graph ({FP32_PATH})")
+        else:
+            reject(FP32_PATH)
+            print("❌ ERROR: exported graph does not match the PyTorch model, it was not deployed")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
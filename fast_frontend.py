@@ -0,0 +1,175 @@
+import time
+import argparse
+import threading
+import numpy as np
+
+TARGET_SR = 16000
+MAX_CLIP_SAMPLES = TARGET_SR * 4
+DITHER = 0.001            # Std of the noise model_probs() adds so loopback audio doesn't look "too perfect"
+SUPPORTED = ("Wav2Vec2FeatureExtractor",)
+
+
+class FastFrontend:
+    """
+    Vectorised stand-in for calling Wav2Vec2FeatureExtractor with padding=True, truncation=True,
+    max_length=4 s. Same output, without the per-call BatchFeature / list handling:
+
+      * clips are truncated, dithered and written straight into a float32 (batch, longest)
+        buffer that is reused across calls (one per thread);
+      * zero-mean / unit-variance normalisation runs in place on that buffer, over the whole
+        batch at once when all rows have the same length (the usual case, see _length_buckets);
+      * the attention mask is built only if the extractor returns one, and padding is handled
+        exactly like the extractor does (with a mask: stats over each clip's own samples and
+        padding set to padding_value; without one: stats over the zero-padded row).
+
+    The arrays returned alias the buffer: they are valid until this thread's next call.
+    """
+
+    def __init__(self, extractor, max_length=MAX_CLIP_SAMPLES):
+        self.do_normalize = extractor.do_normalize
+        self.padding_value = float(extractor.padding_value)
+        self.return_attention_mask = bool(extractor.return_attention_mask)
+        self.max_length = max_length
+        self._local = threading.local()
+
+    @classmethod
+    def for_extractor(cls, extractor, max_length=MAX_CLIP_SAMPLES):
+        """A FastFrontend matching `extractor`, or None if that extractor type isn't reproduced here."""
+        if type(extractor).__name__ not in SUPPORTED or getattr(extractor, "padding_side", "right") != "right":
+            return None
+        return cls(extractor, max_length)
+
+    def _buffers(self, batch, length):
+        values = getattr(self._local, "values", None)
+        if values is None or len(values) < batch * self.max_length:
+            values = self._local.values = np.empty(batch * self.max_length, dtype=np.float32)
+            self._local.mask = np.empty(batch * self.max_length, dtype=np.int32)
+        # The front of the flat buffer, seen as a C-contiguous (batch, length) array, so torch.from_numpy()
+        # and ONNX Runtime take it without another copy
+        n = batch * length
+        return values[:n].reshape(batch, length), self._local.mask[:n].reshape(batch, length)
+
+    def __call__(self, clips, dither=0.0):
+        """
+        clips: list of 1-D float arrays at 16 kHz. Returns {"input_values": (batch, longest) float32,
+        ["attention_mask": (batch, longest) int32]} as NumPy arrays.
+        """
+        lengths = [min(len(y), self.max_length) for y in clips]
+        longest = max(lengths)
+        values, mask = self._buffers(len(clips), longest)
+
+        for row, y, n in zip(values, clips, lengths):
+            row[:n] = y[:n]
+            if dither:
+                # Only the samples the model sees are dithered; computed in float64 like `y + noise` was
+                row[:n] += np.random.normal(0, dither, n)
+            row[n:] = 0.0
+
+        uniform = min(lengths) == longest
+        if self.do_normalize:
+            if uniform or not self.return_attention_mask:
+                # One vectorised pass over the batch. Without a mask the extractor's stats include
+                # the padding too, which is exactly what normalising the padded rows does.
+                mean = values.mean(axis=1, keepdims=True)
+                var = values.var(axis=1, keepdims=True)
+                values -= mean
+                values /= np.sqrt(var + np.float32(1e-7))
+            else:
+                for row, n in zip(values, lengths):
+                    valid = row[:n]
+                    mean, var = valid.mean(), valid.var()
+                    valid -= mean
+                    valid /= np.sqrt(var + np.float32(1e-7))
+                    row[n:] = self.padding_value
+
+        out = {"input_values": values}
+        if self.return_attention_mask:
+            mask[:] = 1
+            if not uniform:
+                for row, n in zip(mask, lengths):
+                    row[n:] = 0
+            out["attention_mask"] = mask
+        return out
+
+
+def compare(extractor, frontend, clips):
+    """Max |difference| between the extractor and the front end on one batch (0.0 = bit-for-bit)."""
+    ref = extractor(clips, sampling_rate=TARGET_SR, return_tensors="np",
+                    padding=True, truncation=True, max_length=frontend.max_length)
+    ours = frontend(clips)
+    if set(ref.keys()) != set(ours.keys()):
+        raise AssertionError(f"Different outputs: {sorted(ref.keys())} vs {sorted(ours.keys())}")
+    if "attention_mask" in ref and not np.array_equal(ref["attention_mask"], ours["attention_mask"]):
+        raise AssertionError("attention_mask differs")
+    return float(np.max(np.abs(ref["input_values"] - ours["input_values"])))
+
+
+def verify(extractor, n_batches=20, seed=0, tolerance=1e-6):
+    """
+    Checks the front end against the extractor on random single clips and batches: mixed and equal
+    lengths, clips longer than 4 s, with and without an attention mask. Returns the worst difference.
+    """
+    import copy
+
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for with_mask in (False, True):
+        ext = copy.deepcopy(extractor)
+        ext.return_attention_mask = with_mask
+        frontend = FastFrontend(ext)
+        for i in range(n_batches):
+            batch = 1 if i % 4 == 0 else int(rng.integers(2, 9))
+            if i % 2:
+                lengths = [int(rng.integers(TARGET_SR // 4, TARGET_SR * 6))] * batch
+            else:
+                lengths = rng.integers(TARGET_SR // 4, TARGET_SR * 6, batch)
+            clips = [(rng.uniform(0.01, 0.5) * rng.standard_normal(n)).astype(np.float32) for n in lengths]
+            worst = max(worst, compare(ext, frontend, clips))
+    if worst > tolerance:
+        raise AssertionError(f"Front end differs from the extractor by {worst:.2e} (tolerance {tolerance:g})")
+    return worst
+
+
+def bench(extractor, batch=8, repeats=50, seed=0):
+    """Median ms per call of the extractor vs. the front end on one batch of 4 s clips."""
+    rng = np.random.default_rng(seed)
+    clips = [(0.1 * rng.standard_normal(MAX_CLIP_SAMPLES)).astype(np.float32) for _ in range(batch)]
+    frontend = FastFrontend(extractor)
+    timings = {}
+    for name, fn in (("extractor", lambda: extractor(clips, sampling_rate=TARGET_SR, return_tensors="np", padding=True,
+                                                    truncation=True, max_length=MAX_CLIP_SAMPLES)),
+                     ("fast_frontend", lambda: frontend(clips))):
+        fn()
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - start)
+        timings[name] = float(np.median(runs) * 1000)
+    return timings
+
+
+def main():
+    from transformers import AutoFeatureExtractor
+    from detector_v3 import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Check the fast front end against the model's HuggingFace feature extractor.")
+    parser.add_argument("--batches", type=int, default=20, help="Random batches per attention-mask setting")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    extractor = AutoFeatureExtractor.from_pretrained(MODEL_PATH)
+    if FastFrontend.for_extractor(extractor) is None:
+        print(f"ℹ️  {type(extractor).__name__} is not handled by the fast front end; the extractor is used as is.")
+        return
+
+    worst = verify(extractor, args.batches, tolerance=args.tolerance)
+    print(f"✅ Matches {type(extractor).__name__}: max |diff| {worst:.2e}" + (" (bit-for-bit)" if worst == 0 else ""))
+    for batch in (1, 8):
+        t = bench(extractor, batch)
+        print(f"   batch {batch}: extractor {t['extractor']:.2f} ms -> fast front end {t['fast_frontend']:.2f} ms "
+              f"({t['extractor'] / t['fast_frontend']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+FUSION_PATH = "./models/fusion.json"  # Written by `python fusion.py fit`; kept outside the model folder on purpose
+
+# Rule cascade used until a fusion has been fitted (the original detector_v3 behaviour)
+FAKE_THRESHOLD = 0.80       # AI must be this sure to call FAKE
+OVERRIDE_THRESHOLD = 0.50   # Above this, a physically human voice triggers the override
+HUMAN_JITTER = 0.005        # Human range is typically 0.005 to 0.05. AI is often < 0.002.
+OVERRIDE_SCORE = 0.95       # Confidence reported when the Physics Override engages
+
+CHEAP_FEATURES = ["jitter", "shimmer", "flatness"]  # Available before the model runs
+FULL_FEATURES = ["model"] + CHEAP_FEATURES
+EARLY_EXIT_PRECISION = 0.98  # Cheap-only verdicts must be at least this accurate on held-out clips
+MIN_EARLY_EXITS = 10         # ...over at least this many clips, or early exit stays off
+FOLDS = 5                    # Cross-fitting: exit bounds are chosen on probabilities from models that never saw the clip
+L2 = 1e-2
+REAL_DIRS = ("real", "bonafide", "human")
+FAKE_DIRS = ("fake", "spoof", "synthetic", "ai")
+
+DEFAULT_CONFIG = {
+    "mode": "rules",
+    "fake_threshold": FAKE_THRESHOLD,
+    "override_threshold": OVERRIDE_THRESHOLD,
+    "human_jitter": HUMAN_JITTER,
+    "override_score": OVERRIDE_SCORE,
+}
+
+
+def _transform(name, value):
+    """Features on the scale the logistic model is fit on (all are heavy-tailed ratios)."""
+    if name == "model":
+        p = min(max(value, 1e-6), 1 - 1e-6)
+        return np.log(p / (1 - p))
+    if name == "flatness":
+        return np.log(value + 1e-6)
+    return np.log(value + 1e-4)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def fit_logistic(X, y, l2=L2, iterations=50):
+    """L2-regularised logistic regression by Newton's method. Returns (weights, bias)."""
+    Xb = np.hstack([X, np.ones((len(X), 1))])
+    w = np.zeros(Xb.shape[1])
+    reg = l2 * np.eye(Xb.shape[1])
+    reg[-1, -1] = 0.0  # Don't shrink the bias
+    for _ in range(iterations):
+        p = _sigmoid(Xb @ w)
+        grad = Xb.T @ (p - y) + reg @ w
+        hess = (Xb * (p * (1 - p))[:, None]).T @ Xb + reg
+        step = np.linalg.solve(hess, grad)
+        w -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+    return w[:-1], float(w[-1])
+
+
+class ScoreFusion:
+    """
+    Turns the evidence for one clip into (label, score). Two modes:
+
+    "rules"     the original cascade (physics override, then the model threshold). Used until a
+                fusion has been fitted; thresholds come from the config.
+    "logistic"  calibrated P(fake) from a logistic model over the model's logit plus jitter,
+                shimmer and spectral flatness, fit on labelled clips (`python fusion.py fit DIR`).
+                A second, cheap-features-only model lets confident clips skip the neural net.
+                Its config records the model revision it was fit on (see VoiceFirewall._load_fusion).
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG if config is None else config)
+
+    @classmethod
+    def load(cls, path=FUSION_PATH):
+        """The fitted fusion at `path`, or the rule cascade if nothing has been fitted yet."""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return cls(json.load(f))
+        return cls()
+
+    def save(self, path=FUSION_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.config, f, indent=2)
+
+    @property
+    def mode(self):
+        return self.config["mode"]
+
+    def mismatch(self, model, pitch_engine):
+        """
+        Why this fusion doesn't apply to a firewall with this model revision and pitch engine, or
+        None if it does. Jitter and shimmer from yin and pyin sit on different scales, so both count.
+        """
+        if self.mode == "rules":
+            return None
+        if self.config.get("model") != model:
+            return "a different model or backend"
+        if self.config.get("pitch_engine") != pitch_engine:
+            return "a different pitch engine"
+        return None
+
+    def combine(self, verdicts):
+        """
+        (label, score) for a recording from its windows' (label, score) verdicts, early exits
+        included: the mean of their P(fake) against the threshold a single window must reach.
+        """
+        p_fake = float(np.mean([score if label == "FAKE" else 1.0 - score for label, score in verdicts]))
+        threshold = self.config["threshold"] if self.mode == "logistic" else self.config["fake_threshold"]
+        return ("FAKE", p_fake) if p_fake >= threshold else ("REAL", 1.0 - p_fake)
+
+    def fingerprint(self):
+        """Short hash of the config: part of the verdict cache key, so refitting invalidates old verdicts."""
+        return hashlib.sha256(json.dumps(self.config, sort_keys=True).encode()).hexdigest()[:12]
+
+    def _vector(self, names, features):
+        # Features that weren't measured (e.g. flatness in the live path) fall back to the training mean
+        means = self.config["mean"]
+        x = [_transform(n, features[n]) if features.get(n) is not None else means[n] for n in names]
+        return (np.asarray(x) - [means[n] for n in names]) / [self.config["std"][n] for n in names]
+
+    def _probability(self, part, names, features):
+        model = self.config[part]
+        return float(_sigmoid(np.dot(model["weights"], self._vector(names, features)) + model["bias"]))
+
+    def _verdict(self, p_fake):
+        if p_fake >= self.config["threshold"]:
+            return "FAKE", p_fake
+        return "REAL", 1.0 - p_fake
+
+    def early_exit(self, features):
+        """
+        (label, score) when the cheap features alone are decisive, else None (run the model).
+        Only a fitted fusion exits early; its bounds were chosen on cross-fitted probabilities so
+        that these verdicts were at least EARLY_EXIT_PRECISION accurate on clips held out of the fit.
+        """
+        if self.mode != "logistic":
+            return None
+        bounds = self.config.get("early_exit") or {}
+        p = self._probability("cheap", CHEAP_FEATURES, features)
+        if bounds.get("low") is not None and p <= bounds["low"]:
+            return "REAL", 1.0 - p
+        if bounds.get("high") is not None and p >= bounds["high"]:
+            return "FAKE", p
+        return None
+
+    def decide(self, fake_prob, real_prob, features):
+        """(label, score, reason) from the model's probabilities plus the physics features."""
+        if self.mode == "logistic":
+            label, score = self._verdict(self._probability("full", FULL_FEATURES, {**features, "model": fake_prob}))
+            return label, score, "fusion"
+
+        c = self.config
+        # CASE A: AI says FAKE, but Physics says HUMAN
+        if fake_prob > c["override_threshold"] and (features.get("jitter") or 0.0) > c["human_jitter"]:
+            return "REAL", c["override_score"], "override"
+        # CASE B: Standard AI Decision
+        if fake_prob > c["fake_threshold"]:
+            return "FAKE", fake_prob, "model"
+        return "REAL", real_prob, "model"
+
+
+def fit(rows, threshold=0.5, precision=EARLY_EXIT_PRECISION, folds=FOLDS, seed=0):
+    """
+    rows: [{"label": 0/1 (1 = fake), "model": P(fake), "jitter", "shimmer", "flatness"}].
+    Returns a logistic ScoreFusion config with standardisation, both models and the early-exit bounds.
+    The bounds come from cross-fitted cheap-model probabilities, as in exit_heads.fit.
+    """
+    y = np.array([r["label"] for r in rows], dtype=float)
+    raw = {n: np.array([_transform(n, r[n]) for r in rows]) for n in FULL_FEATURES}
+    mean = {n: float(v.mean()) for n, v in raw.items()}
+    std = {n: float(v.std()) or 1.0 for n, v in raw.items()}
+    X = {n: (raw[n] - mean[n]) / std[n] for n in FULL_FEATURES}
+
+    config = {"mode": "logistic", "threshold": threshold, "mean": mean, "std": std,
+              "trained_on": {"clips": len(rows), "fake": int(y.sum()), "real": int(len(y) - y.sum())},
+              "fitted": time.strftime("%Y-%m-%d %H:%M:%S")}
+    for part, names in (("cheap", CHEAP_FEATURES), ("full", FULL_FEATURES)):
+        w, b = fit_logistic(np.column_stack([X[n] for n in names]), y)
+        config[part] = {"weights": [float(v) for v in w], "bias": b}
+
+    cheap = np.column_stack([X[n] for n in CHEAP_FEATURES])
+    fold = np.random.default_rng(seed).permutation(len(y)) % folds
+    held_out = np.full(len(y), 0.5)
+    for f in range(folds):
+        train = fold != f
+        if len(np.unique(y[train])) < 2:
+            continue
+        w, b = fit_logistic(cheap[train], y[train])
+        held_out[~train] = _sigmoid(cheap[~train] @ w + b)
+    low, high = exit_bounds(held_out, y, precision)
+    config["early_exit"] = {"low": low, "high": high, "precision": precision, "folds": folds}
+    return config
+
+
+def exit_bounds(p, y, precision, min_exits=MIN_EARLY_EXITS):
+    """
+    Early-exit bounds (low, high) on P(fake): the widest tails of `p` that are still `precision`
+    pure against the labels `y` (1 = fake), over at least min_exits clips. None = no such tail.
+    """
+    order = np.argsort(p)
+    low = high = None
+    for k in range(min_exits, len(p) + 1):
+        if np.mean(y[order[:k]] == 0) >= precision:
+            low = float(p[order[k - 1]])
+    for k in range(min_exits, len(p) + 1):
+        if np.mean(y[order[-k:]] == 1) >= precision:
+            high = float(p[order[-k]])
+    if low is not None and high is not None and low >= high:
+        low = high = None  # The scores can't separate the classes on their own
+    return low, high
+
+
+def labelled_files(root):
+    """(path, label) for every clip under root/<real|fake>/... (folder names in REAL_DIRS / FAKE_DIRS); 1 = fake."""
+    from batch_audit import find_audio
+
+    for folder in sorted(os.listdir(root)):
+        name = folder.lower()
+        label = 0 if name in REAL_DIRS else 1 if name in FAKE_DIRS else None
+        if label is None:
+            continue
+        for path in find_audio(os.path.join(root, folder)):
+            yield path, label
+
+
+def collect(firewall, root):
+    """Evidence rows for every labelled clip under root (see labelled_files)."""
+    rows = []
+    for path, label in labelled_files(root):
+        evidence = firewall.evidence(path)
+        if evidence is None:
+            print(f"   ⏭️  {path}: no usable speech")
+            continue
+        rows.append({"path": path, "label": label, **evidence})
+    return rows
+
+
+def evaluate(fusion, rows):
+    """Accuracy, and how many clips a fusion could decide without the model."""
+    correct = exits = 0
+    for r in rows:
+        early = fusion.early_exit(r)
+        label = early[0] if early else fusion.decide(r["model"], 1 - r["model"], r)[0]
+        exits += early is not None
+        correct += (label == "FAKE") == bool(r["label"])
+    return {"accuracy": round(correct / len(rows), 4), "early_exit_rate": round(exits / len(rows), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit / evaluate the score fusion on labelled recordings.")
+    parser.add_argument("command", choices=["fit", "evaluate"])
+    parser.add_argument("root", help="Folder with real/ and fake/ (or bonafide/ and spoof/) subfolders")
+    parser.add_argument("--out", default=FUSION_PATH, help="Where `fit` writes the fusion config")
+    parser.add_argument("--precision", type=float, default=EARLY_EXIT_PRECISION,
+                        help="Required accuracy of cheap-feature early exits on held-out clips")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "student"])
+    parser.add_argument("--pitch-engine", default="pyin", choices=["pyin", "yin"])
+    args = parser.parse_args()
+
+    from detector_v3 import VoiceFirewall
+
+    firewall = VoiceFirewall(backend=args.backend, pitch_engine=args.pitch_engine, fusion=ScoreFusion())
+    rows = collect(firewall, args.root)
+    if len({r["label"] for r in rows}) < 2:
+        print("❌ Need clips of both classes (real/ and fake/ subfolders).")
+        sys.exit(1)
+    print(f"📂 {len(rows)} clips ({sum(r['label'] for r in rows)} fake)")
+
+    print(f"   rules:   {evaluate(ScoreFusion(), rows)}")
+    if args.command == "fit":
+        # The fusion is only valid for the model (and backend) and pitch engine its evidence came from
+        fusion = ScoreFusion({**fit(rows, precision=args.precision, folds=args.folds),
+                              "model": firewall.cache_config["model"], "backend": args.backend,
+                              "pitch_engine": args.pitch_engine})
+        fusion.save(args.out)
+        print(f"   fitted:  {evaluate(fusion, rows)} (on the fit data)")
+        print(f"💾 Fusion saved to {args.out}: early exit {fusion.config['early_exit']}")
+    else:
+        fusion = ScoreFusion.load(args.out)
+        reason = fusion.mismatch(firewall.cache_config["model"], args.pitch_engine)
+        if reason is not None:
+            print(f"   ⚠️  {args.out} was fit on {reason}: refit it")
+        print(f"   {fusion.mode + ':':<8} {evaluate(fusion, rows)} ({args.out})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+import time
+import bisect
+import threading
+
+# Off unless asked for: every call below returns immediately when disabled
+ENABLED = os.getenv("VOICEFIREWALL_METRICS", "") not in ("", "0")
+PREFIX = "voicefirewall_"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SCORE_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> Histogram
+_gauges = {}      # name -> callable returning the current value
+_help = {}        # name -> help text
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout (counts per upper bound, sum, count)."""
+
+    def __init__(self, buckets):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    __slots__ = ("key", "buckets", "start")
+
+    def __init__(self, key, buckets):
+        self.key = key
+        self.buckets = buckets
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _observe(self.key, time.perf_counter() - self.start, self.buckets)
+        return False
+
+
+class _NullTimer:
+    """What timer() hands out while metrics are off: entering and leaving it costs nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def describe(name, text):
+    """Optional HELP line for a metric in the export."""
+    _help[name] = text
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _observe(key, value, buckets):
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram(buckets)
+        hist.observe(value)
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    if not ENABLED:
+        return
+    _observe(_key(name, labels), value, buckets)
+
+
+def timer(name, buckets=LATENCY_BUCKETS, **labels):
+    """with timer("stage_seconds", stage="vad"): ...  records the block's wall time."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(_key(name, labels), buckets)
+
+
+def gauge(name, fn):
+    """Registers a callable read at export time (queue depth, active streams, ...)."""
+    _gauges[name] = fn
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _header(lines, name, kind, seen):
+    if name in seen:
+        return
+    seen.add(name)
+    if name in _help:
+        lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+
+def export_text():
+    """Everything recorded so far in the Prometheus text exposition format."""
+    lines, seen = [], set()
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items(), key=lambda kv: kv[0])
+        snapshot = [(key, h.bounds, list(h.counts), h.sum, h.count) for key, h in histograms]
+
+    for (name, labels), value in counters:
+        _header(lines, name, "counter", seen)
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+
+    for (name, labels), bounds, counts, total, count in snapshot:
+        _header(lines, name, "histogram", seen)
+        running = 0
+        for bound, n in zip(bounds + ("+Inf",), counts):
+            running += n
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', bound)])} {running}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total:.6f}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+
+    for name, fn in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        _header(lines, name, "gauge", seen)
+        lines.append(f"{PREFIX}{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port=9108, host="127.0.0.1"):
+    """Starts a /metrics endpoint on a daemon thread (and turns metrics on). Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = export_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Scrapes every few seconds would flood the terminal
+
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,107 @@
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+from bench_pitch import synth_voice, SR
+from scoring_server import PORT
+
+CHUNK_SECONDS = 0.064  # Same 1024-sample frames as the recorder
+
+
+def pcm16(y):
+    return (np.clip(y, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"n": len(latencies), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+
+
+async def http_client(url, body, requests, latencies, errors):
+    http = AsyncHTTPClient()
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            response = await http.fetch(HTTPRequest(url, method="POST", body=body, request_timeout=120,
+                                                    headers={"Content-Type": "application/octet-stream"}))
+            json.loads(response.body)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+
+async def ws_client(url, y, realtime, latencies, errors):
+    """Plays one synthetic call into /stream and records the latency reported per verdict."""
+    try:
+        conn = await websocket_connect(url)
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+        return
+    step = int(SR * CHUNK_SECONDS)
+
+    async def reader():
+        while True:
+            message = await conn.read_message()
+            if message is None:
+                return
+            latencies.append(json.loads(message)["latency_ms"])
+
+    reading = asyncio.ensure_future(reader())
+    for pos in range(0, len(y), step):
+        await conn.write_message(pcm16(y[pos:pos + step]), binary=True)
+        if realtime:
+            await asyncio.sleep(CHUNK_SECONDS)
+    await asyncio.sleep(1.0)  # Let the last verdicts come back
+    conn.close()
+    await reading
+
+
+async def run(args):
+    base = f"{args.host}:{args.port}"
+    clips = [synth_voice(args.seconds, f0=110 + 10 * (i % 8), seed=i)[0] for i in range(args.clients)]
+    AsyncHTTPClient.configure(None, max_clients=args.clients)
+    report = {"clients": args.clients, "mode": args.mode}
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    if args.mode == "http":
+        await asyncio.gather(*(http_client(f"http://{base}/score", pcm16(y), args.requests, latencies, errors)
+                               for y in clips))
+    else:
+        await asyncio.gather(*(ws_client(f"ws://{base}/stream?hop={args.hop}", y, not args.fast, latencies, errors)
+                               for y in clips))
+    elapsed = time.perf_counter() - start
+
+    report.update(percentiles(latencies))
+    report["throughput_per_s"] = round(len(latencies) / elapsed, 2)
+    report["errors"] = len(errors)
+    health = await AsyncHTTPClient().fetch(f"http://{base}/health")
+    report["server"] = json.loads(health.body)
+
+    print(json.dumps(report, indent=2))
+    if errors:
+        print(f"⚠️  First error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for a running scoring_server.py on this machine.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", default="http", choices=["http", "ws"])
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients (calls for ws)")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per HTTP client")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Audio per clip / call")
+    parser.add_argument("--hop", type=float, default=1.0, help="ws: seconds between verdicts")
+    parser.add_argument("--fast", action="store_true", help="ws: send audio as fast as possible, not in real time")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+from detector_v3 import VoiceFirewall, TARGET_SR
+
+_lock = threading.Lock()
+_firewalls = {}
+_stats = {}
+_cache = None
+
+
+def rss_mb():
+    """Resident memory of this process in MB (None if it can't be measured here)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:  # Linux, no extra dependency
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def warm_up(firewall, seconds=1.0):
+    """One throwaway forward pass so the first real request doesn't pay for lazy init."""
+    noise = (0.01 * np.random.default_rng(0).standard_normal(int(TARGET_SR * seconds))).astype(np.float32)
+    firewall.model_probs([noise])
+
+
+def get_firewall(**options):
+    """
+    The process-wide VoiceFirewall for these constructor options. Built (and warmed up) on
+    first use, then shared by every caller: Streamlit sessions, threads, services.
+    """
+    key = tuple(sorted(options.items(), key=lambda kv: kv[0]))
+    firewall = _firewalls.get(key)
+    if firewall is not None:
+        return firewall
+
+    with _lock:
+        if key not in _firewalls:  # Another thread may have won the race
+            before = rss_mb()
+            start = time.perf_counter()
+            firewall = VoiceFirewall(**options)
+            loaded = time.perf_counter()
+            warm_up(firewall)
+            warmed = time.perf_counter()
+            after = rss_mb()
+
+            _stats[key] = {
+                "options": {k: str(v) for k, v in options.items()},
+                "load_s": loaded - start,
+                "warmup_s": warmed - loaded,
+                "rss_mb": after,
+                "model_mb": (after - before) if before is not None and after is not None else None,
+            }
+            _firewalls[key] = firewall
+            print(f"   ⏱️  Model ready in {loaded - start:.1f}s (+{(warmed - loaded) * 1000:.0f} ms warm-up)"
+                  + (f", {_stats[key]['model_mb']:.0f} MB" if _stats[key]["model_mb"] is not None else ""))
+    return _firewalls[key]
+
+
+def get_cache():
+    """The process-wide verdict cache (one SQLite connection shared by everybody)."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            from verdict_cache import VerdictCache
+            _cache = VerdictCache()
+    return _cache
+
+
+def stats():
+    """Load time / warm-up time / memory for every model loaded so far."""
+    return list(_stats.values())
+
+
+if __name__ == "__main__":
+    # Cold-start check for this machine: python model_registry.py [torch|onnx]
+    print(f"📦 torch imported before first use: {'torch' in sys.modules}")
+    get_firewall(backend=sys.argv[1] if len(sys.argv) > 1 else "torch")
+    for entry in stats():
+        print(entry)
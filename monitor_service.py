@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import collections
+import numpy as np
+
+import instrumentation as metrics
+from audio_sources import open_source, RATE, CHUNK_SIZE
+from detector_v3 import MAX_CLIP_SAMPLES
+
+WINDOW_SECONDS = 10   # Context per verdict, same as the dashboard
+HOP_SECONDS = 1.0     # How often each stream asks for a new verdict
+QUEUE_SIZE = 64       # Pending windows across all streams
+MAX_BATCH = 8         # Windows a worker may take off the queue in one go
+
+
+class StreamMonitor:
+    """
+    One monitored call leg. A capture thread keeps the last WINDOW_SECONDS of audio and,
+    every HOP_SECONDS of new audio, offers a snapshot to the shared job queue. Verdicts
+    for this stream come back through publish(), which drops any that arrive after a newer one.
+    """
+
+    def __init__(self, stream_id, source, jobs, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS):
+        self.stream_id = stream_id
+        self.source = source
+        self.jobs = jobs
+        self.window = collections.deque(maxlen=int(RATE * window_seconds / CHUNK_SIZE) + 1)
+        self.hop_samples = int(RATE * hop_seconds)
+        self.window_samples = int(RATE * window_seconds)
+        self.listeners = []
+        self.latest = None
+        self.captured = 0          # Samples read so far: a window is identified by the counter it ends at
+        self.published_end = -1    # End counter of the window behind `latest`
+        self.publish_lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0   # Windows skipped because the workers were saturated
+        self.stale = 0     # Verdicts discarded because a newer window was already published
+        self.running = False
+        self.error = None
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.stream_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _capture_loop(self):
+        try:
+            self.source.open()
+            since_last = 0
+            while self.running:
+                chunk = self.source.read()
+                if chunk is None:
+                    break
+                self.window.append(chunk)
+                self.captured += len(chunk)
+                since_last += len(chunk)
+                if since_last >= self.hop_samples:
+                    since_last = 0
+                    self._submit()
+        except Exception as e:
+            self.error = e
+            print(f"❌ [{self.stream_id}] Capture Error: {e}")
+        finally:
+            self.running = False
+            self.source.close()
+
+    def _submit(self):
+        samples = np.concatenate(self.window)[-self.window_samples:]
+        try:
+            # Never block capture: if the pool is behind, this window is simply skipped
+            self.jobs.put_nowait((self, time.time(), self.captured, samples))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("windows_dropped_total", stream=self.stream_id)
+
+    def publish(self, verdict, end):
+        """Hands a verdict to the listeners unless a newer window (larger `end`) already went out."""
+        # Several workers score this stream at once, so verdicts can finish out of order
+        with self.publish_lock:
+            if end <= self.published_end:
+                self.stale += 1
+                metrics.inc("verdicts_stale_total", stream=self.stream_id)
+                return
+            self.published_end = end
+            self.latest = verdict
+            # Listeners run under the lock too, so logs see the verdicts in window order
+            for listener in self.listeners:
+                try:
+                    listener(verdict)
+                except Exception as e:
+                    print(f"⚠️  [{self.stream_id}] Listener Error: {e}")
+
+
+class MonitorService:
+    """
+    N audio streams -> one bounded queue -> a fixed pool of workers sharing ONE VoiceFirewall.
+    Memory holds a single model copy, and CPU use is capped by the worker count.
+    """
+
+    def __init__(self, firewall, workers=2, queue_size=QUEUE_SIZE, max_batch=MAX_BATCH):
+        self.firewall = firewall
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.n_workers = workers
+        self.max_batch = max_batch
+        self.streams = {}
+        self.workers = []
+        self.running = False
+        metrics.gauge("queue_depth", self.queue_depth)
+        metrics.gauge("active_streams", lambda: sum(m.running for m in self.streams.values()))
+
+    def add_stream(self, stream_id, source, **kwargs):
+        monitor = StreamMonitor(stream_id, source, self.jobs, **kwargs)
+        self.streams[stream_id] = monitor
+        if self.running:
+            monitor.start()
+        return monitor
+
+    def start(self):
+        self.running = True
+        for i in range(self.n_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"inference-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        for monitor in self.streams.values():
+            monitor.start()
+
+    def stop(self):
+        for monitor in self.streams.values():
+            monitor.stop()
+        self.running = False
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def _worker_loop(self):
+        while self.running:
+            try:
+                batch = [self.jobs.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Whatever else is already waiting rides along in the same forward pass
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                # The model only hears 4 s per clip: score the newest 4 s of each window, not the oldest
+                results = self.firewall.analyze_batch([samples[-MAX_CLIP_SAMPLES:] for *_, samples in batch],
+                                                      batch_size=self.max_batch)
+                for (monitor, captured_at, end, _), (label, score) in zip(batch, results):
+                    metrics.observe("verdict_latency_seconds", time.time() - captured_at)
+                    monitor.publish({
+                        "stream": monitor.stream_id,
+                        "time": time.strftime("%H:%M:%S", time.localtime(captured_at)),
+                        "label": label,
+                        "score": round(float(score), 4),
+                        "latency_ms": round((time.time() - captured_at) * 1000, 1),
+                    }, end)
+            except Exception as e:
+                print(f"❌ Worker Error: {e}")
+            finally:
+                # Even a failed batch counts as handled, so jobs.join() can't hang on it
+                for _ in batch:
+                    self.jobs.task_done()
+
+    def active(self):
+        return any(m.running for m in self.streams.values())
+
+
+def jsonl_writer(path):
+    lock = threading.Lock()
+
+    def write(verdict):
+        with lock, open(path, "a") as f:
+            f.write(json.dumps(verdict) + "\n")
+    return write
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Voice Firewall: monitor many audio streams at once.")
+    parser.add_argument("sources", nargs="+", help="device[:N] | file:PATH | tcp:HOST:PORT | synthetic[:F0] (one per stream)")
+    parser.add_argument("--workers", type=int, default=2, help="Inference threads sharing the model")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--hop", type=float, default=HOP_SECONDS, help="Seconds of new audio between verdicts")
+    parser.add_argument("--torch-threads", type=int, help="PyTorch intra-op threads per worker (default: the cores split evenly)")
+    parser.add_argument("--out", help="Folder for one <stream>.jsonl verdict log per stream")
+    parser.add_argument("--quiet", action="store_true", help="Don't print verdicts to the terminal")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port (/metrics)")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    from model_registry import get_firewall
+
+    firewall = get_firewall()
+    # One core slice per worker, so concurrent forward passes don't oversubscribe the CPU
+    firewall.runtime.set_instances(args.workers, args.torch_threads)
+    print(f"⚙️  {firewall.runtime.describe()}")
+
+    service = MonitorService(firewall, workers=args.workers, queue_size=args.queue_size)
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    for i, spec in enumerate(args.sources):
+        stream_id = f"stream{i}"
+        monitor = service.add_stream(stream_id, open_source(spec), hop_seconds=args.hop)
+        if args.out:
+            monitor.listeners.append(jsonl_writer(os.path.join(args.out, f"{stream_id}.jsonl")))
+        if not args.quiet:
+            monitor.listeners.append(lambda v: print(
+                f"{v['time']} | {'🔴' if v['label'] == 'FAKE' else '🟢'} {v['stream']:<9} "
+                f"{v['label']:<7} ({v['score']:.2f}) {v['latency_ms']:.0f} ms"))
+        print(f"📡 {stream_id}: {spec}")
+
+    service.start()
+    try:
+        while service.active():
+            time.sleep(1.0)
+        service.jobs.join()  # All sources ended: let the pool finish what is queued
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        for monitor in service.streams.values():
+            print(f"   {monitor.stream_id}: {monitor.submitted} windows queued, {monitor.dropped} dropped, "
+                  f"{monitor.stale} out-of-order verdicts discarded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Human Voice Range
+FMIN = 60
+FMAX = 500
+
+# 64 ms frames at 16 kHz: long enough for two periods of a 60 Hz voice.
+# The hop matches pyin's, because jitter is a frame-to-frame measure and its thresholds
+# were tuned on that frame rate.
+YIN_FRAME_LENGTH = 1024
+YIN_HOP_LENGTH = 512
+YIN_THRESHOLD = 0.15      # Max normalised difference for a frame to count as voiced
+YIN_MIN_RMS = 1e-3        # Frames quieter than this are never voiced
+
+PYIN_FRAME_LENGTH = 2048  # librosa defaults
+PYIN_HOP_LENGTH = 512
+
+AMP_FRAME_LENGTH = 1024   # Shimmer uses the same amplitude frames whatever the pitch engine
+
+
+def frame_peaks(y, frame_length, hop_length, center=True):
+    """Peak absolute amplitude per frame, on the same frame grid as the pitch trackers."""
+    y = np.abs(np.asarray(y, dtype=np.float32))
+    if center:
+        y = np.pad(y, frame_length // 2)
+    if len(y) < frame_length:
+        y = np.pad(y, (0, frame_length - len(y)))
+    return sliding_window_view(y, frame_length)[::hop_length].max(axis=1)
+
+
+def track_pyin(y, sr):
+    """
+    librosa's probabilistic YIN + Viterbi decode. Slow but the most robust option.
+    Returns (f0, voiced_flag, frame_amplitude); f0 is NaN on unvoiced frames.
+    """
+    import librosa
+
+    f0, voiced_flag, _ = librosa.pyin(y, fmin=FMIN, fmax=FMAX, sr=sr,
+                                      frame_length=PYIN_FRAME_LENGTH, hop_length=PYIN_HOP_LENGTH)
+    amp = frame_peaks(y, AMP_FRAME_LENGTH, PYIN_HOP_LENGTH)[:len(f0)]
+    return f0, voiced_flag, amp
+
+
+def track_yin(y, sr, frame_length=YIN_FRAME_LENGTH, hop_length=YIN_HOP_LENGTH, threshold=YIN_THRESHOLD):
+    """
+    Plain YIN, vectorised over all frames at once (no per-frame Python loop, no Viterbi).
+    Frames are strided views of the signal; the difference function comes from one batched FFT.
+    Returns (f0, voiced_flag, frame_amplitude) like track_pyin().
+    """
+    y = np.asarray(y, dtype=np.float32)
+    amp = frame_peaks(y, AMP_FRAME_LENGTH, hop_length)
+
+    y = np.pad(y, frame_length // 2)  # center=True, same as librosa
+    if len(y) < frame_length:
+        y = np.pad(y, (0, frame_length - len(y)))
+    frames = sliding_window_view(y, frame_length)[::hop_length]  # (n_frames, frame_length), zero-copy
+
+    win = frame_length // 2
+    min_period = max(1, int(np.floor(sr / FMAX)))
+    max_period = min(win - 1, int(np.ceil(sr / FMIN)))
+
+    # Autocorrelation of the first `win` samples against every lag: r[t] = sum_j x[j] * x[j + t]
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + win)))
+    spec = np.fft.rfft(frames, n_fft, axis=1)
+    head = np.fft.rfft(frames[:, :win], n_fft, axis=1)
+    acf = np.fft.irfft(spec * np.conj(head), n_fft, axis=1)[:, :max_period + 2]
+
+    # Energy of the sliding window x[t : t + win] for every lag, via cumulative sums
+    power = np.cumsum(np.square(frames, dtype=np.float64), axis=1)
+    power = np.concatenate([np.zeros((len(frames), 1)), power], axis=1)
+    lags = np.arange(max_period + 2)
+    energy = power[:, lags + win] - power[:, lags]
+
+    # YIN difference function and its cumulative-mean normalisation (d'(0) = 1)
+    diff = np.maximum(energy[:, :1] + energy - 2.0 * acf, 0.0)
+    cum = np.cumsum(diff[:, 1:], axis=1)
+    cmnd = np.ones_like(diff)
+    cmnd[:, 1:] = diff[:, 1:] * lags[1:] / np.maximum(cum, 1e-12)
+
+    # First dip below the threshold that is also a local minimum; otherwise the global minimum
+    search = cmnd[:, min_period:max_period + 1]
+    is_min = np.zeros_like(search, dtype=bool)
+    is_min[:, 1:-1] = (search[:, 1:-1] <= search[:, :-2]) & (search[:, 1:-1] <= search[:, 2:])
+    candidates = is_min & (search < threshold)
+    has_dip = candidates.any(axis=1)
+    idx = np.where(has_dip, candidates.argmax(axis=1), search.argmin(axis=1))
+    tau = idx + min_period
+
+    # Parabolic interpolation around the chosen lag for sub-sample period precision
+    rows = np.arange(len(frames))
+    a, b, c = cmnd[rows, tau - 1], cmnd[rows, tau], cmnd[rows, tau + 1]
+    denom = a - 2.0 * b + c
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (a - c) / np.where(denom == 0, 1.0, denom), 0.0)
+    period = tau + np.clip(shift, -1.0, 1.0)
+
+    rms = np.sqrt(energy[:, 0] / win)
+    voiced = has_dip & (rms > YIN_MIN_RMS)
+    f0 = np.where(voiced, sr / period, np.nan)
+    return f0, voiced, amp[:len(f0)]
+
+
+PITCH_ENGINES = {
+    "pyin": track_pyin,
+    "yin": track_yin,
+}
+
+
+def get_pitch_engine(name):
+    try:
+        return PITCH_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown pitch engine '{name}' (expected one of {sorted(PITCH_ENGINES)})")
+
+
+def jitter(f0):
+    """Mean absolute period-to-period pitch change, relative to mean pitch (voiced frames only)."""
+    if len(f0) < 5: return 0.0
+    return float(np.mean(np.abs(np.diff(f0))) / np.mean(f0))
+
+
+def shimmer(amp):
+    """Same idea as jitter, applied to the peak amplitude of consecutive voiced frames."""
+    if len(amp) < 5: return 0.0
+    mean_amp = np.mean(amp)
+    if mean_amp <= 0: return 0.0
+    return float(np.mean(np.abs(np.diff(amp))) / mean_amp)
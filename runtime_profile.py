@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+
+PROFILE_PATH = "./models/runtime_profile.json"  # Written by `python runtime_profile.py calibrate`
+
+DEFAULT_PROFILE = {
+    "instances": 1,           # Inference threads expected to run the model at the same time (see RuntimeProfile)
+    "threads": None,          # Intra-op threads per instance (None = this process's cores / instances)
+    "interop_threads": None,  # torch inter-op pool (None = leave torch's default)
+    "pin": True,              # Give each instance its own cores (Linux only)
+    "inference_mode": True,   # torch.inference_mode() instead of no_grad() around the forward pass
+    "channels_last": False,   # Only has an effect on models with 2-D convolutions
+    "compile": False,         # torch.compile() the model (slow first call, needs a C++ toolchain)
+}
+
+
+def available_cores():
+    """CPU ids this process may run on (respects taskset / cgroup cpusets)."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        return list(range(os.cpu_count() or 1))
+
+
+def partition(cores, parts):
+    """Splits a core list into `parts` contiguous slices of (nearly) equal size; never empty."""
+    parts = max(1, min(parts, len(cores)))
+    return [[int(c) for c in chunk] for chunk in np.array_split(cores, parts)]
+
+
+def process_share(spec=None):
+    """
+    The cores this process owns when several processes split one box. spec / VOICEFIREWALL_CPU_SHARE
+    is "INDEX/COUNT" (e.g. "2/4" = third quarter of the cores); unset means all of them.
+    """
+    spec = spec or os.getenv("VOICEFIREWALL_CPU_SHARE", "")
+    cores = available_cores()
+    if not spec:
+        return cores
+    index, count = (int(n) for n in spec.split("/"))
+    slices = partition(cores, count)
+    return slices[index % len(slices)]
+
+
+def _pin(cores):
+    # On Linux pid 0 is the calling thread only; torch's OpenMP pool for this thread inherits it
+    try:
+        os.sched_setaffinity(0, cores)
+    except (AttributeError, OSError):
+        pass
+
+
+def _pin_process(cores):
+    """Pins every thread this process already has; threads started later inherit it from their creator."""
+    try:
+        threads = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:  # No procfs: the calling thread is all we can reach
+        threads = [0]
+    for tid in threads:
+        try:
+            os.sched_setaffinity(tid, cores)
+        except (AttributeError, OSError):
+            pass
+
+
+class RuntimeProfile:
+    """
+    How the model uses the CPU. Every thread that runs the model (dashboard sessions, monitor
+    workers, the scoring executor) claims one of `instances` slots the first time it calls
+    bind_thread(): it is pinned to that slot's cores and torch uses exactly that many intra-op
+    threads in it. Concurrent inferences then split the box instead of all fighting for every core.
+
+    Unless `instances` was calibrated, passed in or set with set_instances(), it follows the
+    number of live threads that have run the model (e.g. open dashboard sessions), re-counted
+    whenever a new one starts.
+    """
+
+    def __init__(self, config=None, share=None):
+        self.config = {**DEFAULT_PROFILE, **(config or {})}
+        self.auto_instances = "instances" not in (config or {})
+        self.cores = process_share(share)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._next_slot = 0
+        self._bound = []  # Threads that have run the model (for auto_instances)
+        self._process_applied = False
+
+    @classmethod
+    def load(cls, path=PROFILE_PATH, **overrides):
+        """The calibrated profile at `path` (defaults if there is none), with `overrides` applied."""
+        config = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                config = json.load(f).get("profile", {})
+        config.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(config)
+
+    def save(self, path=PROFILE_PATH, results=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"profile": self.config, "cores": len(self.cores), "results": results or []}, f, indent=2)
+
+    @property
+    def slots(self):
+        return partition(self.cores, self.config["instances"])
+
+    def threads_per_instance(self):
+        return self.config["threads"] or max(1, len(self.cores) // max(1, self.config["instances"]))
+
+    def set_instances(self, instances, threads=None):
+        """Re-partition for a new number of concurrent inference threads (e.g. the worker count)."""
+        with self._lock:
+            self.config["instances"] = max(1, instances)
+            self.auto_instances = False
+            if threads is not None:
+                self.config["threads"] = threads
+            self._generation += 1  # Threads re-bind on their next inference
+            self._next_slot = 0
+
+    def apply_process(self):
+        """Process-wide settings. Call once, before the first forward pass (torch refuses later)."""
+        if self._process_applied:
+            return
+        self._process_applied = True
+        if self.cores != available_cores():
+            _pin_process(self.cores)
+        if self.config["interop_threads"]:
+            import torch
+            try:
+                torch.set_num_interop_threads(self.config["interop_threads"])
+            except RuntimeError:
+                pass  # Already fixed by earlier torch work in this process
+
+    def bind_thread(self):
+        """Pins the calling thread to its slot and sets its torch thread count. Cheap after the first call."""
+        if getattr(self._local, "generation", None) == self._generation:
+            return
+        with self._lock:
+            if self.auto_instances:
+                me = threading.current_thread()
+                self._bound = [t for t in self._bound if t.is_alive() and t is not me] + [me]
+                live = min(len(self._bound), len(self.cores))
+                if live != self.config["instances"]:
+                    self.config["instances"] = live
+                    self._generation += 1  # Everyone re-binds to the new split on their next inference
+                    self._next_slot = 0
+            slots = self.slots
+            slot = slots[self._next_slot % len(slots)]
+            self._next_slot += 1
+            self._local.generation = self._generation
+        if self.config["pin"]:
+            # Even the one all-core slot: the thread may still be pinned narrower, by an earlier
+            # split or by the (pinned) thread that started it
+            _pin(slot)
+        threads = self.config["threads"] or len(slot)
+        if "torch" in sys.modules:  # The ONNX backend never imports torch
+            sys.modules["torch"].set_num_threads(threads)
+        self._local.cores = slot
+
+    def prepare_model(self, model):
+        """Applies channels_last / compile to a freshly loaded torch model. Returns the model to use."""
+        import torch
+
+        if self.config["channels_last"] and any(isinstance(m, torch.nn.Conv2d) for m in model.modules()):
+            model = model.to(memory_format=torch.channels_last)
+        if self.config["compile"]:
+            try:
+                model = torch.compile(model, dynamic=True)
+            except Exception as e:
+                print(f"   ⚠️  torch.compile unavailable ({type(e).__name__}), running eagerly")
+        return model
+
+    def inference_context(self):
+        """Grad-free context for the forward pass."""
+        import torch
+        return torch.inference_mode() if self.config["inference_mode"] else torch.no_grad()
+
+    def describe(self):
+        return (f"{self.config['instances']} instance(s) x {self.threads_per_instance()} thread(s) on "
+                f"{len(self.cores)} core(s)" + (", pinned" if self.config["pin"] and self.config["instances"] > 1 else "")
+                + (" (follows live inference threads)" if self.auto_instances else "")
+                + (", inference_mode" if self.config["inference_mode"] else ", no_grad")
+                + (", compiled" if self.config["compile"] else ""))
+
+
+def measure(firewall, profile, seconds=5.0, batch=1):
+    """Aggregate clips/s with profile.config["instances"] threads running 4 s clips back to back."""
+    from detector_v3 import MAX_CLIP_SAMPLES
+
+    rng = np.random.default_rng(0)
+    clip = (0.05 * rng.standard_normal(MAX_CLIP_SAMPLES)).astype(np.float32)
+    firewall.runtime = profile
+    instances = profile.config["instances"]
+    warm, go = threading.Barrier(instances + 1), threading.Barrier(instances + 1)
+    done, stop = [], []
+
+    def run():
+        firewall.model_probs([clip] * batch)  # Warm-up: binds this thread to its slot (and compiles)
+        warm.wait()
+        go.wait()
+        n = 0
+        while time.perf_counter() < stop[0]:
+            firewall.model_probs([clip] * batch)
+            n += batch
+        done.append(n)
+
+    threads = [threading.Thread(target=run) for _ in range(instances)]
+    for t in threads:
+        t.start()
+    warm.wait()
+    start = time.perf_counter()
+    stop.append(start + seconds)
+    go.wait()
+    for t in threads:
+        t.join()
+    return sum(done) / (time.perf_counter() - start)
+
+
+def candidates(cores, try_compile=False):
+    """(instances, extra options) to try: every power-of-two split of the cores, then the torch options."""
+    instances, n = [], 1
+    while n <= len(cores):
+        instances.append(n)
+        n *= 2
+    if instances[-1] != len(cores):
+        instances.append(len(cores))
+    options = [{"inference_mode": False}, {"inference_mode": True}]
+    if try_compile:
+        options.append({"inference_mode": True, "compile": True})
+    return instances, options
+
+
+def calibrate(seconds=5.0, batch=1, try_compile=False, path=PROFILE_PATH):
+    """Times every candidate on this host and saves the one with the highest aggregate throughput."""
+    from detector_v3 import VoiceFirewall
+
+    base = RuntimeProfile.load(None)
+    base.apply_process()
+    firewall = VoiceFirewall(backend="torch", runtime=base)
+    eager = firewall.model
+    instances, options = candidates(base.cores, try_compile)
+    results = []
+
+    def trial(config):
+        profile = RuntimeProfile(config)
+        firewall.model = profile.prepare_model(eager)
+        try:
+            rate = measure(firewall, profile, seconds, batch)
+        except Exception as e:  # e.g. torch.compile without a working compiler
+            print(f"   {profile.describe():<64} failed: {type(e).__name__}: {e}")
+            return 0.0
+        results.append({**config, "clips_per_s": round(rate, 2)})
+        print(f"   {profile.describe():<64} {rate:8.2f} clips/s")
+        return rate
+
+    # 1. How to split the cores, with the default torch options
+    best = max(({"instances": n} for n in instances), key=trial)
+    # 2. Which torch options help at that split
+    best = max(({**best, **extra} for extra in options), key=trial)
+
+    profile = RuntimeProfile(best)
+    profile.save(path, results)
+    print(f"💾 Fastest on this host: {profile.describe()} -> {path}")
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU runtime profile for the Voice Firewall model.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cal = sub.add_parser("calibrate", help="Find the fastest core split / torch options for this host")
+    cal.add_argument("--seconds", type=float, default=5.0, help="Measurement time per candidate")
+    cal.add_argument("--batch", type=int, default=1, help="Clips per forward pass")
+    cal.add_argument("--try-compile", action="store_true", help="Also try torch.compile (slow to warm up)")
+    cal.add_argument("--out", default=PROFILE_PATH)
+    show = sub.add_parser("show", help="Print the profile the firewall would use")
+    show.add_argument("--path", default=PROFILE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        print(f"🧮 Calibrating on {len(available_cores())} core(s)...")
+        calibrate(args.seconds, args.batch, args.try_compile, args.out)
+    else:
+        profile = RuntimeProfile.load(args.path)
+        print(f"⚙️  {profile.describe()}")
+        print(json.dumps(profile.config, indent=2))
+
+
+if __name__ == "__main__":
+    main()
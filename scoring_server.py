@@ -0,0 +1,252 @@
+import io
+import json
+import time
+import asyncio
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import tornado.web
+import tornado.websocket
+
+import instrumentation as metrics
+from detector_v3 import TARGET_SR, MAX_CLIP_SAMPLES
+
+PORT = 8765
+MAX_BATCH = 16           # Clips per forward pass
+MAX_WAIT_MS = 5.0        # How long the first request of a batch waits for company
+MAX_BODY_MB = 50         # Largest upload accepted over HTTP
+WINDOW_SECONDS = MAX_CLIP_SAMPLES / TARGET_SR  # Rolling context per WebSocket call: the newest 4 s the model hears
+HOP_SECONDS = 1.0        # New audio between WebSocket verdicts
+# Browser pages allowed to open WS /stream (the Streamlit dashboard). Clients that send no Origin
+# header (gateways, scripts) are not affected; any other web page is refused.
+ALLOWED_ORIGINS = ("http://localhost:8501", "http://127.0.0.1:8501")
+
+
+def decode_body(body, content_type, sr):
+    """
+    Request body -> 16 kHz mono float32. Raw PCM (application/octet-stream or audio/L16,
+    16-bit little-endian, mono, at `sr`) or any file librosa can read (WAV, FLAC, OGG...).
+    """
+    import librosa
+
+    if content_type.startswith(("application/octet-stream", "audio/l16", "audio/pcm")):
+        y = np.frombuffer(body[:len(body) - len(body) % 2], dtype="<i2").astype(np.float32) / 32768.0
+    else:
+        y, sr = librosa.load(io.BytesIO(body), sr=None, mono=True)
+    if sr != TARGET_SR:
+        y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR)
+    return np.asarray(y, dtype=np.float32)
+
+
+class MicroBatcher:
+    """
+    Collects scoring requests from any number of concurrent clients and runs them through
+    VoiceFirewall.analyze_batch() together: the first request waits at most max_wait_ms for
+    others to arrive (or until max_batch are queued), then the whole group is one forward
+    pass. The model runs on a single dedicated thread, so the event loop never blocks.
+    """
+
+    def __init__(self, firewall, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.firewall = firewall
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.pending = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+        self.batches = 0
+        self.clips = 0
+        self.batch_sizes = collections.Counter()
+
+    def start(self):
+        self.pending = asyncio.Queue()
+        metrics.gauge("queue_depth", self.pending.qsize)
+        asyncio.get_running_loop().create_task(self._run())
+
+    async def score(self, samples):
+        """(label, score) for one 16 kHz clip, batched with whatever else is in flight."""
+        future = asyncio.get_running_loop().create_future()
+        await self.pending.put((samples, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.pending.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.pending.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.firewall.analyze_batch, [samples for samples, _ in batch], self.max_batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.clips += len(batch)
+            metrics.observe("server_batch_size", len(batch), buckets=metrics.SIZE_BUCKETS)
+            self.batch_sizes[len(batch)] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():  # Client may have disconnected meanwhile
+                    future.set_result(result)
+
+    def stats(self):
+        return {"batches": self.batches, "clips": self.clips,
+                "mean_batch": round(self.clips / self.batches, 2) if self.batches else 0.0,
+                "queued": self.pending.qsize() if self.pending is not None else 0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items()))}
+
+
+def verdict_json(label, score, started):
+    return {"label": label, "score": round(float(score), 4),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+class ScoreHandler(tornado.web.RequestHandler):
+    """POST /score[?sr=16000]: one clip in the body, one verdict back."""
+
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    async def post(self):
+        started = time.perf_counter()
+        content_type = self.request.headers.get("Content-Type", "application/octet-stream").lower()
+        try:
+            sr = int(self.get_argument("sr", TARGET_SR))
+            # Decoding can be slow for compressed files: keep it off the event loop
+            y = await asyncio.get_running_loop().run_in_executor(
+                None, decode_body, self.request.body, content_type, sr)
+        except Exception as e:
+            self.set_status(400)
+            self.write({"error": f"Could not decode audio: {type(e).__name__}: {e}"})
+            return
+        label, score = await self.batcher.score(y)
+        metrics.observe("request_latency_seconds", time.perf_counter() - started, endpoint="score")
+        self.write({**verdict_json(label, score, started), "seconds": round(len(y) / TARGET_SR, 2)})
+
+
+class StreamHandler(tornado.websocket.WebSocketHandler):
+    """
+    WS /stream[?sr=16000&hop=1.0]: binary messages of raw 16-bit PCM for one call. Every
+    `hop` seconds of new audio, the last WINDOW_SECONDS are scored and a JSON verdict is
+    sent back. Windows from all open calls share the same micro-batches.
+    """
+
+    def initialize(self, batcher, origins=ALLOWED_ORIGINS):
+        self.batcher = batcher
+        self.origins = origins
+
+    def check_origin(self, origin):
+        # Only called for browser connections: refuses cross-site WebSocket hijacking from other pages
+        return origin.rstrip("/").lower() in self.origins
+
+    def open(self):
+        self.sr = int(self.get_argument("sr", TARGET_SR))
+        self.hop = int(self.sr * float(self.get_argument("hop", HOP_SECONDS)))
+        self.window = collections.deque()
+        self.buffered = 0
+        self.since_last = 0
+        self.scoring = False
+
+    def on_message(self, message):
+        if not isinstance(message, bytes):
+            return  # Text messages are reserved for control; nothing defined yet
+        chunk = np.frombuffer(message[:len(message) - len(message) % 2], dtype="<i2").astype(np.float32) / 32768.0
+        self.window.append(chunk)
+        self.buffered += len(chunk)
+        self.since_last += len(chunk)
+        while self.buffered - len(self.window[0]) >= self.sr * WINDOW_SECONDS:
+            self.buffered -= len(self.window.popleft())
+
+        # One window in flight per call: if scoring is slower than real time, hops are skipped.
+        # Scoring runs as its own task, so frames keep arriving (and replace stale audio) meanwhile.
+        if self.since_last < self.hop or self.scoring:
+            return
+        self.since_last = 0
+        self.scoring = True
+        y = np.concatenate(self.window)[-int(self.sr * WINDOW_SECONDS):]
+        asyncio.get_running_loop().create_task(self._score(y, time.perf_counter()))
+
+    async def _score(self, y, started):
+        try:
+            if self.sr != TARGET_SR:
+                import librosa
+                y = librosa.resample(y, orig_sr=self.sr, target_sr=TARGET_SR)
+            label, score = await self.batcher.score(y)
+            metrics.observe("request_latency_seconds", time.perf_counter() - started, endpoint="stream")
+            if self.ws_connection is not None:
+                self.write_message(json.dumps(verdict_json(label, score, started)))
+        except Exception as e:
+            print(f"❌ Stream Error: {e}")
+        finally:
+            self.scoring = False
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    def get(self):
+        self.write({"status": "ok", **self.batcher.stats()})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """GET /metrics: Prometheus text format (stage latencies, batch sizes, queue depth)."""
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(metrics.export_text())
+
+
+def make_app(batcher, origins=ALLOWED_ORIGINS):
+    args = {"batcher": batcher}
+    return tornado.web.Application([
+        (r"/score", ScoreHandler, args),
+        (r"/stream", StreamHandler, {**args, "origins": tuple(o.rstrip("/").lower() for o in origins)}),
+        (r"/health", HealthHandler, args),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+async def serve(args):
+    from model_registry import get_firewall
+
+    metrics.enable(not args.no_metrics)
+    batcher = MicroBatcher(get_firewall(backend=args.backend), args.max_batch, args.max_wait_ms)
+    batcher.start()
+    make_app(batcher, ALLOWED_ORIGINS + tuple(args.allow_origin)).listen(args.port, args.host, max_body_size=MAX_BODY_MB * 2**20)
+    print(f"🛰️  Scoring server on http://{args.host}:{args.port} "
+          f"(POST /score, WS /stream, GET /health, GET /metrics; batches of ≤{args.max_batch}, ≤{args.max_wait_ms:g} ms wait)")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Voice Firewall scoring server (HTTP + WebSocket).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "student"])
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Clips per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="How long a request may wait for others to share its batch")
+    parser.add_argument("--no-metrics", action="store_true", help="Don't record per-stage metrics")
+    parser.add_argument("--allow-origin", action="append", default=[],
+                        help="Extra browser origin allowed to open WS /stream (e.g. http://dashboard:8501)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
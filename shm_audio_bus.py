@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import queue
+import argparse
+import collections
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from detector_v3 import MAX_CLIP_SAMPLES
+
+RATE = 16000
+WINDOW_SECONDS = 10   # Context per verdict, same as monitor_service.py (the model hears its newest 4 s)
+HOP_SECONDS = 1.0     # New audio between verdicts, per stream
+RING_SECONDS = 40     # Ring history per stream: a window must survive while a worker scores it
+QUEUE_SIZE = 64       # Pending descriptors across all streams
+MAX_BATCH = 8         # Windows a worker may take off the queue in one go
+
+# Header slots (int64) at the start of every ring segment. Each slot has a single writer:
+# STALE + i belongs to inference worker i, so no counter is ever updated from two processes.
+CAPACITY, WRITTEN, DROPPED, STALE = 0, 1, 2, 3
+HEADER_BYTES = 512    # 64 slots; keeps the sample area 64-byte aligned
+MAX_WORKERS = HEADER_BYTES // 8 - STALE
+
+# What travels over the control queue: a few dozen bytes instead of the audio itself
+Window = collections.namedtuple("Window", "stream ring end samples captured_at")
+
+
+def _attach(name):
+    """Opens an existing segment; only the AudioBus that created it unlinks it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older Pythons register the attach too, but spawned children share the parent's
+        # resource tracker, so that is the same registration the creator already holds
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedRing:
+    """
+    Single-writer float32 audio ring in a shared-memory segment, readable from any process.
+
+    Samples are stored twice (at i and i + capacity), so every window of up to `capacity`
+    samples is one contiguous slice: readers get a plain NumPy view of shared memory and
+    never copy. Like audio_stream.AudioRingBuffer, the writer copies first and only then
+    advances the `written` counter; a reader checks still_valid() after using a view to find
+    out whether the writer lapped it meanwhile.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self.header[CAPACITY])
+        self.data = np.ndarray((2 * self.capacity,), dtype=np.float32, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_BYTES + 2 * capacity * 4)
+        header = np.ndarray((HEADER_BYTES // 8,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[CAPACITY] = capacity
+        del header  # No exported views may outlive close()
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def written(self):
+        return int(self.header[WRITTEN])
+
+    @property
+    def dropped(self):
+        """Windows never scored: skipped at capture (queue full) or overwritten while being scored."""
+        return int(self.header[DROPPED] + self.header[STALE:].sum())
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        start = (self.written + n - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - start)
+        for base in (0, self.capacity):  # Both copies, so any window can be read contiguously
+            self.data[base + start:base + start + first] = samples[:first]
+            self.data[base:base + len(samples) - first] = samples[first:]
+        self.header[WRITTEN] += n  # Publish only after the copy
+
+    def window(self, n_samples, end=None):
+        """Read-only view of the n_samples before counter `end` (default: now). Zero-copy."""
+        end = self.written if end is None else end
+        n = max(0, min(n_samples, end, self.capacity))
+        start = (end - n) % self.capacity
+        view = self.data[start:start + n]
+        view.flags.writeable = False
+        return view
+
+    def still_valid(self, start):
+        """True if the samples from counter `start` onwards have not been overwritten yet."""
+        return self.written - start <= self.capacity
+
+    def close(self):
+        # Drop our own views first: SharedMemory refuses to close while NumPy still exports its buffer
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_process(stream_id, spec, ring_name, jobs, pending, stop, hop_seconds=HOP_SECONDS,
+                    window_seconds=WINDOW_SECONDS):
+    """
+    Runs in its own process: reads one source and writes it into its shared ring. Every
+    hop_seconds of new audio a Window descriptor (the newest window_seconds, at most the 4 s
+    the model hears) goes on the job queue; if the workers are behind, the window is skipped
+    (counted in the ring header) and capture carries on.
+    """
+    from audio_sources import open_source
+
+    ring = SharedRing.attach(ring_name)
+    source = open_source(spec)
+    hop, window = int(RATE * hop_seconds), min(int(RATE * window_seconds), MAX_CLIP_SAMPLES)
+    try:
+        source.open()
+        since_last = 0
+        while not stop.is_set():
+            chunk = source.read()
+            if chunk is None:
+                break
+            ring.write(chunk)
+            since_last += len(chunk)
+            if since_last >= hop:
+                since_last = 0
+                end = ring.written
+                try:
+                    with pending.get_lock():
+                        pending.value += 1
+                    jobs.put_nowait(Window(stream_id, ring_name, end, min(window, end), time.time()))
+                except queue.Full:
+                    with pending.get_lock():
+                        pending.value -= 1
+                    ring.header[DROPPED] += 1
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ [{stream_id}] Capture Error: {e}")
+    finally:
+        source.close()
+        ring.close()
+
+
+def inference_process(worker, n_workers, jobs, results, pending, stop, options):
+    """
+    Runs in its own process with its own model: takes descriptors off the job queue, scores
+    the windows straight out of the shared rings, and posts verdict dicts to `results`.
+    Verdicts for windows the capture side overwrote while they were being scored are dropped.
+    """
+    if n_workers > 1:
+        os.environ.setdefault("VOICEFIREWALL_CPU_SHARE", f"{worker}/{n_workers}")  # See runtime_profile.py
+    from model_registry import get_firewall
+
+    firewall = get_firewall(**options)
+    rings = {}
+    try:
+        while not stop.is_set():
+            try:
+                batch = [jobs.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            views = []
+            try:
+                for job in batch:
+                    if job.ring not in rings:
+                        rings[job.ring] = SharedRing.attach(job.ring)
+                    views.append(rings[job.ring].window(job.samples, job.end))
+                verdicts = firewall.analyze_batch(views, batch_size=MAX_BATCH)
+
+                for job, (label, score) in zip(batch, verdicts):
+                    ring = rings[job.ring]
+                    if not ring.still_valid(job.end - job.samples):
+                        ring.header[STALE + worker] += 1  # Scored audio that was already being overwritten
+                        continue
+                    results.put({"stream": job.stream, "worker": worker,
+                                 "time": time.strftime("%H:%M:%S", time.localtime(job.captured_at)),
+                                 "label": label, "score": round(float(score), 4),
+                                 "latency_ms": round((time.time() - job.captured_at) * 1000, 1)})
+            except Exception as e:
+                print(f"❌ [worker {worker}] Inference Error: {e}")
+            finally:
+                del views  # No views of the rings may outlive this batch (see SharedRing.close)
+                # Even a failed batch is done, or verdicts() would wait for it forever
+                with pending.get_lock():
+                    pending.value -= len(batch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for ring in rings.values():
+            ring.close()
+
+
+class AudioBus:
+    """
+    Capture processes -> shared-memory rings -> inference processes.
+
+    Each stream gets its own capture process and ring, so capture never shares a GIL with
+    the model. Inference workers are separate processes too (one model each, each on its
+    own share of the cores). Only Window descriptors cross the control queue; the audio
+    itself is read in place from shared memory.
+    """
+
+    def __init__(self, workers=2, queue_size=QUEUE_SIZE, hop_seconds=HOP_SECONDS,
+                 window_seconds=WINDOW_SECONDS, **firewall_options):
+        if workers > MAX_WORKERS:
+            raise ValueError(f"At most {MAX_WORKERS} inference workers (one stale counter each in the ring header)")
+        self.ctx = mp.get_context("spawn")  # Never fork a process that may already hold torch threads
+        self.jobs = self.ctx.Queue(maxsize=queue_size)
+        self.results = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.pending = self.ctx.Value("i", 0)  # Windows queued or being scored, across all processes
+        self.n_workers = workers
+        self.hop_seconds = hop_seconds
+        self.window_seconds = window_seconds
+        self.firewall_options = firewall_options
+        self.rings = {}
+        self.captures = {}
+        self.workers = []
+
+    def add_stream(self, stream_id, spec):
+        capacity = int(RATE * max(RING_SECONDS, 2 * self.window_seconds))
+        ring = self.rings[stream_id] = SharedRing.create(capacity)
+        self.captures[stream_id] = self.ctx.Process(
+            target=capture_process, name=f"capture-{stream_id}", daemon=True,
+            args=(stream_id, spec, ring.name, self.jobs, self.pending, self.stop_event,
+                  self.hop_seconds, self.window_seconds))
+        return ring
+
+    def start(self):
+        for i in range(self.n_workers):
+            worker = self.ctx.Process(target=inference_process, name=f"inference-{i}", daemon=True,
+                                      args=(i, self.n_workers, self.jobs, self.results, self.pending,
+                                            self.stop_event, self.firewall_options))
+            worker.start()
+            self.workers.append(worker)
+        for process in self.captures.values():
+            process.start()
+
+    def active(self):
+        return any(p.is_alive() for p in self.captures.values())
+
+    def verdicts(self, timeout=0.5):
+        """Yields verdicts as they arrive until every capture process has ended and all its windows are scored."""
+        while True:
+            try:
+                yield self.results.get(timeout=timeout)
+            except queue.Empty:
+                if not self.active() and self.pending.value <= 0:
+                    return
+
+    def stop(self):
+        self.stop_event.set()
+        for process in list(self.captures.values()) + self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.rings.values():
+            ring.close()
+
+    def stats(self):
+        return {stream_id: {"seconds": round(ring.written / RATE, 1), "dropped": ring.dropped}
+                for stream_id, ring in self.rings.items() if ring.header is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Multi-process Voice Firewall: capture and inference in separate processes over shared memory.")
+    parser.add_argument("sources", nargs="+", help="device[:N] | file:PATH | tcp:HOST:PORT | synthetic[:F0] (one per stream)")
+    parser.add_argument("--workers", type=int, default=2, help="Inference processes (one model each)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--hop", type=float, default=HOP_SECONDS, help="Seconds of new audio between verdicts")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "student"])
+    parser.add_argument("--out", help="JSONL file for all verdicts")
+    parser.add_argument("--quiet", action="store_true", help="Don't print verdicts to the terminal")
+    args = parser.parse_args()
+
+    bus = AudioBus(workers=args.workers, queue_size=args.queue_size, hop_seconds=args.hop, backend=args.backend)
+    for i, spec in enumerate(args.sources):
+        bus.add_stream(f"stream{i}", spec)
+        print(f"📡 stream{i}: {spec}")
+
+    bus.start()
+    try:
+        for v in bus.verdicts():
+            if args.out:
+                with open(args.out, "a") as f:
+                    f.write(json.dumps(v) + "\n")
+            if not args.quiet:
+                print(f"{v['time']} | {'🔴' if v['label'] == 'FAKE' else '🟢'} {v['stream']:<9} "
+                      f"{v['label']:<7} ({v['score']:.2f}) {v['latency_ms']:.0f} ms [worker {v['worker']}]")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for stream_id, s in bus.stats().items():
+            print(f"   {stream_id}: {s['seconds']}s captured, {s['dropped']} windows dropped")
+        bus.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import time
+import argparse
+import collections
+import numpy as np
+
+import physics
+import vad as speech_vad
+from detector_v3 import TARGET_SR, MAX_CLIP_SAMPLES
+from stream_detector import StreamingFirewall
+
+FRAME_SECONDS = 0.5          # Speaker-turn resolution
+N_MFCC = 20
+MIN_FRAME_SAMPLES = 512      # One MFCC FFT: shorter leftovers can't be voiceprinted
+QUIET_FRAME_RATIO = 0.1      # Frames 20 dB below the segment's median level carry no speaker identity
+# RMS MFCC difference under which a frame joins an existing speaker. An uncalibrated starting
+# point: `python speaker_segmentation.py calibrate DIR` fits it on recordings of known speakers
+# (saved to SPEAKERS_PATH, which SpeakerTracker then uses instead).
+SAME_SPEAKER_DISTANCE = 12.0
+SPEAKERS_PATH = "./models/speaker_tracker.json"
+MAX_SPEAKERS = 4             # More than this on one line is almost always clustering noise
+NEW_SPEAKER_SECONDS = 1.0    # An unfamiliar voice must last this long before it takes a speaker slot
+CENTROID_MEMORY = 50         # Frames of history a speaker centroid averages over
+
+
+def frame_edges(length, sr=TARGET_SR):
+    """Sample edges of the FRAME_SECONDS frames; a leftover under half a frame joins the last one."""
+    if length < MIN_FRAME_SAMPLES:
+        return np.zeros(1, dtype=int)
+    frame = int(sr * FRAME_SECONDS)
+    edges = list(range(0, length, frame)) + [length]
+    if len(edges) > 2 and edges[-1] - edges[-2] < frame // 2:
+        del edges[-2]
+    return np.asarray(edges)
+
+
+def frame_embeddings(y, sr=TARGET_SR):
+    """
+    One cheap voiceprint per frame (see frame_edges): mean and spread of the MFCCs (c0, i.e.
+    loudness, dropped). A single MFCC pass over the whole segment, pooled per frame. Returns
+    (embeddings (n, 2 * (N_MFCC - 1)), frame rms (n,), edges (n + 1,)).
+    """
+    import librosa
+
+    edges = frame_edges(len(y), sr)
+    n = len(edges) - 1
+    if n == 0:
+        return np.zeros((0, 2 * (N_MFCC - 1)), dtype=np.float32), np.zeros(0), edges
+    hop = 160  # 10 ms
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC, n_fft=512, hop_length=hop)[1:]
+    cols = [(a // hop, max(b // hop, a // hop + 1)) for a, b in zip(edges[:-1], edges[1:])]
+    embeddings = np.array([np.concatenate([mfcc[:, a:b].mean(axis=1), mfcc[:, a:b].std(axis=1)]) for a, b in cols])
+    rms = np.array([np.sqrt(np.mean(np.square(y[a:b]))) for a, b in zip(edges[:-1], edges[1:])])
+    return embeddings.astype(np.float32), rms, edges
+
+
+def loud_frames(rms):
+    """Frames loud enough to voiceprint, relative to the segment's own level (quiet speakers count too)."""
+    floor = QUIET_FRAME_RATIO * np.median(rms) if len(rms) else 0.0
+    return rms > floor
+
+
+class SpeakerTracker:
+    """
+    Online (leader-follower) clustering of frame voiceprints. Each frame joins the closest
+    known speaker if it is close enough. Frames unlike every known speaker collect in a candidate,
+    which becomes a new speaker (up to MAX_SPEAKERS) once it has lasted NEW_SPEAKER_SECONDS;
+    until then they count as the nearest speaker, so a stray noisy frame can't take a slot.
+    Centroids keep adapting, and speaker ids stay stable across ticks for the whole call.
+    """
+
+    def __init__(self, threshold=None, max_speakers=MAX_SPEAKERS):
+        self.threshold = threshold if threshold is not None else calibrated_distance()
+        self.max_speakers = max_speakers
+        self.reset()
+
+    def reset(self):
+        self.centroids = []
+        self.counts = []
+        self.candidate = None  # Mean voiceprint of an unfamiliar voice that isn't a speaker yet
+        self.candidate_frames = 0
+
+    def _open(self, x, frames=1):
+        self.centroids.append(x)
+        self.counts.append(frames)
+        return len(self.centroids) - 1
+
+    def _update(self, speaker, x):
+        self.counts[speaker] += 1
+        step = 1.0 / min(self.counts[speaker], CENTROID_MEMORY)
+        self.centroids[speaker] = self.centroids[speaker] + step * (x - self.centroids[speaker])
+
+    def _distance(self, x):
+        # RMS difference per coefficient: the same speaker stays within a few units, a
+        # different vocal tract moves the whole MFCC profile
+        return np.sqrt(np.mean(np.square(np.asarray(self.centroids) - x), axis=1))
+
+    def assign(self, embeddings, rms):
+        """Speaker id per frame (-1 for frames too quiet to tell)."""
+        ids = np.full(len(embeddings), -1)
+        needed = max(1, round(NEW_SPEAKER_SECONDS / FRAME_SECONDS))
+        candidate_ids = []  # This call's frames behind the candidate (earlier calls' keep their ids)
+        for i, (x, loud) in enumerate(zip(embeddings, loud_frames(rms))):
+            if not loud:
+                continue
+            if not self.centroids:
+                ids[i] = self._open(x)  # The first voice has nothing to be confused with
+                continue
+            distances = self._distance(x)
+            best = int(np.argmin(distances))
+            if distances[best] <= self.threshold or len(self.centroids) >= self.max_speakers:
+                self.candidate = None  # The unfamiliar run (if any) is over
+                self._update(best, x)
+                ids[i] = best
+                continue
+
+            # Unlike everyone so far: counts as the nearest speaker (leaving its centroid alone)
+            # until the run is long enough to be a new speaker
+            ids[i] = best
+            if self.candidate is not None and np.sqrt(np.mean(np.square(self.candidate - x))) <= self.threshold:
+                self.candidate_frames += 1
+                self.candidate = self.candidate + (x - self.candidate) / self.candidate_frames
+                candidate_ids.append(i)
+            else:
+                self.candidate, self.candidate_frames, candidate_ids = x, 1, [i]
+            if self.candidate_frames >= needed:
+                ids[candidate_ids] = self._open(self.candidate, self.candidate_frames)
+                self.candidate, candidate_ids = None, []
+
+        # A lone frame between two frames of the same speaker is a clustering blip, not a turn
+        for i in range(1, len(ids) - 1):
+            if ids[i - 1] == ids[i + 1] != ids[i] and ids[i - 1] != -1:
+                ids[i] = ids[i - 1]
+        return ids
+
+
+def speaker_turns(ids, edges):
+    """Runs of the same id -> [(speaker, start_sample, end_sample)], quiet frames dropped."""
+    turns = []
+    for speaker, start, end in zip(ids, edges[:-1], edges[1:]):
+        if speaker == -1:
+            continue
+        if turns and turns[-1][0] == speaker and turns[-1][2] == start:
+            turns[-1] = (speaker, turns[-1][1], end)
+        else:
+            turns.append((speaker, start, end))
+    return turns
+
+
+def calibrated_distance(path=SPEAKERS_PATH):
+    """The same-speaker distance fitted by `calibrate`, or SAME_SPEAKER_DISTANCE if none was."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return float(json.load(f)["same_speaker_distance"])
+    return SAME_SPEAKER_DISTANCE
+
+
+def speaker_frames(paths):
+    """Voiceprints of the loud frames in the speech of each file (non-speech cut out like the live path)."""
+    import wav_loader
+
+    frames = []
+    for path in paths:
+        _, speech = speech_vad.gate(wav_loader.load(path, TARGET_SR), TARGET_SR)
+        if speech is None:
+            continue
+        embeddings, rms, _ = frame_embeddings(speech)
+        frames.append(embeddings[loud_frames(rms)])
+    return frames
+
+
+def calibrate(files_by_speaker):
+    """
+    Fits the same-speaker distance on {speaker: [paths]}: each frame's distance to its own
+    speaker's centroid (taken from that speaker's other files where there are any) and to every
+    other speaker's. Returns the threshold where both error rates are equal, and that rate.
+    """
+    frames = {s: speaker_frames(paths) for s, paths in files_by_speaker.items()}
+    frames = {s: f for s, f in frames.items() if sum(len(x) for x in f)}
+    if len(frames) < 2:
+        raise ValueError("Need speech from at least two speakers")
+    centroids = {s: np.concatenate(f).mean(axis=0) for s, f in frames.items()}
+
+    same, different = [], []
+    for speaker, per_file in frames.items():
+        for i, x in enumerate(per_file):
+            others = [f for j, f in enumerate(per_file) if j != i and len(f)]
+            own = np.concatenate(others).mean(axis=0) if others else centroids[speaker]
+            same.extend(np.sqrt(np.mean(np.square(x - own), axis=1)))
+            for other, centroid in centroids.items():
+                if other != speaker:
+                    different.extend(np.sqrt(np.mean(np.square(x - centroid), axis=1)))
+
+    same, different = np.asarray(same), np.asarray(different)
+    # Both error rates at every candidate threshold t, from two sorted arrays: O(N log N).
+    # missed: same-speaker frames split off (> t); merged: other speakers' frames let in (<= t)
+    candidates = np.unique(np.concatenate([same, different]))
+    missed = 1.0 - np.searchsorted(np.sort(same), candidates, side="right") / len(same)
+    merged = np.searchsorted(np.sort(different), candidates, side="right") / len(different)
+    best = int(np.argmin(np.abs(missed - merged)))
+    return float(candidates[best]), float((missed[best] + merged[best]) / 2)
+
+
+class SpeakerStreamingFirewall(StreamingFirewall):
+    """
+    StreamingFirewall that scores each talker on its own. Every new segment is split into
+    speaker turns, and each turn is pitch-tracked and scored with that speaker's own recent audio
+    as context. A cloned voice is then not averaged away by the real person it is talking to.
+    Per-turn results are cached, so a tick still only costs its new audio. The rolling verdict
+    is that of the most suspicious speaker; last_report["speakers"] has the per-speaker evidence.
+    """
+
+    def __init__(self, firewall, *args, **kwargs):
+        self.tracker = SpeakerTracker()
+        super().__init__(firewall, *args, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self.tracker.reset()
+        self.speaker_context = collections.defaultdict(lambda: np.zeros(0, dtype=np.float32))
+
+    def _process(self, fresh):
+        firewall = self.firewall
+        segments, model_inputs = [], []
+
+        for seg in fresh:
+            turns_out = []
+            segments.append({"silent": True, "speech_ratio": 0.0, "turns": turns_out})
+            if firewall.is_silent(seg):
+                continue
+            speech_ratio, speech = firewall.speech_gate(seg)
+            segments[-1]["speech_ratio"] = speech_ratio
+            if speech is None:
+                continue
+            segments[-1]["silent"] = False
+
+            # Turns are cut from the gated speech, so the VAD trim carries through to the model
+            embeddings, rms, edges = frame_embeddings(speech)
+            for speaker, start, end in speaker_turns(self.tracker.assign(embeddings, rms), edges):
+                audio = speech[start:end]
+                entry = {"speaker": int(speaker), "seconds": len(audio) / TARGET_SR,
+                         "f0": np.zeros(0), "amp": np.zeros(0), "fake": 0.0, "real": 0.0}
+                try:
+                    entry["f0"], entry["amp"] = firewall.voice_features(audio)
+                except Exception:
+                    pass
+                clip = np.concatenate([self.speaker_context[speaker], audio])[-MAX_CLIP_SAMPLES:]
+                self.speaker_context[speaker] = clip
+                model_inputs.append((entry, clip))
+                turns_out.append(entry)
+
+        # Turns vary in length: batch them the same way analyze_batch() does
+        for batch in firewall._length_buckets(model_inputs, max(1, len(model_inputs))):
+            probs = firewall.model_probs([clip for _, clip in batch])
+            for (entry, _), row in zip(batch, probs):
+                entry["fake"], entry["real"] = firewall.label_probs(row)
+
+        self.segments.extend(segments)
+
+    def verdict(self):
+        """Per-speaker verdicts over the current window; the most suspicious speaker decides."""
+        speech_ratio = float(np.mean([s["speech_ratio"] for s in self.segments])) if self.segments else 0.0
+        by_speaker = collections.defaultdict(list)
+        for seg in self.segments:
+            for turn in seg["turns"]:
+                by_speaker[turn["speaker"]].append(turn)
+        if not by_speaker:
+            self.last_report = {"label": "SILENCE", "score": 0.0, "speech_ratio": speech_ratio, "speakers": {}}
+            return "SILENCE", 0.0
+
+        speakers = {}
+        for speaker, turns in by_speaker.items():
+            # Weight by talk time: a half-second interjection shouldn't count like a monologue
+            weights = np.array([t["seconds"] for t in turns])
+            fake_prob = float(np.average([t["fake"] for t in turns], weights=weights))
+            real_prob = float(np.average([t["real"] for t in turns], weights=weights))
+            jitter = physics.jitter(np.concatenate([t["f0"] for t in turns]))
+            shimmer = physics.shimmer(np.concatenate([t["amp"] for t in turns]))
+            label, score = self.firewall.decide(fake_prob, real_prob, jitter, shimmer=shimmer)
+            speakers[speaker] = {"label": label, "score": score, "fake_prob": fake_prob, "real_prob": real_prob,
+                                 "jitter": jitter, "shimmer": shimmer, "seconds": float(weights.sum())}
+
+        fakes = [s for s in speakers.values() if s["label"] == "FAKE"]
+        worst = max(fakes, key=lambda s: s["score"]) if fakes else min(speakers.values(), key=lambda s: s["score"])
+        self.last_report = {**worst, "speech_ratio": speech_ratio, "speakers": speakers}
+        self.last_report.pop("seconds")
+        return worst["label"], worst["score"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the speaker tracker on recordings of known speakers.")
+    parser.add_argument("command", choices=["calibrate"])
+    parser.add_argument("root", help="Folder with one subfolder of recordings per speaker")
+    parser.add_argument("--out", default=SPEAKERS_PATH, help="Where the calibrated distance is written")
+    args = parser.parse_args()
+
+    from batch_audit import find_audio
+
+    files = {name: list(find_audio(os.path.join(args.root, name))) for name in sorted(os.listdir(args.root))
+             if os.path.isdir(os.path.join(args.root, name))}
+    try:
+        distance, error_rate = calibrate(files)
+    except ValueError as e:
+        print(f"❌ {e} (one subfolder of recordings per speaker under {args.root}).")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"same_speaker_distance": distance, "equal_error_rate": error_rate,
+                   "speakers": len(files), "fitted": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=2)
+    print(f"💾 Same-speaker distance {distance:.2f} (equal error rate {error_rate:.1%}, "
+          f"previously {SAME_SPEAKER_DISTANCE:g}) saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import collections
+import math
+import numpy as np
+
+import physics
+from detector_v3 import TARGET_SR, MAX_CLIP_SAMPLES
+
+WINDOW_SECONDS = 10    # Same rolling context as the recorder buffer
+SEGMENT_SECONDS = 2.0  # New audio is processed in steps of this size
+
+
+class StreamingFirewall:
+    """
+    Incremental version of VoiceFirewall.analyze() for live audio.
+
+    The live loops used to re-run pyin and the model over the whole 10 s buffer every tick.
+    Here the window is kept as a queue of fixed-size segments: each segment is pitch-tracked
+    and scored exactly once when it arrives, and the verdict is rebuilt from the cached
+    per-segment results. Per-tick cost is O(new audio), not O(window).
+    """
+
+    def __init__(self, firewall, window_seconds=WINDOW_SECONDS, segment_seconds=SEGMENT_SECONDS):
+        self.firewall = firewall
+        self.segment_len = int(TARGET_SR * segment_seconds)
+        self.segments = collections.deque(maxlen=max(1, math.ceil(window_seconds / segment_seconds)))
+        self.reset()
+
+    def reset(self):
+        self.segments.clear()
+        self.last_report = {}
+        self.pending = np.zeros(0, dtype=np.float32)
+        # Tail of the previous audio, so every model call still sees up to 4 s of context
+        self.context = np.zeros(0, dtype=np.float32)
+
+    def needed(self):
+        """Samples still missing before push() can complete the next segment."""
+        return self.segment_len - len(self.pending)
+
+    def push(self, samples):
+        """
+        Feed newly arrived 16 kHz samples. Returns the rolling (label, score), or None when
+        no new segment was completed (nothing changed since the last verdict).
+        """
+        if samples is not None and len(samples):
+            self.pending = np.concatenate([self.pending, np.asarray(samples, dtype=np.float32)])
+
+        fresh = []
+        while len(self.pending) >= self.segment_len:
+            fresh.append(self.pending[:self.segment_len])
+            self.pending = self.pending[self.segment_len:]
+
+        if not fresh:
+            return None
+
+        try:
+            self._process(fresh)
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            return "ERROR", 0.0
+        return self.verdict()
+
+    def _process(self, fresh):
+        firewall = self.firewall
+        entries, model_inputs = [], []
+
+        for seg in fresh:
+            clip = np.concatenate([self.context, seg])[-MAX_CLIP_SAMPLES:]
+            self.context = clip
+            entry = {"silent": True, "speech_ratio": 0.0, "f0": np.zeros(0), "amp": np.zeros(0),
+                     "fake": 0.0, "real": 0.0}
+            speech = None
+            if not firewall.is_silent(seg):
+                entry["speech_ratio"], speech = firewall.speech_gate(seg)
+            if speech is not None:
+                entry["silent"] = False
+                try:
+                    entry["f0"], entry["amp"] = firewall.voice_features(speech)
+                except Exception:
+                    pass
+                model_inputs.append((entry, clip))
+            entries.append(entry)
+
+        # All new segments share one forward pass
+        if model_inputs:
+            probs = firewall.model_probs([clip for _, clip in model_inputs])
+            for (entry, _), row in zip(model_inputs, probs):
+                entry["fake"], entry["real"] = firewall.label_probs(row)
+
+        self.segments.extend(entries)
+
+    def verdict(self):
+        """Rolling verdict over the cached segments of the current window."""
+        voiced = [s for s in self.segments if not s["silent"]]
+        speech_ratio = float(np.mean([s["speech_ratio"] for s in self.segments])) if self.segments else 0.0
+        if not voiced:
+            self.last_report = {"label": "SILENCE", "score": 0.0, "speech_ratio": speech_ratio}
+            return "SILENCE", 0.0
+
+        fake_prob = float(np.mean([s["fake"] for s in voiced]))
+        real_prob = float(np.mean([s["real"] for s in voiced]))
+        jitter = physics.jitter(np.concatenate([s["f0"] for s in voiced]))
+        shimmer = physics.shimmer(np.concatenate([s["amp"] for s in voiced]))
+        label, score = self.firewall.decide(fake_prob, real_prob, jitter, shimmer=shimmer)
+        self.last_report = {"label": label, "score": score, "fake_prob": fake_prob, "real_prob": real_prob,
+                            "jitter": jitter, "shimmer": shimmer, "speech_ratio": speech_ratio}
+        return label, score
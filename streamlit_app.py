@@ -1,17 +1,18 @@
 import streamlit as st
 import time
 import os
+import tempfile
 import pandas as pd
 import altair as alt
-import librosa
-import numpy as np
 from audio_stream import AudioRecorder
 
-# Ensuring we use the robust final logic
-try:
-    from final_detector import VoiceFirewall
-except ImportError:
-    from detector_v3 import VoiceFirewall
+from model_registry import get_firewall, get_cache
+from speaker_segmentation import SpeakerStreamingFirewall
+from analysis_worker import AnalysisWorker, ResultsStore
+
+REFRESH_SECONDS = 1.0  # How often the live panels redraw (inference runs on its own thread)
+# st.fragment on current Streamlit, experimental_fragment on 1.33-1.36; None before that
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -75,30 +76,114 @@ st.markdown("""
 
 # --- INITIALIZE STATE ---
 if 'recorder' not in st.session_state: st.session_state.recorder = AudioRecorder()
-if 'firewall' not in st.session_state: st.session_state.firewall = VoiceFirewall()
-if 'history' not in st.session_state: st.session_state.history = []
+# One shared, pre-warmed model for every browser tab (loaded by whichever session comes first)
+if 'firewall' not in st.session_state: st.session_state.firewall = get_firewall(cache=get_cache())
+if 'results' not in st.session_state: st.session_state.results = ResultsStore()
+# Each talker on the line is scored separately; the most suspicious one drives the alert
+if 'stream' not in st.session_state: st.session_state.stream = SpeakerStreamingFirewall(st.session_state.firewall)
+if 'worker' not in st.session_state:
+    st.session_state.worker = AnalysisWorker(st.session_state.recorder, st.session_state.stream, st.session_state.results)
 if 'is_running' not in st.session_state: st.session_state.is_running = False
 if 'current_mode' not in st.session_state: st.session_state.current_mode = "Home"
 
+# --- LIVE RESULTS VIEW ---
+def risk_chart(snap):
+    """Altair chart for a results snapshot. Rebuilt only when a new verdict has arrived."""
+    cached = st.session_state.get("chart_cache")
+    if cached is not None and cached[0] == snap["version"]:
+        return cached[1]
+    df = pd.DataFrame({"Time": [time.strftime("%H:%M:%S", time.localtime(t)) for t in snap["time"]],
+                       "Risk Score": snap["risk"]})
+    chart = alt.Chart(df).mark_area(
+        line={'color': '#6366f1'},
+        color=alt.Gradient(
+            gradient='linear',
+            stops=[alt.GradientStop(color='rgba(99, 102, 241, 0.5)', offset=0),
+                   alt.GradientStop(color='rgba(99, 102, 241, 0.05)', offset=1)],
+            x1=1, x2=1, y1=1, y2=0
+        )
+    ).encode(
+        x=alt.X('Time', axis=None),
+        y=alt.Y('Risk Score', scale=alt.Scale(domain=[0, 100]))
+    ).properties(height=250)
+    st.session_state.chart_cache = (snap["version"], chart)
+    return chart
+
+
+def render_results(title, show_log=False):
+    """Draws whatever the analysis worker has published so far. Never touches the model."""
+    snap = st.session_state.results.snapshot()
+    latest = st.session_state.results.latest()
+
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        st.markdown(title)
+        if len(snap["risk"]):
+            st.altair_chart(risk_chart(snap), use_container_width=True)
+        if st.session_state.worker.error:
+            st.error(f"🎙️ {st.session_state.worker.error}")
+        elif latest is not None:
+            label, score = latest
+            if label == "FAKE":
+                st.markdown(
+                    f"""<div class="alert-box alert-red"><h3>⚠️ DEEPFAKE DETECTED</h3>Confidence: {score * 100:.1f}%</div>""",
+                    unsafe_allow_html=True)
+            elif label == "REAL":
+                st.markdown(
+                    f"""<div class="alert-box alert-green"><h3>🛡️ VERIFIED HUMAN</h3>Confidence: {score * 100:.1f}%</div>""",
+                    unsafe_allow_html=True)
+    if show_log:
+        with c2:
+            st.markdown("### Audit Log")
+            with st.container(height=300):
+                for t, label, score in zip(snap["time"][::-1], snap["label"][::-1], snap["score"][::-1]):
+                    icon = "🔴" if label == "FAKE" else "🟢"
+                    st.markdown(f"**{time.strftime('%H:%M:%S', time.localtime(t))}** | {icon} {label} ({score:.2f})")
+
+
+if fragment is not None:
+    # Refreshes on a timer without rerunning the rest of the page
+    live_results = fragment(run_every=REFRESH_SECONDS)(render_results)
+else:
+    def live_results(title, show_log=False):
+        # Older Streamlit: redraw in place until the user navigates away
+        panel = st.empty()
+        while True:
+            with panel.container():
+                render_results(title, show_log)
+            time.sleep(REFRESH_SECONDS)
+
+def stop_protection():
+    """Stops capture and the analysis worker."""
+    if st.session_state.is_running:
+        st.session_state.recorder.stop()
+        st.session_state.worker.stop()
+        st.session_state.is_running = False
+
+
+def set_mode(mode):
+    """Switches page. Only Sim and Live show live results, so leaving them stops the background analysis."""
+    if mode not in ("Sim", "Live"):
+        stop_protection()
+    st.session_state.current_mode = mode
+    st.rerun()
+
+
 # --- TOP NAVIGATION BAR ---
 col_nav1, col_nav2, col_nav3, col_nav4 = st.columns([1, 1, 1, 1])
 
 with col_nav1:
     if st.button("🏠 Home"):
-        st.session_state.current_mode = "Home"
-        st.rerun()
+        set_mode("Home")
 with col_nav2:
     if st.button("🧪 Simulation (Try First)"):  # Promoted
-        st.session_state.current_mode = "Sim"
-        st.rerun()
+        set_mode("Sim")
 with col_nav3:
     if st.button("📡 Live Defense"):
-        st.session_state.current_mode = "Live"
-        st.rerun()
+        set_mode("Live")
 with col_nav4:
     if st.button("📂 File Audit"):
-        st.session_state.current_mode = "File"
-        st.rerun()
+        set_mode("File")
 
 st.divider()
 
@@ -118,8 +203,7 @@ if st.session_state.current_mode == "Home":
         </div>
         """, unsafe_allow_html=True)
         if st.button("Go to Simulation", key="home_sim"):
-            st.session_state.current_mode = "Sim"
-            st.rerun()
+            set_mode("Sim")
 
     with c2:
         st.markdown("""
@@ -130,8 +214,7 @@ if st.session_state.current_mode == "Home":
         </div>
         """, unsafe_allow_html=True)
         if st.button("Go to Live Defense", key="home_live"):
-            st.session_state.current_mode = "Live"
-            st.rerun()
+            set_mode("Live")
 
     with c3:
         st.markdown("""
@@ -142,8 +225,7 @@ if st.session_state.current_mode == "Home":
         </div>
         """, unsafe_allow_html=True)
         if st.button("Go to File Audit", key="home_file"):
-            st.session_state.current_mode = "File"
-            st.rerun()
+            set_mode("File")
 
 # --- MODE 2: SIMULATION (GLITCH FIXED) ---
 elif st.session_state.current_mode == "Sim":
@@ -161,8 +243,8 @@ elif st.session_state.current_mode == "Sim":
     # Auto-start engine if needed
     if not st.session_state.is_running:
         st.session_state.recorder.start()
+        st.session_state.worker.start()
         st.session_state.is_running = True
-        time.sleep(0.5)
 
     # 1. Controls (Buttons First)
     st.markdown("### 🎛️ Test Controls")
@@ -183,58 +265,8 @@ elif st.session_state.current_mode == "Sim":
 
     # 2. Visualization (Bottom & Stable)
     st.divider()
-    c1, c2 = st.columns([2, 1])
-    with c1:
-        st.markdown("### 📊 Live Resonance Graph")
-        # Placeholders allow updating WITHOUT reloading the page
-        chart_placeholder = st.empty()
-        alert_placeholder = st.empty()
-
-    # 3. Logic Loop (NO RERUN)
-    placeholder_file = "live_stream_buffer.wav"
-
-    if st.session_state.is_running:
-        # We loop here without st.rerun() to prevent glitches
-        while st.session_state.current_mode == "Sim":
-            success = st.session_state.recorder.save_current_buffer(placeholder_file)
-            if success:
-                label, score = st.session_state.firewall.analyze(placeholder_file)
-                timestamp = time.strftime("%H:%M:%S")
-
-                # Logic
-                risk_score = score * 100 if label == "FAKE" else (1.0 - score) * 5
-                st.session_state.history.append({"Time": timestamp, "Risk Score": risk_score})
-                if len(st.session_state.history) > 40: st.session_state.history.pop(0)
-
-                # Update Alerts (Smooth)
-                if label == "FAKE":
-                    alert_placeholder.markdown(
-                        f"""<div class="alert-box alert-red"><h3>⚠️ DEEPFAKE DETECTED</h3>Confidence: {score * 100:.1f}%</div>""",
-                        unsafe_allow_html=True)
-                elif label == "REAL":
-                    alert_placeholder.markdown(
-                        f"""<div class="alert-box alert-green"><h3>🛡️ VERIFIED HUMAN</h3>Confidence: {score * 100:.1f}%</div>""",
-                        unsafe_allow_html=True)
-
-                # Update Chart (Smooth)
-                df = pd.DataFrame(st.session_state.history)
-                if not df.empty:
-                    chart = alt.Chart(df).mark_area(
-                        line={'color': '#6366f1'},
-                        color=alt.Gradient(
-                            gradient='linear',
-                            stops=[alt.GradientStop(color='rgba(99, 102, 241, 0.5)', offset=0),
-                                   alt.GradientStop(color='rgba(99, 102, 241, 0.05)', offset=1)],
-                            x1=1, x2=1, y1=1, y2=0
-                        )
-                    ).encode(
-                        x=alt.X('Time', axis=None),
-                        y=alt.Y('Risk Score', scale=alt.Scale(domain=[0, 100]))
-                    ).properties(height=250)
-                    chart_placeholder.altair_chart(chart, use_container_width=True)
-
-            # Wait a bit to prevent CPU spike
-            time.sleep(0.5)
+    # Only this panel refreshes; the audio players above are never re-rendered
+    live_results("### 📊 Live Resonance Graph")
 
 # --- MODE 3: LIVE DEFENSE ---
 elif st.session_state.current_mode == "Live":
@@ -258,67 +290,21 @@ elif st.session_state.current_mode == "Live":
     with m2:
         if st.session_state.is_running:
             if st.button("⏹ STOP PROTECTION", type="primary", use_container_width=True):
-                st.session_state.recorder.stop()
-                st.session_state.is_running = False
+                stop_protection()
                 st.rerun()
         else:
             if st.button("▶ START PROTECTION", type="primary", use_container_width=True):
                 st.session_state.recorder.start()
+                st.session_state.results.clear()
+                st.session_state.worker.start()
                 st.session_state.is_running = True
-                st.session_state.history = []
                 st.rerun()
 
     # Visualization
-    c1, c2 = st.columns([2, 1])
-    with c1:
-        st.markdown("### Real-Time Resonance")
-        chart_placeholder = st.empty()
-        alert_placeholder = st.empty()
-    with c2:
-        st.markdown("### Audit Log")
-        log_container = st.container(height=300)
-
     if st.session_state.is_running:
-        placeholder_file = "live_stream_buffer.wav"
-        # LOOP FIX: No st.rerun() here either
-        while st.session_state.current_mode == "Live" and st.session_state.is_running:
-            success = st.session_state.recorder.save_current_buffer(placeholder_file)
-            if success:
-                label, score = st.session_state.firewall.analyze(placeholder_file)
-                timestamp = time.strftime("%H:%M:%S")
-                risk_score = score * 100 if label == "FAKE" else (1.0 - score) * 5
-                st.session_state.history.append({"Time": timestamp, "Risk Score": risk_score})
-                if len(st.session_state.history) > 40: st.session_state.history.pop(0)
-
-                if label == "FAKE":
-                    alert_placeholder.markdown(
-                        f"""<div class="alert-box alert-red"><h3>⚠️ DEEPFAKE DETECTED</h3>Confidence: {score * 100:.1f}%</div>""",
-                        unsafe_allow_html=True)
-                elif label == "REAL":
-                    alert_placeholder.markdown(
-                        f"""<div class="alert-box alert-green"><h3>🛡️ VERIFIED HUMAN</h3>Confidence: {score * 100:.1f}%</div>""",
-                        unsafe_allow_html=True)
-
-                df = pd.DataFrame(st.session_state.history)
-                if not df.empty:
-                    chart = alt.Chart(df).mark_area(
-                        line={'color': '#6366f1'},
-                        color=alt.Gradient(
-                            gradient='linear',
-                            stops=[alt.GradientStop(color='rgba(99, 102, 241, 0.5)', offset=0),
-                                   alt.GradientStop(color='rgba(99, 102, 241, 0.05)', offset=1)],
-                            x1=1, x2=1, y1=1, y2=0
-                        )
-                    ).encode(
-                        x=alt.X('Time', axis=None),
-                        y=alt.Y('Risk Score', scale=alt.Scale(domain=[0, 100]))
-                    ).properties(height=250)
-                    chart_placeholder.altair_chart(chart, use_container_width=True)
-
-                with log_container:
-                    icon = "🔴" if label == "FAKE" else "🟢"
-                    st.markdown(f"**{timestamp}** | {icon} {label} ({score:.2f})")
-            time.sleep(0.5)
+        live_results("### Real-Time Resonance", show_log=True)
+    else:
+        render_results("### Real-Time Resonance", show_log=True)
 
 # --- MODE 4: FILE AUDIT ---
 elif st.session_state.current_mode == "File":
@@ -338,12 +324,14 @@ elif st.session_state.current_mode == "File":
     if uploaded_file is not None:
         if st.button("🔍 Analyze File", type="primary"):
             with st.spinner("Processing Forensics..."):
-                temp_filename = "temp_upload.wav"
-                with open(temp_filename, "wb") as f:
+                # One file per session: the firewall (and the working directory) are shared
+                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
                     f.write(uploaded_file.getbuffer())
+                    temp_filename = f.name
 
                 try:
-                    label, score = st.session_state.firewall.analyze(temp_filename)
+                    # Whole recording, window by window (analyze() would only hear the first 4 s)
+                    label, score, report = st.session_state.firewall.analyze_long(temp_filename)
                     st.divider()
 
                     if label == "FAKE":
@@ -361,6 +349,21 @@ elif st.session_state.current_mode == "File":
                         </div>
                         """, unsafe_allow_html=True)
 
+                    # Timeline: which stretches of the recording look synthetic
+                    # Every voiced window, early exits too; P(fake) comes from each window's own verdict
+                    windows = [w for w in report.get("windows", []) if "jitter" in w]
+                    if len(windows) > 1:
+                        flagged = sum(w["label"] == "FAKE" for w in windows)
+                        st.markdown(f"### 🕒 Timeline ({flagged} of {len(windows)} voiced windows flagged)")
+                        df = pd.DataFrame({"Second": [w["start"] for w in windows],
+                                           "Fake Probability": [(w["score"] if w["label"] == "FAKE" else 1 - w["score"]) * 100
+                                                                for w in windows]})
+                        chart = alt.Chart(df).mark_line(point=True, color='#6366f1').encode(
+                            x=alt.X('Second', title="Time (s)"),
+                            y=alt.Y('Fake Probability', scale=alt.Scale(domain=[0, 100]))
+                        ).properties(height=220)
+                        st.altair_chart(chart, use_container_width=True)
+
                     if os.path.exists(temp_filename): os.remove(temp_filename)
 
                 except Exception as e:
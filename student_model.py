@@ -0,0 +1,99 @@
+import os
+import json
+import types
+import numpy as np
+import torch
+from torch import nn
+
+TARGET_SR = 16000
+MAX_CLIP_SAMPLES = TARGET_SR * 4   # Same 4 s view as the teacher
+N_FFT = 400                        # 25 ms
+HOP = 160                          # 10 ms
+N_MELS = 64
+CHANNELS = (16, 32, 64, 64)        # One conv block (conv-bn-relu-pool) per entry
+WEIGHTS_FILE = "student.pt"
+CONFIG_FILE = "student.json"
+
+
+class LogMel(nn.Module):
+    """Waveform -> log-mel spectrogram, normalised per clip and mel band over the valid frames only."""
+
+    def __init__(self, n_mels=N_MELS, filterbank=None):
+        super().__init__()
+        if filterbank is None:
+            filterbank = np.zeros((n_mels, N_FFT // 2 + 1), dtype=np.float32)  # Filled by load_state_dict()
+        self.register_buffer("mel", torch.as_tensor(filterbank, dtype=torch.float32))
+        self.register_buffer("window", torch.hann_window(N_FFT))
+
+    @staticmethod
+    def filterbank(n_mels=N_MELS):
+        import librosa
+        return librosa.filters.mel(sr=TARGET_SR, n_fft=N_FFT, n_mels=n_mels, fmin=20, fmax=TARGET_SR // 2)
+
+    def forward(self, waves, frames):
+        spec = torch.stft(waves, N_FFT, HOP, window=self.window, center=True, return_complex=True)
+        logmel = torch.log(torch.matmul(self.mel, spec.abs() ** 2) + 1e-6)  # (batch, mels, time)
+        mask = (torch.arange(logmel.shape[-1]) < frames[:, None]).unsqueeze(1).float()
+        count = mask.sum(-1, keepdim=True).clamp(min=1.0)
+        mean = (logmel * mask).sum(-1, keepdim=True) / count
+        std = torch.sqrt(((logmel - mean) ** 2 * mask).sum(-1, keepdim=True) / count + 1e-5)
+        return (logmel - mean) / std * mask
+
+
+class StudentCNN(nn.Module):
+    """
+    Compact log-mel CNN distilled from the installed wav2vec2 detector (distill.py).
+    About 60k parameters: four 3x3 conv blocks and a masked average over time, so clips of
+    different lengths can share a batch (padding only reaches the last few frames' receptive field).
+    """
+
+    def __init__(self, num_labels=2, n_mels=N_MELS, channels=CHANNELS, filterbank=None):
+        super().__init__()
+        self.frontend = LogMel(n_mels, filterbank)
+        blocks, last = [], 1
+        for c in channels:
+            blocks += [nn.Conv2d(last, c, 3, padding=1, bias=False), nn.BatchNorm2d(c), nn.ReLU(inplace=True),
+                       nn.MaxPool2d(2)]
+            last = c
+        self.features = nn.Sequential(*blocks)
+        self.pool_factor = 2 ** len(channels)
+        self.dropout = nn.Dropout(0.2)
+        self.classifier = nn.Linear(last, num_labels)
+
+    def forward(self, waves, lengths):
+        """waves: (batch, samples) float32, zero-padded; lengths: valid samples per clip. Returns logits."""
+        frames = lengths // HOP + 1
+        x = self.features(self.frontend(waves, frames).unsqueeze(1)).mean(dim=2)  # (batch, channels, time')
+        valid = (frames // self.pool_factor).clamp(min=1, max=x.shape[-1])
+        mask = (torch.arange(x.shape[-1]) < valid[:, None]).unsqueeze(1).float()
+        pooled = (x * mask).sum(-1) / mask.sum(-1)
+        return self.classifier(self.dropout(pooled))
+
+
+def pad_batch(clips):
+    """List of 16 kHz clips -> (zero-padded (batch, samples) tensor, lengths tensor), each cut to 4 s."""
+    lengths = [min(len(y), MAX_CLIP_SAMPLES) for y in clips]
+    waves = np.zeros((len(clips), max(max(lengths), N_FFT)), dtype=np.float32)
+    for row, y, n in zip(waves, clips, lengths):
+        row[:n] = y[:n]
+    return torch.from_numpy(waves), torch.tensor(lengths)
+
+
+def save_student(model, folder, config):
+    os.makedirs(folder, exist_ok=True)
+    torch.save(model.state_dict(), os.path.join(folder, WEIGHTS_FILE))
+    with open(os.path.join(folder, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def load_student(folder):
+    """(model in eval mode, config namespace with id2label) for a student written by distill.py."""
+    path = os.path.join(folder, WEIGHTS_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found (run distill.py train first)")
+    with open(os.path.join(folder, CONFIG_FILE)) as f:
+        config = json.load(f)
+    model = StudentCNN(len(config["id2label"]), config["n_mels"], tuple(config["channels"]))
+    model.load_state_dict(torch.load(path, map_location="cpu"))
+    model.eval()
+    return model, types.SimpleNamespace(**config)
@@ -0,0 +1,67 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 32 ms frames, 16 ms hop at 16 kHz
+FRAME_LENGTH = 512
+HOP_LENGTH = 256
+
+ENERGY_FLOOR_DB = -50.0   # Absolute floor (dBFS): anything quieter is never speech
+ENERGY_MARGIN_DB = 6.0    # Speech must also stand this far above the clip's own noise floor...
+ENERGY_RANGE_DB = 10.0    # ...unless the whole window is loud (continuous talking has no quiet floor)
+FLATNESS_MIN = 1e-4       # Below this a frame is a pure tone (hold beeps, dial tones)
+FLATNESS_MAX = 0.45       # Above this a frame is noise-like (hiss, fans, static); white noise is ~0.56
+SPEECH_BAND = (100, 4000)
+HANGOVER_FRAMES = 4       # Keep ~64 ms around detected speech so word edges survive trimming
+
+MIN_SPEECH_RATIO = 0.2    # Windows with less speech than this skip the model entirely
+
+
+def frame_features(y, sr):
+    """Per-frame energy (dBFS) and spectral flatness in the speech band. Fully vectorised."""
+    y = np.asarray(y, dtype=np.float32)
+    if len(y) < FRAME_LENGTH:
+        y = np.pad(y, (0, FRAME_LENGTH - len(y)))
+    frames = sliding_window_view(y, FRAME_LENGTH)[::HOP_LENGTH]
+
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    energy_db = 20 * np.log10(rms + 1e-10)
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(FRAME_LENGTH), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FRAME_LENGTH, 1.0 / sr)
+    band = power[:, (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])] + 1e-12
+    # Geometric mean / arithmetic mean: ~0 for tones, highest (~0.56) for white noise
+    flatness = np.exp(np.mean(np.log(band), axis=1)) / np.mean(band, axis=1)
+    return energy_db, flatness
+
+
+def speech_mask(y, sr):
+    """True for every frame that looks like speech."""
+    energy_db, flatness = frame_features(y, sr)
+    noise_floor, peak = np.percentile(energy_db, [10, 95])
+    threshold = max(ENERGY_FLOOR_DB, min(noise_floor + ENERGY_MARGIN_DB, peak - ENERGY_RANGE_DB))
+    loud = energy_db > threshold
+    voice_like = (flatness > FLATNESS_MIN) & (flatness < FLATNESS_MAX)
+    mask = loud & voice_like
+
+    if HANGOVER_FRAMES and mask.any():
+        # Dilate: a frame counts if any speech frame is within HANGOVER_FRAMES of it
+        padded = np.pad(mask, HANGOVER_FRAMES)
+        mask = sliding_window_view(padded, 2 * HANGOVER_FRAMES + 1).any(axis=1)
+    return mask
+
+
+def gate(y, sr, min_ratio=MIN_SPEECH_RATIO):
+    """
+    Returns (speech_ratio, speech_only_audio). The audio is None when the window holds too
+    little speech to be worth scoring; otherwise non-speech stretches are cut out.
+    """
+    mask = speech_mask(y, sr)
+    ratio = float(mask.mean()) if len(mask) else 0.0
+    if ratio < min_ratio:
+        return ratio, None
+
+    # Frame mask -> sample mask (each speech frame keeps its hop's worth of samples)
+    keep = np.repeat(mask, HOP_LENGTH)[:len(y)]
+    if len(keep) < len(y):
+        keep = np.pad(keep, (0, len(y) - len(keep)), mode="edge")
+    return ratio, np.asarray(y)[keep]
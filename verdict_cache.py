@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+CACHE_PATH = "./cache/verdicts.sqlite"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def model_revision(model_path, extra_files=()):
+    """
+    Fingerprint of the model folder as it is on disk right now. swap_brain.py / revert_brain.py
+    delete and re-download the folder, which changes this value, so old verdicts stop matching.
+    extra_files: model files outside the folder's top level that the backend loads (e.g. the
+    exported ONNX graph), so re-exporting them changes the revision too.
+    """
+    h = hashlib.sha256()
+    if not os.path.isdir(model_path):
+        return "missing"
+    for full in extra_files:
+        if os.path.isfile(full):
+            st = os.stat(full)
+            h.update(f"{os.path.abspath(full)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    for name in sorted(os.listdir(model_path)):
+        full = os.path.join(model_path, name)
+        if not os.path.isfile(full):
+            continue
+        st = os.stat(full)
+        h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        if name.endswith(".json"):  # Configs are tiny: hash the content too
+            with open(full, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def audio_key(y, config):
+    """Cache key: decoded 16 kHz PCM + everything that can change the verdict for it."""
+    h = hashlib.sha256(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    h.update(json.dumps(config, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class VerdictCache:
+    """
+    Persistent verdict store (SQLite), content-addressed by audio_key(). Bounded to
+    max_bytes on disk; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                        "key TEXT PRIMARY KEY, report TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS verdicts_lru ON verdicts (last_used)")
+        self.db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT report FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, report):
+        blob = json.dumps(report)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+                            (key, blob, len(key) + len(blob), time.time()))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM verdicts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least to most recently used until enough has been freed
+        excess, cutoff = total - self.max_bytes, None
+        for last_used, size in self.db.execute("SELECT last_used, size FROM verdicts ORDER BY last_used"):
+            excess -= size
+            cutoff = last_used
+            if excess <= 0:
+                break
+        self.db.execute("DELETE FROM verdicts WHERE last_used <= ?", (cutoff,))
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM verdicts")
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
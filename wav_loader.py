@@ -0,0 +1,125 @@
+import os
+import struct
+import numpy as np
+
+TARGET_SR = 16000
+BLOCK_SECONDS = 10.0
+
+# WAVE format tags
+PCM = 1
+IEEE_FLOAT = 3
+EXTENSIBLE = 0xFFFE
+
+_DTYPES = {(PCM, 1): np.uint8, (PCM, 2): np.dtype("<i2"), (PCM, 4): np.dtype("<i4"), (IEEE_FLOAT, 4): np.dtype("<f4")}
+
+
+def wav_layout(path):
+    """
+    Where the samples live in a plain WAV file: {"sr", "channels", "dtype", "offset", "frames"}.
+    None if this isn't a RIFF/WAVE file or its sample format can't be memory-mapped
+    (compressed codecs, 24-bit PCM, ...).
+    """
+    try:
+        with open(path, "rb") as f:
+            riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave_id != b"WAVE":
+                return None
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    body = f.read(size + size % 2)
+                    tag, channels, sr, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                    if tag == EXTENSIBLE and len(body) >= 26:
+                        tag = struct.unpack("<H", body[24:26])[0]  # First two bytes of the SubFormat GUID
+                    fmt = (tag, channels, sr, bits // 8)
+                elif chunk_id == b"data":
+                    if fmt is None:
+                        return None
+                    tag, channels, sr, width = fmt
+                    dtype = _DTYPES.get((tag, width))
+                    if dtype is None or channels < 1:
+                        return None
+                    offset = f.tell()
+                    # Streaming writers leave the size at 0 / 0xFFFFFFFF: trust the file length instead
+                    available = os.path.getsize(path) - offset
+                    if size == 0 or size > available:
+                        size = available
+                    return {"sr": sr, "channels": channels, "dtype": np.dtype(dtype), "offset": offset,
+                            "frames": size // (width * channels)}
+                else:
+                    f.seek(size + size % 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def open_pcm(path):
+    """(memmap of shape (frames, channels), layout) for a mappable WAV, or (None, None)."""
+    layout = wav_layout(path)
+    if layout is None or layout["frames"] == 0:
+        return None, layout
+    mm = np.memmap(path, dtype=layout["dtype"], mode="r", offset=layout["offset"],
+                   shape=(layout["frames"], layout["channels"]))
+    return mm, layout
+
+
+def to_float(frames):
+    """A slice of the memmap -> mono float32 in [-1, 1]. Only this slice is ever read from disk."""
+    dtype = frames.dtype
+    if frames.shape[1] == 1:
+        y = np.array(frames[:, 0], dtype=np.float32)  # Plain ndarray, not another memmap view
+    else:
+        y = np.asarray(frames.mean(axis=1, dtype=np.float32)).view(np.ndarray)
+    if dtype == np.uint8:
+        y -= 128.0
+        y *= 1.0 / 128.0
+    elif dtype.kind == "i":
+        y *= 1.0 / float(2 ** (8 * dtype.itemsize - 1))
+    return y
+
+
+def iter_blocks(path, block_seconds=BLOCK_SECONDS, target_sr=TARGET_SR):
+    """
+    Yields the recording as 16 kHz mono float32 blocks straight from the memory map. 16 kHz
+    files (what RealRecorder writes) are only sliced and scaled; other rates go through a
+    streaming resampler. Returns without yielding anything if the file isn't mappable, so
+    callers can check wav_layout() first or fall back to librosa.
+    """
+    mm, layout = open_pcm(path)
+    if mm is None:
+        return
+    sr = layout["sr"]
+    step = int(sr * block_seconds)
+
+    resampler = None
+    if sr != target_sr:
+        import soxr
+        resampler = soxr.ResampleStream(sr, target_sr, 1, dtype="float32")
+
+    for start in range(0, len(mm), step):
+        block = to_float(mm[start:start + step])
+        yield block if resampler is None else resampler.resample_chunk(block)
+    if resampler is not None:
+        yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+
+def load(path, target_sr=TARGET_SR):
+    """
+    Whole file as 16 kHz mono float32, like librosa.load(path, sr=16000, mono=True), but WAV
+    PCM is read through the memory map with no float64 round trip and no resampling at 16 kHz.
+    Everything else (MP3, FLAC, odd WAVs) goes through librosa.
+    """
+    mm, layout = open_pcm(path)
+    if mm is not None:
+        y = to_float(mm)
+        if layout["sr"] != target_sr:
+            import soxr
+            y = soxr.resample(y, layout["sr"], target_sr)
+        return np.ascontiguousarray(y, dtype=np.float32)
+
+    import librosa
+    y, _ = librosa.load(path, sr=target_sr, mono=True)
+    return y